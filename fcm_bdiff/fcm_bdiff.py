@@ -306,6 +306,9 @@ class FCMBDiff(FCMBase):
             for bfile in bdiff_files
         ]
 
+        return self._full_paths(relative_paths, path_override)
+
+    def _full_paths(self, relative_paths, path_override=None):
         # These relative paths can be joined to an appropriate base to complete
         # the filenames to return
         base_source_key = "SOURCE_UM_BASE"
@@ -329,6 +332,51 @@ class FCMBDiff(FCMBase):
 
         return bdiff_files
 
+    def changed_lines(self, path_override=None):
+        """
+        Get the lines changed on the branch, as a dictionary of file name
+        (completed in the same way as files()) to a list of (first, last)
+        line number ranges, numbered from 1, of the lines added or changed.
+        Parses the unified diff from "fcm bdiff", counting through the body
+        of each hunk so the amount of context in the diff doesn't matter.
+        """
+
+        diff = self.get_bdiff(retries=self._retries)
+
+        changed = {}
+        ranges = None
+        new_line = 0
+        # Only the header of each file's diff (from "Index:" to its first
+        # hunk) names the file; an added line can start "+++" too
+        in_header = False
+        for line in diff.split("\n"):
+            if line.startswith("Index:"):
+                in_header = True
+                ranges = None
+            elif in_header and line.startswith("+++ "):
+                # e.g. "+++ path/to/file.F90\t(working copy)"
+                ranges = changed.setdefault(line[4:].split("\t")[0].strip(), [])
+            elif match := re.match(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@", line):
+                in_header = False
+                new_line = int(match.group(1))
+            elif ranges is None or in_header:
+                continue
+            elif line.startswith("+"):
+                if ranges and ranges[-1][1] == new_line - 1:
+                    ranges[-1] = (ranges[-1][0], new_line)
+                else:
+                    ranges.append((new_line, new_line))
+                new_line += 1
+            elif line.startswith(" "):
+                new_line += 1
+
+        relative_paths = list(changed)
+        full_paths = self._full_paths(relative_paths, path_override)
+        return {
+            full_path: changed[relative_path]
+            for full_path, relative_path in zip(full_paths, relative_paths)
+        }
+
     def get_bdiff_summarize(self, snooze=300, retries=0):
         """
         Extract the output of the branch diff command
@@ -339,6 +387,14 @@ class FCMBDiff(FCMBase):
         command = ["fcm", "bdiff", "--summarize", self._branch]
         return self.run_fcm_command(command, retries, snooze)
 
+    def get_bdiff(self, snooze=300, retries=0):
+        """
+        Extract the full (unified diff) output of the branch diff command
+        """
+
+        command = ["fcm", "bdiff", self._branch]
+        return self.run_fcm_command(command, retries, snooze)
+
 
 class FCMInfo(FCMBase):
     """
@@ -114,6 +114,10 @@ class GitBDiff(GitBase):
     # Match hex commit IDs
     _hash_pattern = re.compile(r"^\s*([0-9a-f]{40})\s*$")
 
+    # Match the new file name and the hunk headers of a unified diff
+    _new_file_pattern = re.compile(r"^\+\+\+ b/(.*)$")
+    _hunk_pattern = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
     def __init__(self, parent=None, repo=None):
         self.parent = parent or self.primary_branch
 
@@ -174,6 +178,38 @@ class GitBDiff(GitBase):
             if line != "":
                 yield line
 
+    def changed_lines(self):
+        """Get the lines changed on the branch.
+
+        Returns a dictionary of file name to a list of (first, last)
+        line number ranges, numbered from 1, of the lines added or
+        changed in each file.  Hunks which only delete lines are
+        ignored.
+        """
+
+        result = {}
+        ranges = None
+        # Only the header of each file's diff names the file; an added line
+        # can start "+++" too
+        in_header = False
+        for line in self.run_git(
+            ["diff", "-U0", "--no-color", "--no-ext-diff", "--diff-filter=AMX"]
+            # Fix the prefixes, whatever diff.noprefix and the like are set to
+            + ["--src-prefix=a/", "--dst-prefix=b/", self.ancestor]
+        ):
+            if line.startswith("diff "):
+                in_header = True
+                ranges = None
+            elif in_header and (m := self._new_file_pattern.match(line)):
+                ranges = result.setdefault(m.group(1), [])
+            elif (m := self._hunk_pattern.match(line)) and ranges is not None:
+                in_header = False
+                first = int(m.group(1))
+                count = 1 if m.group(2) is None else int(m.group(2))
+                if count > 0:
+                    ranges.append((first, first + count - 1))
+        return result
+
 
 class GitInfo(GitBase):
     """
@@ -172,6 +172,59 @@ def test_overwritten_branch(git_repo):
     assert len(changes) == 10
 
 
+def test_changed_lines(git_repo):
+    """Test the line ranges changed on a branch."""
+
+    os.chdir(git_repo)
+    subprocess.run(["git", "checkout", "overwrite"], check=True)
+    try:
+        bdiff = GitBDiff()
+        changed_lines = bdiff.changed_lines()
+    finally:
+        subprocess.run(["git", "checkout", "main"], check=True)
+
+    # Each file had a second line appended
+    assert sorted(changed_lines) == [f"file{i}" for i in range(10)]
+    assert changed_lines["file0"] == [(2, 2)]
+
+
+@pytest.mark.parametrize("option", ["diff.mnemonicPrefix", "diff.noprefix"])
+def test_changed_lines_diff_prefix(git_repo, monkeypatch, option):
+    """Test the user's diff prefix options don't change the file names."""
+
+    os.chdir(git_repo)
+    monkeypatch.setenv("GIT_CONFIG_COUNT", "1")
+    monkeypatch.setenv("GIT_CONFIG_KEY_0", option)
+    monkeypatch.setenv("GIT_CONFIG_VALUE_0", "true")
+    subprocess.run(["git", "checkout", "overwrite"], check=True)
+    try:
+        changed_lines = GitBDiff().changed_lines()
+    finally:
+        subprocess.run(["git", "checkout", "main"], check=True)
+
+    assert sorted(changed_lines) == [f"file{i}" for i in range(10)]
+
+
+def test_changed_lines_like_headers(git_repo):
+    """Test added lines which look like the header of a file's diff."""
+
+    os.chdir(git_repo)
+    subprocess.run(["git", "checkout", "-b", "plusplus", "main"], check=True)
+    try:
+        with open("file0", "wt", encoding="utf-8") as fd:
+            print("Lorem ipsum dolor sit amet 0", file=fd)
+            print("++ not a file name", file=fd)
+            print("kept", file=fd)
+        with open("file1", "wt", encoding="utf-8") as fd:
+            print("-- removed", file=fd)
+        subprocess.run(["git", "commit", "-a", "--no-gpg-sign", "-m", "++"], check=True)
+        changed_lines = GitBDiff().changed_lines()
+    finally:
+        subprocess.run(["git", "checkout", "main"], check=True)
+
+    assert changed_lines == {"file0": [(2, 3)], "file1": [(1, 1)]}
+
+
 def test_unchanged_branch(git_repo):
     """Test a branch with no commits."""
 
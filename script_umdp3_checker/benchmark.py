@@ -0,0 +1,376 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+Benchmarks for the UMDP3 checker, run on a synthetic corpus of UM style
+Fortran.
+
+The corpus is generated from a seed, so the same options always give the
+same files. Each rule is timed on its own over the whole corpus, then whole
+ConformanceChecker runs are timed for each executor and number of workers.
+Timings can be saved as a baseline, and a later run compared against it,
+failing if anything has slowed down by more than a tolerance.
+
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --compare baseline.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from checker_dispatch_tables import CheckerDispatchTables
+from fortran_source_view import FortranSourceView
+from rule_profile import read_rule_name
+from umdp3_conformance import ConformanceChecker, create_style_checkers
+
+# Timings shorter than this (in seconds) are too noisy to count as regressions
+noise_floor = 0.005
+
+variable_names = [
+    "i",
+    "j",
+    "k",
+    "row_length",
+    "rows",
+    "model_levels",
+    "theta",
+    "exner_theta_levels",
+    "p_star",
+    "q_cl",
+    "timestep",
+    "l_first_call",
+]
+
+cpp_macros = ["UM_JULES", "C95_2A", "MPP", "_OPENMP", "DEBUG_CHECKS"]
+
+
+def continuation_chain(rng: random.Random, target: str, length: int) -> List[str]:
+    """An assignment broken over several continuation lines."""
+    lines = [f"{target} = {rng.choice(variable_names)}(i, j)                      &"]
+    for _ in range(length - 2):
+        lines.append(
+            f"       + {rng.uniform(0, 10):.4f} * {rng.choice(variable_names)}(i, j)"
+            "           &"
+        )
+    lines.append(f"       - {rng.choice(variable_names)}(i, j)")
+    return lines
+
+
+def generate_block(rng: random.Random) -> List[str]:
+    """A randomly chosen block of executable statements, occasionally
+    containing a breach of the standards for the rules to find."""
+    kind = rng.choice(["loop", "omp", "cpp", "comment", "chain", "io", "legacy"])
+    variable = rng.choice(variable_names)
+    if kind == "loop":
+        return [
+            "DO k = 1, model_levels",
+            "  DO j = 1, rows",
+            "    DO i = 1, row_length",
+            f"      {variable}(i, j, k) = {variable}(i, j, k) * timestep",
+            "    END DO",
+            "  END DO",
+            "END DO",
+        ]
+    if kind == "omp":
+        return [
+            "!$OMP PARALLEL DO DEFAULT(NONE) SCHEDULE(STATIC)                 &",
+            f"!$OMP SHARED({variable}, rows, row_length) PRIVATE(i, j)",
+            "DO j = 1, rows",
+            "  DO i = 1, row_length",
+            f"    {variable}(i, j) = 0.0",
+            "  END DO",
+            "END DO",
+            "!$OMP END PARALLEL DO",
+        ]
+    if kind == "cpp":
+        macro = rng.choice(cpp_macros)
+        if rng.random() < 0.1:
+            directive = f"#ifdef {macro}"
+        else:
+            directive = f"#if defined({macro})"
+        return [
+            directive,
+            f"CALL {macro.lower().strip('_')}_step({variable})",
+            "#else",
+            f"{variable} = 0.0",
+            "#endif",
+        ]
+    if kind == "comment":
+        return [
+            "! Comments may contain 'quotes' and \"double quotes\", which",
+            "! mustn't confuse the rules : e.g. don't GO TO 10 or use .GT.",
+            f"! The {variable} isn't updated here.",
+        ]
+    if kind == "chain":
+        return continuation_chain(rng, variable, rng.randint(3, 12))
+    if kind == "io":
+        return [
+            f"WRITE(umMessage, '(A, I0)') 'Value of {variable} : ', i",
+            "CALL umPrint(umMessage, src=RoutineName)",
+        ]
+    # Legacy code, with a selection of the things the rules look for
+    return rng.choice(
+        [
+            [f"if ({variable} .GT. 0.0) go to 10"],
+            ["PRINT *, 'Old style output'"],
+            [f"{variable} = {variable} + 1.0  "],
+            ["STOP"],
+        ]
+    )
+
+
+def generate_file(rng: random.Random, index: int, no_of_lines: int) -> str:
+    """A UM style Fortran module of roughly no_of_lines lines."""
+    name = f"synthetic_{index:04d}_mod"
+    lines = [
+        "! *****************************COPYRIGHT*******************************",
+        "! (C) Crown copyright Met Office. All rights reserved.",
+        "! For further details please refer to the file COPYRIGHT.txt",
+        "! which you should have received as part of this distribution.",
+        "! *****************************COPYRIGHT*******************************",
+        "!",
+        "! Code Owner: Please refer to the UM file CodeOwners.txt",
+        "! This file belongs in section: Synthetic",
+        f"MODULE {name}",
+        "",
+        "USE, INTRINSIC :: ISO_C_BINDING, ONLY: C_INT",
+        "USE umPrintMgr, ONLY: umPrint, umMessage",
+        "IMPLICIT NONE",
+        "",
+        f"CHARACTER(LEN=*), PARAMETER, PRIVATE :: ModuleName = '{name.upper()}'",
+        "",
+        "CONTAINS",
+        "",
+        f"SUBROUTINE {name}_step()",
+        "IMPLICIT NONE",
+        "INTEGER :: i, j, k",
+        "REAL, ALLOCATABLE :: " + ", ".join(f"{v}(:, :)" for v in variable_names[3:]),
+        "CHARACTER(LEN=*), PARAMETER :: RoutineName = 'STEP'",
+        "",
+    ]
+    while len(lines) < no_of_lines:
+        lines.extend(generate_block(rng))
+    lines += [
+        "",
+        f"END SUBROUTINE {name}_step",
+        "",
+        f"END MODULE {name}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def generate_corpus(
+    directory: Path, no_of_files: int = 50, no_of_lines: int = 500, seed: int = 1
+) -> List[Path]:
+    """Write a reproducible corpus of synthetic Fortran files to directory."""
+    rng = random.Random(seed)
+    files = []
+    for index in range(no_of_files):
+        file_path = directory / f"synthetic_{index:04d}.F90"
+        file_path.write_text(generate_file(rng, index, no_of_lines))
+        files.append(file_path)
+    return files
+
+
+def best_time(function: Callable[[], object], repeats: int) -> float:
+    """Shortest wall time of several calls of function."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def time_rules(files: List[Path], repeats: int = 3) -> Dict[str, float]:
+    """Time each Fortran rule on its own over all the files. The files are
+    read and pre-lexed first, which is timed separately."""
+    dispatch_tables = CheckerDispatchTables()
+    rules = (
+        dispatch_tables.get_diff_dispatch_table_fortran()
+        | dispatch_tables.get_file_dispatch_table_fortran()
+        | dispatch_tables.get_file_dispatch_table_all()
+    )
+
+    def read_files():
+        return [FortranSourceView(f.read_text().splitlines()) for f in files]
+
+    timings = {read_rule_name: best_time(read_files, repeats)}
+    views = read_files()
+    for name, rule in rules.items():
+        timings[name] = best_time(lambda: [rule(view) for view in views], repeats)
+    return timings
+
+
+def time_runs(
+    files: List[Path], executors: List[str], workers: List[int], repeats: int = 3
+) -> Dict[str, float]:
+    """Time whole ConformanceChecker runs (without a results cache) for each
+    executor and number of workers."""
+    timings = {}
+    for executor in executors:
+        for max_workers in workers:
+
+            def run():
+                checkers = create_style_checkers(["Fortran"], files, print_volume=0)
+                ConformanceChecker(
+                    checkers, max_workers=max_workers, executor=executor
+                ).check_files()
+
+            timings[f"{executor} x {max_workers}"] = best_time(run, repeats)
+    return timings
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.25) -> List[str]:
+    """Describe each timing which is more than tolerance (a fraction) slower
+    than in the baseline. Timings under the noise_floor are ignored."""
+    regressions = []
+    for section in ("rules", "runs"):
+        for name, seconds in results[section].items():
+            old_seconds = baseline.get(section, {}).get(name)
+            if old_seconds is None or seconds < noise_floor:
+                continue
+            if seconds > old_seconds * (1 + tolerance):
+                regressions.append(
+                    f"{section} : {name} : {old_seconds:.4f}s -> {seconds:.4f}s "
+                    f"({100 * (seconds / old_seconds - 1):+.0f}%)"
+                )
+    return regressions
+
+
+def run_benchmarks(
+    directory: Path,
+    no_of_files: int,
+    no_of_lines: int,
+    seed: int,
+    executors: List[str],
+    workers: List[int],
+    repeats: int,
+) -> Dict:
+    """Generate the corpus in directory and run all the benchmarks on it."""
+    files = generate_corpus(directory, no_of_files, no_of_lines, seed)
+    return {
+        "parameters": {"files": no_of_files, "lines": no_of_lines, "seed": seed},
+        "rules": time_rules(files, repeats),
+        "runs": time_runs(files, executors, workers, repeats),
+    }
+
+
+def print_results(results: Dict, baseline: Optional[Dict] = None) -> None:
+    """Print the timings, along with the baseline timings if given."""
+    for section in ("rules", "runs"):
+        print(f"{section.capitalize()} :")
+        for name, seconds in sorted(results[section].items(), key=lambda x: -x[1]):
+            old = ""
+            if baseline and name in baseline.get(section, {}):
+                old = f" (baseline {baseline[section][name]:9.4f})"
+            print(f"    {seconds:9.4f}{old}  {name}")
+
+
+def process_arguments():
+    """Process command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="benchmark.py",
+        description="Benchmark the UMDP3 checker on a synthetic Fortran corpus",
+    )
+    parser.add_argument("--files", type=int, default=50, help="Number of files")
+    parser.add_argument(
+        "--lines", type=int, default=500, help="Approximate lines per file"
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Corpus random seed")
+    parser.add_argument(
+        "--executor",
+        type=str,
+        nargs="+",
+        choices=ConformanceChecker.executors,
+        default=list(ConformanceChecker.executors),
+        help="Executors to time whole runs with",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4],
+        help="Numbers of workers to time whole runs with",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Take the best of this many runs"
+    )
+    parser.add_argument(
+        "--corpus-dir",
+        type=str,
+        default=None,
+        help="Write the corpus here (and keep it) rather than a temporary directory",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Save the timings to FILE as a baseline",
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Compare the timings with the baseline in FILE, exiting with "
+        "a failure if any are slower by more than the tolerance",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Fraction by which a timing may exceed the baseline",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = process_arguments()
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = Path(args.corpus_dir or temp_dir)
+        corpus_dir.mkdir(parents=True, exist_ok=True)
+        results = run_benchmarks(
+            corpus_dir,
+            args.files,
+            args.lines,
+            args.seed,
+            args.executor,
+            args.workers,
+            args.repeats,
+        )
+
+    print_results(results, baseline)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if baseline is not None:
+        if baseline.get("parameters") != results["parameters"]:
+            print(
+                "The baseline was made with a different corpus "
+                f"({baseline.get('parameters')}), so can't be compared."
+            )
+            sys.exit(2)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline by more than {args.tolerance:.0%} :")
+            for regression in regressions:
+                print(f"    {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
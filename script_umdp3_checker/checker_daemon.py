@@ -0,0 +1,383 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+A long running checker daemon, and a thin client for it, for pre-commit
+hooks and editors, where starting Python, importing the checker and
+building the dispatch tables would take far longer than the check itself.
+
+The daemon listens on a Unix socket, keeping the checkers and results cache
+warm between requests. Each request is a single line of JSON, e.g.
+
+    {"command": "check", "paths": ["/abs/path/file.F90"]}
+    {"command": "check", "files": [{"name": "file.F90", "content": "..."}]}
+    {"command": "ping"} or {"command": "shutdown"}
+
+and is answered with a single line of JSON holding the results (as given by
+dataclasses.asdict on each CheckResult) or an error. The client starts the
+daemon if it isn't running, and restarts it if it's from another version of
+the checker. The daemon exits once idle for --idle-timeout seconds.
+
+    python checker_daemon.py check file.F90 other.F90
+    python checker_daemon.py check --stdin-name file.F90 < file.F90
+    python checker_daemon.py stop
+"""
+
+import argparse
+import copy
+import json
+import os
+import socket
+import socketserver
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from result_cache import ResultCache
+from umdp3_checker_rules import VERSION
+from umdp3_conformance import (
+    CheckResult,
+    ConformanceChecker,
+    StyleChecker,
+    create_style_checkers,
+)
+
+default_file_types = ["Fortran"]
+
+
+def default_socket_path() -> Path:
+    """Socket for the daemon of the current user, if one isn't given.
+    Without $XDG_RUNTIME_DIR, it's in a directory of the shared temporary
+    directory which only the user can use."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / f"umdp3_checker-{os.getuid()}.sock"
+    socket_dir = Path(tempfile.gettempdir()) / f"umdp3_checker-{os.getuid()}"
+    try:
+        socket_dir.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    check_private(socket_dir, stat.S_ISDIR)
+    return socket_dir / "daemon.sock"
+
+
+def check_private(path: Path, is_type=stat.S_ISSOCK) -> None:
+    """Raise a PermissionError unless path (not followed if it's a link) is
+    of the type expected, owned by the current user and only usable by
+    them, so another user can't stand in for the daemon."""
+    status = os.lstat(path)
+    if (
+        not is_type(status.st_mode)
+        or status.st_uid != os.getuid()
+        or status.st_mode & 0o077
+    ):
+        raise PermissionError(
+            f"{path} must be owned by, and only accessible to, the current user"
+        )
+
+
+class CheckerDaemon:
+    """Answers requests, holding the checkers for each combination of file
+    types asked for, and the results cache, between requests."""
+
+    def __init__(self, cache: Optional[ResultCache] = None, max_workers: int = 4):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.stopping = False
+        # Checkers without any files, keyed by the file types they check
+        self._checkers: Dict[Tuple[str, ...], List[StyleChecker]] = {}
+
+    def checkers_for(self, file_types: List[str]) -> List[StyleChecker]:
+        """The (warm) checkers for some file types, without any files."""
+        key = tuple(sorted(file_types))
+        if key not in self._checkers:
+            self._checkers[key] = create_style_checkers(list(key), [], print_volume=0)
+        return self._checkers[key]
+
+    def handle(self, request: Dict) -> Dict:
+        """Answer a request, returning the response."""
+        command = request.get("command", "check")
+        if command == "ping":
+            return {}
+        if command == "shutdown":
+            self.stopping = True
+            return {}
+        if command == "check":
+            return self.check(request)
+        raise ValueError(f"Unknown command '{command}'")
+
+    def check(self, request: Dict) -> Dict:
+        """Check the files at the (absolute) paths and the file contents
+        given in a request."""
+        file_types = request.get("file_types") or default_file_types
+        paths = [Path(path) for path in request.get("paths", [])]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Contents are written to a file of the same name (so extension)
+            # and reported under the name given.
+            names = {}
+            for index, file in enumerate(request.get("files", [])):
+                file_path = Path(temp_dir) / str(index) / Path(file["name"]).name
+                file_path.parent.mkdir()
+                file_path.write_text(file["content"])
+                names[str(file_path)] = file["name"]
+                paths.append(file_path)
+
+            checkers = []
+            for checker in self.checkers_for(file_types):
+                checker = copy.copy(checker)
+                checker.files_to_check = checker.filter_files(
+                    paths, checker.file_extensions
+                )
+                checkers.append(checker)
+            conformance = ConformanceChecker(
+                checkers, max_workers=self.max_workers, cache=self.cache
+            )
+            try:
+                conformance.check_files()
+            finally:
+                # Don't hold the database locked while waiting for requests
+                if self.cache is not None:
+                    self.cache.commit()
+
+        results = []
+        for result in conformance.results:
+            result.file_path = names.get(result.file_path, result.file_path)
+            results.append(asdict(result))
+        return {
+            "results": results,
+            "all_passed": all(result["all_passed"] for result in results),
+        }
+
+
+class CheckerRequestHandler(socketserver.StreamRequestHandler):
+    """Reads a request line, and writes back the response line."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            response = self.server.checker_daemon.handle(request)
+        except Exception as error:
+            # Report the problem to the client, rather than kill the daemon
+            response = {"error": f"{type(error).__name__}: {error}"}
+        response["version"] = VERSION
+        self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+class CheckerServer(socketserver.UnixStreamServer):
+    """Unix socket server, handling one request at a time so the results
+    cache is only ever used from one thread. Stops once idle for timeout
+    seconds."""
+
+    def __init__(self, socket_path: Path, checker_daemon: CheckerDaemon):
+        self.checker_daemon = checker_daemon
+        super().__init__(str(socket_path), CheckerRequestHandler)
+
+    def server_bind(self):
+        # Make the socket usable by this user alone from the start, rather
+        # than once others could already have connected to it
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def handle_timeout(self):
+        self.checker_daemon.stopping = True
+
+
+def serve(
+    socket_path: Path,
+    checker_daemon: CheckerDaemon,
+    idle_timeout: Optional[float] = 1800,
+) -> None:
+    """Run the daemon until it's told to stop or it's idle for too long."""
+    socket_path = Path(socket_path)
+    if socket_path.exists():
+        if is_running(socket_path):
+            return
+        # Left behind by a daemon which didn't exit cleanly
+        socket_path.unlink()
+    try:
+        with CheckerServer(socket_path, checker_daemon) as server:
+            server.timeout = idle_timeout
+            while not checker_daemon.stopping:
+                server.handle_request()
+    finally:
+        socket_path.unlink(missing_ok=True)
+        if checker_daemon.cache is not None:
+            checker_daemon.cache.close()
+
+
+def send_request(request: Dict, socket_path: Path, timeout: float = 300) -> Dict:
+    """Send a request to the daemon, and return its response."""
+    check_private(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(socket_path))
+        client.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        client.shutdown(socket.SHUT_WR)
+        chunks = []
+        while chunk := client.recv(65536):
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+def is_running(socket_path: Path) -> bool:
+    """Whether a daemon is answering on the socket."""
+    try:
+        send_request({"command": "ping"}, socket_path, timeout=5)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def wait_for(condition, wait: float) -> bool:
+    """Poll condition until it's true, for up to wait seconds."""
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+def start_daemon(socket_path: Path, wait: float = 20.0) -> None:
+    """Start a daemon in the background, and wait until it's answering."""
+    subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve())]
+        + ["--socket", str(socket_path), "serve"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    if not wait_for(lambda: is_running(socket_path), wait):
+        raise RuntimeError(f"Checker daemon didn't start on {socket_path}")
+
+
+def request_check(request: Dict, socket_path: Path, autostart: bool = True) -> Dict:
+    """Send a request to the daemon, starting it if need be, or restarting
+    it if it's from a different version of the checker."""
+    try:
+        response = send_request(request, socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not autostart:
+            raise
+        start_daemon(socket_path)
+        response = send_request(request, socket_path)
+    if autostart and response.get("version") != VERSION:
+        send_request({"command": "shutdown"}, socket_path)
+        wait_for(lambda: not socket_path.exists(), 10.0)
+        start_daemon(socket_path)
+        response = send_request(request, socket_path)
+    if "error" in response:
+        raise RuntimeError(f"Checker daemon failed : {response['error']}")
+    return response
+
+
+def process_arguments():
+    """Process command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="checker_daemon.py",
+        description="UMDP3 Conformance Checker daemon and client",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=default_socket_path(),
+        help="Unix socket of the daemon",
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the daemon")
+    serve_parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=1800,
+        help="Exit after this many seconds without a request",
+    )
+    serve_parser.add_argument(
+        "--max-workers", type=int, default=4, help="Threads used for each check"
+    )
+    serve_parser.add_argument(
+        "--no-cache", action="store_true", help="Don't use the results cache"
+    )
+    serve_parser.add_argument(
+        "--cache-file", type=str, default=None, help="Results cache database"
+    )
+
+    check_parser = subparsers.add_parser("check", help="Check files")
+    check_parser.add_argument("paths", nargs="*", help="Files to check")
+    check_parser.add_argument(
+        "-f",
+        "--file-types",
+        type=str,
+        nargs="+",
+        choices=["Fortran", "C", "Python", "Generic"],
+        default=default_file_types,
+        help="File types to check",
+    )
+    check_parser.add_argument(
+        "--stdin-name",
+        type=str,
+        default=None,
+        help="Also check the contents of stdin, as a file of this name",
+    )
+    check_parser.add_argument(
+        "--no-autostart",
+        action="store_true",
+        help="Fail, rather than start the daemon, if it isn't running",
+    )
+    check_parser.add_argument(
+        "--json", action="store_true", help="Print the results as JSON"
+    )
+    check_parser.add_argument(
+        "-v", "--verbose", action="count", default=0, help="Increase verbosity"
+    )
+
+    subparsers.add_parser("stop", help="Stop the daemon")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = process_arguments()
+
+    if args.action == "serve":
+        cache = None
+        if not args.no_cache:
+            cache = ResultCache(args.cache_file, version=VERSION)
+        serve(
+            args.socket,
+            CheckerDaemon(cache, max_workers=args.max_workers),
+            idle_timeout=args.idle_timeout,
+        )
+
+    elif args.action == "stop":
+        if is_running(args.socket):
+            send_request({"command": "shutdown"}, args.socket)
+
+    else:
+        request = {
+            "command": "check",
+            "file_types": args.file_types,
+            "paths": [str(Path(path).resolve()) for path in args.paths],
+        }
+        if args.stdin_name:
+            request["files"] = [{"name": args.stdin_name, "content": sys.stdin.read()}]
+        response = request_check(request, args.socket, not args.no_autostart)
+        if args.json:
+            print(json.dumps(response, indent=2))
+        else:
+            for result in response["results"]:
+                ConformanceChecker.print_result(
+                    CheckResult.from_dict(result), print_volume=3 + args.verbose
+                )
+        sys.exit(0 if response["all_passed"] else 1)
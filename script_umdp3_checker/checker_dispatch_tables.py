@@ -21,7 +21,7 @@ TODO : And the tests need to be compared to the original Perl tests
 """
 
 # Declare version
-VERSION = "13.5.0"
+VERSION = "13.5.2"
 
 
 class CheckerDispatchTables:
@@ -92,7 +92,7 @@ class CheckerDispatchTables:
         return {
             "Warning - used an if-def due for retirement": self.umdp3_checker.retire_if_def,
             "Used a deprecated C identifier": self.umdp3_checker.c_deprecated,
-            "File missing crown copyright statement or agreement reference": self.umdp3_checker.check_crown_copyright,
+            "File missing crown copyright statement or agreement reference": self.umdp3_checker.c_crown_copyright,
             "File missing correct code owner comment": self.umdp3_checker.check_code_owner,
             "Used an _OPENMP if-def without also testing against "
             + "SHUM_USE_C_OPENMP_VIA_THREAD_UTILS. (Or _OPENMP does "
@@ -0,0 +1,129 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+Find the files to check when checking a whole repository.
+
+Within a git working copy the file list comes from "git ls-files", so
+ignored files and the contents of .git are never looked at. Otherwise the
+directory tree is walked with os.scandir, without descending into version
+control or cache directories. Files are filtered on extension before being
+opened, and binary or very large files are skipped.
+"""
+
+import os
+import subprocess
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
+
+# Directories never worth descending into when walking a tree
+ignored_directories = {
+    ".git",
+    ".svn",
+    ".hg",
+    "__pycache__",
+    ".pytest_cache",
+    ".mypy_cache",
+    ".ruff_cache",
+    ".tox",
+    ".nox",
+    ".venv",
+}
+
+# Files larger than this (in bytes) are assumed to be generated or data
+max_file_size = 5 * 1024 * 1024
+
+# Number of bytes read from the start of a file to decide if it's binary
+binary_sniff_size = 8192
+
+
+def git_files(top: Path) -> Optional[List[str]]:
+    """Tracked and untracked, but not ignored, files below top, relative to
+    top. Returns None if top isn't in a git working copy (or git is
+    unavailable)."""
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=top,
+            capture_output=True,
+            check=False,
+        )
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    names = result.stdout.decode("utf-8", errors="surrogateescape").split("\0")
+    # --cached and --others can both list a file, e.g. if deleted and re-added
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def walk_files(top: Path) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Walk the tree below top, yielding (path relative to top, DirEntry)
+    for each file, without entering any of the ignored_directories."""
+    directories = [top]
+    while directories:
+        directory = directories.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in ignored_directories:
+                    directories.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield os.path.relpath(entry.path, top), entry
+
+
+def is_binary(file_path: Path) -> bool:
+    """Guess whether a file is binary, from a NUL byte near its start."""
+    try:
+        with open(file_path, "rb") as file_in:
+            return b"\0" in file_in.read(binary_sniff_size)
+    except OSError:
+        return True
+
+
+def discover_files(
+    path: str,
+    file_extensions: Optional[Set[str]] = None,
+    max_size: int = max_file_size,
+) -> List[Path]:
+    """
+    List the files below path worth checking, relative to path.
+
+    :param path: Top level directory to search.
+    :param file_extensions: Only keep files with one of these suffixes.
+        None (or empty) keeps files with any suffix.
+    :param max_size: Skip files larger than this many bytes.
+    :return: Sorted list of relative file paths.
+    """
+    top = Path(path)
+    names = git_files(top)
+    if names is None:
+        candidates = ((name, entry.stat().st_size) for name, entry in walk_files(top))
+    else:
+        candidates = ((name, None) for name in names)
+
+    files = []
+    for name, size in candidates:
+        relative_path = Path(name)
+        if file_extensions and relative_path.suffix not in file_extensions:
+            continue
+        if size is None and ignored_directories.intersection(relative_path.parts):
+            # e.g. an untracked .svn directory within a git working copy
+            continue
+        full_path = top / relative_path
+        if size is None:
+            try:
+                size = full_path.stat().st_size
+            except OSError:
+                # Listed by git, but deleted from the working copy
+                continue
+        if size > max_size or is_binary(full_path):
+            continue
+        files.append(relative_path)
+    return sorted(files)
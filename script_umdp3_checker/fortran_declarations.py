@@ -0,0 +1,140 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+A symbol table of the names declared in a Fortran source file, built in a
+single pass over its statements (with continuation lines already joined),
+so rules about declarations can answer with dictionary lookups rather than
+each searching every line with regular expressions.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Start of a type declaration statement, up to any kind or length selector
+type_declaration = re.compile(
+    r"(INTEGER|REAL|LOGICAL|CHARACTER|COMPLEX|DOUBLE\s*PRECISION|TYPE|CLASS)\b",
+    re.IGNORECASE,
+)
+dimension_statement = re.compile(r"DIMENSION\b\s*(::)?", re.IGNORECASE)
+entity_name = re.compile(r"\s*(\w+)")
+
+opening_brackets = "(["
+closing_brackets = ")]"
+
+
+def split_top_level(text: str, separator: str, max_split: int = -1) -> List[str]:
+    """Split text on separator, except where it's within brackets."""
+    parts = []
+    depth = 0
+    start = 0
+    index = 0
+    while index < len(text):
+        character = text[index]
+        if character in opening_brackets:
+            depth += 1
+        elif character in closing_brackets:
+            depth = max(0, depth - 1)
+        elif depth == 0 and text.startswith(separator, index):
+            if max_split < 0 or len(parts) < max_split:
+                parts.append(text[start:index])
+                index += len(separator)
+                start = index
+                continue
+        index += 1
+    parts.append(text[start:])
+    return parts
+
+
+@dataclass(frozen=True)
+class Declaration:
+    """
+    A name declared by a type declaration or DIMENSION statement.
+        name       : The name, as written.
+        type_spec  : The upper case type, e.g. "INTEGER", "REAL(KIND=REAL64)"
+                     or "TYPE(MY_TYPE)". Empty for a DIMENSION statement.
+        attributes : The upper case attributes, e.g. ("DIMENSION(10)",).
+        line       : Number (from 1) of the first line of the statement.
+    """
+
+    name: str
+    type_spec: str
+    attributes: Tuple[str, ...]
+    line: int
+
+    def has_attribute(self, attribute: str) -> bool:
+        """Whether any of the attributes is (or starts with) attribute."""
+        return any(
+            declared == attribute or declared.startswith(attribute + "(")
+            for declared in self.attributes
+        )
+
+
+def parse_declaration(line: int, code: str) -> List[Declaration]:
+    """The names declared by a statement, or an empty list if it isn't a
+    declaration. Only declarations using "::" are recognised, other than
+    DIMENSION statements, which don't need it."""
+    code = code.strip()
+    if match := dimension_statement.match(code):
+        type_spec = ""
+        attributes = ("DIMENSION",)
+        entities = code[match.end() :]
+    elif type_declaration.match(code):
+        specification, *rest = split_top_level(code, "::", max_split=1)
+        if not rest:
+            return []
+        type_spec, *attributes = [
+            part.strip().upper() for part in split_top_level(specification, ",")
+        ]
+        type_spec = re.sub(r"\s+", "", type_spec)
+        attributes = tuple(re.sub(r"\s+", "", attribute) for attribute in attributes)
+        entities = rest[0]
+    else:
+        return []
+    declarations = []
+    for entity in split_top_level(entities, ","):
+        if match := entity_name.match(entity):
+            declarations.append(
+                Declaration(match.group(1), type_spec, attributes, line)
+            )
+    return declarations
+
+
+class SymbolTable:
+    """The names declared in a file, in the order declared, and keyed by
+    their upper case name (for the first declaration of each name)."""
+
+    def __init__(self, declarations: Iterable[Declaration]):
+        self.declarations = list(declarations)
+        self.symbols: Dict[str, Declaration] = {}
+        for declaration in self.declarations:
+            self.symbols.setdefault(declaration.name.upper(), declaration)
+
+    @classmethod
+    def from_statements(cls, statements: List[Tuple[int, str]]) -> "SymbolTable":
+        """Build the table from (index of first line, joined code) pairs,
+        as given by FortranSourceView.statements."""
+        return cls(
+            declaration
+            for index, code in statements
+            for declaration in parse_declaration(index + 1, code)
+        )
+
+    def __contains__(self, name: str) -> bool:
+        return name.upper() in self.symbols
+
+    def get(self, name: str) -> Optional[Declaration]:
+        """The first declaration of a name (in any case), or None."""
+        return self.symbols.get(name.upper())
+
+    def with_attribute(self, attribute: str) -> List[Declaration]:
+        """All the declarations with the given attribute."""
+        return [
+            declaration
+            for declaration in self.declarations
+            if declaration.has_attribute(attribute)
+        ]
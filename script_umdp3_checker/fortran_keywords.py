@@ -9,6 +9,8 @@ List of the Fortran Keywords for the UMDP3 checker to check against.
 Hopefully complete, but may need to be updated from time to time.
 These have been 'ordered' in terms of frequency of occurrence within
 the UM codebase in order to improve efficiency.
+Membership tests should use the frozenset 'fortran_keywords_set', which is a
+hash lookup rather than a scan of the whole tuple.
 """
 
 """
@@ -694,3 +696,6 @@ fortran_keywords = (
     ".NE.",
     ".XOR.",
 )
+
+# Immutable hashed index of the keywords above, for membership tests.
+fortran_keywords_set = frozenset(fortran_keywords)
@@ -0,0 +1,174 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+A pre-lexed view of a Fortran source file, built once per file and shared by
+all of the UMDP3 rules, rather than each rule re-cleaning every line.
+"""
+
+import re
+from collections.abc import Sequence
+from functools import cached_property
+from typing import FrozenSet, List, Optional, Tuple
+from fortran_declarations import SymbolTable
+
+# precompiled, regularly used search patterns.
+double_quoted = re.compile(r'"[^"]*"')
+single_quoted = re.compile(r"'[^']*'")
+comment_text = re.compile(r"!.*$")
+word_pattern = re.compile(r"\w+")
+
+
+def remove_quoted(line: str) -> str:
+    """Remove quoted strings from a line"""
+    # Simple implementation - remove double, then single quoted strings
+    return single_quoted.sub("", double_quoted.sub("", line))
+
+
+class FortranSourceView(Sequence):
+    """
+    The lines of a file, along with the commonly used 'cleaned' forms of
+    each line. Behaves as a sequence of the raw lines, so can be passed to
+    anything expecting a list of lines.
+
+    Attributes, each holding one entry per line :
+        lines     : The raw lines.
+        unquoted  : Lines with quoted strings removed.
+        code      : Lines with quoted strings and then comments removed.
+        is_comment: True for lines whose first non-space character is "!".
+    final_newline records whether the text of the file ended with a newline,
+    which splitting it into lines loses.
+    """
+
+    """
+    TODO : The quote removal matches the original per-rule implementation,
+        which knows nothing of quotes within comments or strings spanning
+        continuation lines. A proper tokeniser would be more accurate."""
+
+    def __init__(self, lines: List[str], final_newline: bool = True):
+        self.lines = lines
+        self.final_newline = final_newline
+        self.unquoted = [remove_quoted(line) for line in lines]
+        self.code = [comment_text.sub("", line) for line in self.unquoted]
+        self.is_comment = [line.lstrip(" ").startswith("!") for line in lines]
+        self._words = {}
+
+    @classmethod
+    def of(cls, lines) -> "FortranSourceView":
+        """Return lines as a FortranSourceView, building one only if needed."""
+        if isinstance(lines, cls):
+            return lines
+        return cls(list(lines))
+
+    @classmethod
+    def from_text(cls, text: str) -> "FortranSourceView":
+        """Build a view of the lines of the text of a file."""
+        return cls(text.splitlines(), final_newline=text.endswith("\n") or not text)
+
+    def __getitem__(self, index):
+        return self.lines[index]
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def words(self, source: str = "code") -> List[FrozenSet[str]]:
+        """The set of upper case words on each of the 'source' lines
+        (e.g. "code" or "unquoted"). Found once per source and kept."""
+        if source not in self._words:
+            self._words[source] = [
+                frozenset(word_pattern.findall(line.upper()))
+                for line in getattr(self, source)
+            ]
+        return self._words[source]
+
+    def statement_ranges(self, ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Widen (first, last) line ranges, numbered from 1, to cover the
+        whole of any continued statement they start or finish part way
+        through."""
+        widened = []
+        for first, last in ranges:
+            first = max(1, first)
+            last = min(len(self.lines), last)
+            if first > last:
+                continue
+            # Step back while the previous code line is continued onto this one
+            previous = first - 1
+            while previous >= 1 and (
+                self.is_comment[previous - 1]
+                or self.code[previous - 1].rstrip().endswith("&")
+            ):
+                if not self.is_comment[previous - 1]:
+                    first = previous
+                previous -= 1
+            # Step forward while the last code line is continued onto the next
+            code_line = last
+            while code_line > first and self.is_comment[code_line - 1]:
+                code_line -= 1
+            continued = self.code[code_line - 1].rstrip().endswith("&")
+            while continued and last < len(self.lines):
+                last += 1
+                if not self.is_comment[last - 1]:
+                    continued = self.code[last - 1].rstrip().endswith("&")
+            widened.append((first, last))
+        return widened
+
+    def only_lines(self, ranges: List[Tuple[int, int]]) -> "FortranSourceView":
+        """A view of the same file in which only the lines within the given
+        (first, last) ranges, widened to whole statements, are kept. Every
+        other line is blanked, so line numbers are unchanged."""
+        keep = [False] * len(self.lines)
+        for first, last in self.statement_ranges(ranges):
+            keep[first - 1 : last] = [True] * (last - first + 1)
+        return FortranSourceView(
+            [line if kept else "" for line, kept in zip(self.lines, keep)],
+            final_newline=self.final_newline,
+        )
+
+    @cached_property
+    def comments(self) -> List[Optional[str]]:
+        """The comment (from the "!" onwards) on each line, or None.
+        Found on the quote removed line, so a "!" within a string is not
+        mistaken for the start of a comment."""
+        comments = []
+        for line in self.unquoted:
+            match = comment_text.search(line)
+            comments.append(match.group(0) if match else None)
+        return comments
+
+    @cached_property
+    def statements(self) -> List[Tuple[int, str]]:
+        """The code of each statement, with continuation lines joined.
+        Returns a list of (index of first line, joined code) tuples.
+        Comment only lines within a continued statement are skipped."""
+        statements = []
+        start = None
+        parts = []
+        for count, code in enumerate(self.code):
+            if self.is_comment[count]:
+                continue
+            stripped = code.strip()
+            if not stripped and start is None:
+                continue
+            if start is None:
+                start = count
+            if parts and stripped.startswith("&"):
+                stripped = stripped[1:].lstrip()
+            if stripped.endswith("&"):
+                parts.append(stripped[:-1].rstrip())
+                continue
+            parts.append(stripped)
+            statements.append((start, " ".join(parts)))
+            start = None
+            parts = []
+        if parts:
+            statements.append((start, " ".join(parts)))
+        return statements
+
+    @cached_property
+    def symbol_table(self) -> SymbolTable:
+        """The names declared in the file, found in one pass over the
+        statements, so declarations over continuation lines are seen."""
+        return SymbolTable.from_statements(self.statements)
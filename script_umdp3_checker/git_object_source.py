@@ -0,0 +1,189 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+Read the files of a commit straight from the git object store, so a branch
+or commit can be checked in a bare mirror without a clone or checkout.
+
+The blobs are read through a single long running "git cat-file --batch"
+process, rather than starting git for every file. File paths are relative
+to the top of the repository.
+"""
+
+import re
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# Match the new file name and the hunk headers of a unified diff
+new_file_pattern = re.compile(r"^\+\+\+ b/(.*)$")
+hunk_pattern = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+class GitObjectSourceError(Exception):
+    """Error running git on the repository."""
+
+
+class GitObjectSource:
+    """The files of one commit of a (possibly bare) git repository."""
+
+    def __init__(self, repo: Path = Path("."), commit: str = "HEAD"):
+        self.repo = Path(repo)
+        self.commit = self.run_git(["rev-parse", "--verify", f"{commit}^{{commit}}"])
+        self._tree: Optional[Dict[str, str]] = None
+        self._sizes: Dict[str, int] = {}
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._tree_lock = threading.Lock()
+
+    def __enter__(self) -> "GitObjectSource":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __getstate__(self) -> Dict:
+        # Each process starts its own git cat-file when first needed
+        state = self.__dict__.copy()
+        state["_process"] = None
+        del state["_lock"]
+        del state["_tree_lock"]
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._tree_lock = threading.Lock()
+
+    def run_git(self, args: List[str]) -> str:
+        """Run a git command in the repository, returning its output."""
+        result = subprocess.run(
+            ["git"] + args, cwd=self.repo, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise GitObjectSourceError(
+                f"git {' '.join(args)} failed : {result.stderr.strip()}"
+            )
+        return result.stdout.strip()
+
+    @property
+    def tree(self) -> Dict[str, str]:
+        """The object id of every file in the commit, keyed by path."""
+        # Checkers in other threads may ask at the same time, and mustn't
+        # see the tree until it's complete
+        with self._tree_lock:
+            if self._tree is None:
+                tree = {}
+                sizes = {}
+                output = self.run_git(["ls-tree", "-r", "-l", "-z", self.commit])
+                for entry in output.split("\0"):
+                    if not entry:
+                        continue
+                    info, path = entry.split("\t", 1)
+                    _, object_type, object_id, size = info.split()
+                    if object_type == "blob":
+                        tree[path] = object_id
+                        sizes[path] = int(size)
+                self._sizes = sizes
+                self._tree = tree
+        return self._tree
+
+    def list_files(self, file_extensions: Optional[Set[str]] = None) -> List[Path]:
+        """All the files in the commit, optionally only those with the
+        given extensions."""
+        files = [Path(path) for path in self.tree]
+        if file_extensions:
+            files = [path for path in files if path.suffix in file_extensions]
+        return files
+
+    def merge_base(self, parent: str) -> str:
+        """The commit at which the commit branched from parent."""
+        return self.run_git(["merge-base", parent, self.commit])
+
+    def changed_files(self, parent: str = "main") -> List[Path]:
+        """Files added or modified since the commit branched from parent."""
+        output = self.run_git(
+            ["diff", "--name-only", "-z", "--diff-filter=AMX"]
+            + [self.merge_base(parent), self.commit]
+        )
+        return [Path(path) for path in output.split("\0") if path]
+
+    def changed_lines(self, parent: str = "main") -> Dict[Path, List[Tuple[int, int]]]:
+        """The (first, last) ranges of lines, numbered from 1, added or
+        changed in each file since the commit branched from parent."""
+        result = {}
+        ranges = None
+        # Only the header of each file's diff names the file; an added line
+        # can start "+++" too
+        in_header = False
+        output = self.run_git(
+            ["diff", "-U0", "--no-color", "--no-ext-diff", "--diff-filter=AMX"]
+            # Fix the prefixes, whatever diff.noprefix and the like are set to
+            + ["--src-prefix=a/", "--dst-prefix=b/"]
+            + [self.merge_base(parent), self.commit]
+        )
+        for line in output.split("\n"):
+            if line.startswith("diff "):
+                in_header = True
+                ranges = None
+            elif in_header and (m := new_file_pattern.match(line)):
+                ranges = result.setdefault(Path(m.group(1)), [])
+            elif (m := hunk_pattern.match(line)) and ranges is not None:
+                in_header = False
+                first = int(m.group(1))
+                count = 1 if m.group(2) is None else int(m.group(2))
+                if count > 0:
+                    ranges.append((first, first + count - 1))
+        return result
+
+    def object_id(self, file_path: Path) -> str:
+        """The id of a file's blob, which changes whenever its contents do."""
+        try:
+            return self.tree[Path(file_path).as_posix()]
+        except KeyError:
+            raise FileNotFoundError(f"{file_path} isn't in commit {self.commit}")
+
+    def size(self, file_path: Path) -> int:
+        """The size of a file in bytes, without reading it."""
+        self.object_id(file_path)
+        return self._sizes[Path(file_path).as_posix()]
+
+    def read_bytes(self, file_path: Path) -> bytes:
+        """The contents of a file in the commit."""
+        object_id = self.object_id(file_path)
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._process = subprocess.Popen(
+                    ["git", "cat-file", "--batch"],
+                    cwd=self.repo,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                )
+            self._process.stdin.write(f"{object_id}\n".encode())
+            self._process.stdin.flush()
+            header = self._process.stdout.readline().decode().split()
+            if len(header) != 3:
+                raise GitObjectSourceError(
+                    f"Couldn't read {file_path} : {' '.join(header)}"
+                )
+            contents = self._process.stdout.read(int(header[2]))
+            # Each object is followed by a newline
+            self._process.stdout.read(1)
+        return contents
+
+    def read_text(self, file_path: Path) -> str:
+        """The contents of a file in the commit, as text."""
+        return self.read_bytes(file_path).decode("utf-8")
+
+    def close(self) -> None:
+        """Stop the git cat-file process, if running."""
+        with self._lock:
+            if self._process is not None:
+                self._process.stdin.close()
+                self._process.wait()
+                self._process.stdout.close()
+                self._process = None
@@ -0,0 +1,106 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+Engine to run several line based UMDP3 rules in a single pass over a file.
+
+Each rule names a set of 'trigger' words, at least one of which must appear on
+a line for the rule to possibly fail. The words on each line are found once,
+and looked up in an index of triggers, so only the rules which could fail on
+a given line have their (more expensive) patterns tested against it.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional
+from fortran_source_view import FortranSourceView
+
+
+@dataclass(frozen=True)
+class LineRule:
+    """
+    A rule tested line by line.
+        checker_name  : Name given to the TestResult for the rule.
+        triggers      : Upper case words, one of which must be on a line for
+                        the rule to fail.
+        message       : Error message for a failure.
+        pattern       : Pattern which must also be found on the line for the
+                        rule to fail. If None, a trigger word is enough.
+        source        : Which FortranSourceView lines to search, "code" or
+                        "unquoted".
+        skip_comments : Whether to skip comment lines.
+    """
+
+    checker_name: str
+    triggers: FrozenSet[str]
+    message: str = ""
+    pattern: Optional[re.Pattern] = None
+    source: str = "code"
+    skip_comments: bool = False
+
+    def find_errors(
+        self, view: FortranSourceView, count: int, words: FrozenSet[str]
+    ) -> List[str]:
+        """Return an error message for each failure of the rule on line
+        'count', given the upper case words found on that line."""
+        if self.pattern is None or self.pattern.search(self.line(view, count)):
+            return [self.message]
+        return []
+
+    def line(self, view: FortranSourceView, count: int) -> str:
+        """The version of line 'count' that this rule searches."""
+        return getattr(view, self.source)[count]
+
+
+@dataclass(frozen=True)
+class WordListRule(LineRule):
+    """A rule failing once for each distinct trigger word on a line. The
+    message is prefixed to the word, or to the stripped line if
+    message_uses_line is set."""
+
+    message_uses_line: bool = False
+
+    def find_errors(
+        self, view: FortranSourceView, count: int, words: FrozenSet[str]
+    ) -> List[str]:
+        found = sorted(words & self.triggers)
+        if self.message_uses_line:
+            return [f"{self.message}{view.lines[count].strip()}"] * len(found)
+        return [f"{self.message}{word}" for word in found]
+
+
+class LineRuleScanner:
+    """Run a set of LineRules over the lines of a file in a single pass."""
+
+    def __init__(self, rules: Dict[str, LineRule]):
+        self.rules = rules
+        # Index of trigger word to the rules it could cause to fail, kept
+        # separately for each source of lines the rules search.
+        self.index: Dict[str, Dict[str, List[str]]] = {}
+        for name, rule in rules.items():
+            source_index = self.index.setdefault(rule.source, {})
+            for trigger in rule.triggers:
+                source_index.setdefault(trigger, []).append(name)
+
+    def scan(self, lines) -> Dict[str, Dict[str, List[int]]]:
+        """Return the error log (error message : list of line numbers) for
+        each rule, found in one pass over the lines."""
+        view = FortranSourceView.of(lines)
+        error_logs = {name: {} for name in self.rules}
+        for source, source_index in self.index.items():
+            triggers = frozenset(source_index)
+            for count, words in enumerate(view.words(source)):
+                found = triggers & words
+                if not found:
+                    continue
+                candidates = {name for word in found for name in source_index[word]}
+                for name in candidates:
+                    rule = self.rules[name]
+                    if rule.skip_comments and view.is_comment[count]:
+                        continue
+                    for error in rule.find_errors(view, count, words):
+                        error_logs[name].setdefault(error, []).append(count + 1)
+        return error_logs
@@ -0,0 +1,140 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+Persistent, content addressed cache of style check results.
+
+Results are keyed on a hash of the file contents along with everything else
+that could change the result (checker version, the rules run, etc.), so an
+unchanged file checked by an unchanged checker need not be checked again.
+Stored in a SQLite database, by default under $XDG_CACHE_HOME.
+
+Several runs may share the one database (shards of a run, or a developer's
+run alongside the nightly), so each change is committed straight away and
+the database is kept in write-ahead log mode, letting readers carry on while
+another run writes. A run which still can't get at the database carries on
+without the cache, rather than failing.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+# Seconds to wait for another run to finish writing to the database
+busy_timeout = 5.0
+
+
+def default_cache_path() -> Path:
+    """Location of the cache database if one isn't given."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "umdp3_checker" / "results.sqlite"
+
+
+def file_digest(file_path: Path) -> str:
+    """Hash of the contents of a file."""
+    return hashlib.sha256(file_path.read_bytes()).hexdigest()
+
+
+def make_key(parts: Iterable[str]) -> str:
+    """Combine the parts describing a check into a single cache key."""
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """SQLite store of serialised check results, keyed by make_key().
+    Each entry also records the checker version it was made with, and
+    when it was last used, so that stale entries can be pruned."""
+
+    def __init__(self, path: Optional[Path] = None, version: str = ""):
+        self.path = Path(path) if path else default_cache_path()
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, timeout=busy_timeout)
+        self._execute("PRAGMA journal_mode=WAL")
+        # Committing each change is cheap in WAL mode without a full sync
+        self._execute("PRAGMA synchronous=NORMAL")
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, version TEXT, result TEXT, last_used REAL)"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """False once the database couldn't be used."""
+        return self._connection is not None
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> Optional[sqlite3.Cursor]:
+        """Run and commit a statement, or give up on the cache (returning
+        None) if the database is locked or otherwise unusable."""
+        if self._connection is None:
+            return None
+        try:
+            cursor = self._connection.execute(sql, parameters)
+            self._connection.commit()
+            return cursor
+        except sqlite3.OperationalError as error:
+            print(
+                f"Results cache {self.path} unavailable ({error}), "
+                "continuing without it.",
+                file=sys.stderr,
+            )
+            self._connection.close()
+            self._connection = None
+            return None
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the result stored under key, or None."""
+        cursor = self._execute("SELECT result FROM results WHERE key = ?", (key,))
+        row = cursor.fetchone() if cursor is not None else None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._execute(
+            "UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Dict) -> None:
+        """Store a (JSON serialisable) result under key."""
+        self._execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            (key, self.version, json.dumps(result), time.time()),
+        )
+
+    def prune(self, max_age_days: float) -> int:
+        """Remove entries from other checker versions, or not used within
+        max_age_days. Returns the number of entries removed."""
+        oldest = time.time() - max_age_days * 86400
+        cursor = self._execute(
+            "DELETE FROM results WHERE version != ? OR last_used < ?",
+            (self.version, oldest),
+        )
+        if cursor is None:
+            return 0
+        self._execute("VACUUM")
+        return cursor.rowcount
+
+    def commit(self) -> None:
+        """Save any changes, so other processes can write to the database
+        (e.g. between the requests of a long running process)."""
+        if self._connection is not None:
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Save any changes and close the database."""
+        if self._connection is not None:
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
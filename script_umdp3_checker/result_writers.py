@@ -0,0 +1,216 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+Machine readable reports of style check results, in JSON, JUnit XML or
+SARIF format.
+
+Each writer is given the CheckResult for each file as soon as it is
+available, and writes it straight to disk, so a large run never holds the
+whole report in memory. The opening and closing of the document are
+written when the writer is created and closed.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from dataclasses import asdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+if TYPE_CHECKING:
+    from umdp3_conformance import CheckResult
+
+
+class ResultWriter(ABC):
+    """Base class for writing CheckResults to a file, one at a time."""
+
+    def __init__(
+        self,
+        path: Path,
+        version: str = "",
+        shard: Optional[Tuple[int, int]] = None,
+    ):
+        self.path = Path(path)
+        self.version = version
+        # (index, count) if these are the results of one shard of a run
+        self.shard = shard
+        self.files_written = 0
+        self.files_failed = 0
+        self._file = open(self.path, "w", encoding="utf-8")
+        self.start()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @abstractmethod
+    def start(self) -> None:
+        """Write the opening of the document."""
+        pass
+
+    @abstractmethod
+    def write_result(self, result: "CheckResult") -> None:
+        """Write the results for one file."""
+        pass
+
+    @abstractmethod
+    def finish(self) -> None:
+        """Write the closing of the document."""
+        pass
+
+    def write(self, result: "CheckResult") -> None:
+        """Add the results for a file to the report."""
+        self.write_result(result)
+        self.files_written += 1
+        if not result.all_passed:
+            self.files_failed += 1
+
+    def close(self) -> None:
+        """Finish the document and close the file."""
+        if self._file.closed:
+            return
+        self.finish()
+        self._file.close()
+
+
+def error_details(errors: Dict) -> List[Tuple[str, List[int]]]:
+    """Split the errors of a TestResult into (message, line numbers) pairs.
+    The rules give a list of line numbers for each error, where 0 means the
+    error isn't on a particular line, while external checkers give text."""
+    details = []
+    for title, info in errors.items():
+        if isinstance(info, list) and all(isinstance(line, int) for line in info):
+            details.append((title, [line for line in info if line > 0]))
+        else:
+            details.append((f"{title} : {info}", []))
+    return details
+
+
+class JsonResultWriter(ResultWriter):
+    """Writes a JSON object holding a list of the CheckResults, as given by
+    dataclasses.asdict, followed by a summary. The results of a shard also
+    give its [index, count], so the shards can be merged later."""
+
+    def start(self) -> None:
+        shard = f' "shard": {json.dumps(list(self.shard))},\n' if self.shard else ""
+        self._file.write(
+            f'{{"checker_version": {json.dumps(self.version)},\n{shard} "results": [\n'
+        )
+
+    def write_result(self, result: "CheckResult") -> None:
+        separator = ",\n" if self.files_written else ""
+        self._file.write(separator + json.dumps(asdict(result)))
+
+    def finish(self) -> None:
+        summary = {
+            "files_checked": self.files_written,
+            "files_failed": self.files_failed,
+        }
+        self._file.write(f'\n ],\n "summary": {json.dumps(summary)}}}\n')
+
+
+class JUnitResultWriter(ResultWriter):
+    """Writes JUnit XML, with a testsuite for each file and a testcase for
+    each check run on it."""
+
+    def start(self) -> None:
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._file.write('<testsuites name="UMDP3 Conformance">\n')
+
+    def write_result(self, result: "CheckResult") -> None:
+        file_path = quoteattr(result.file_path)
+        self._file.write(
+            f"  <testsuite name={file_path} "
+            f'tests="{len(result.test_results)}" '
+            f'failures="{result.tests_failed}">\n'
+        )
+        for test_result in result.test_results:
+            self._file.write(
+                f"    <testcase classname={file_path} "
+                f"name={quoteattr(test_result.checker_name)}"
+            )
+            if test_result.passed:
+                self._file.write("/>\n")
+                continue
+            plural = "" if test_result.failure_count == 1 else "s"
+            message = f"Found {test_result.failure_count} failure{plural}"
+            details = [
+                f"{text} (lines {', '.join(map(str, lines))})" if lines else text
+                for text, lines in error_details(test_result.errors)
+            ] or [test_result.output]
+            self._file.write(
+                f">\n      <failure message={quoteattr(message)}>"
+                f"{escape(chr(10).join(details))}</failure>\n    </testcase>\n"
+            )
+        self._file.write("  </testsuite>\n")
+
+    def finish(self) -> None:
+        self._file.write("</testsuites>\n")
+
+
+class SarifResultWriter(ResultWriter):
+    """Writes a SARIF 2.1.0 log, with a result for each error found (on
+    each line it was found). The rules are listed in the tool description,
+    which is written after the results once all the rules used are known."""
+
+    schema = "https://json.schemastore.org/sarif-2.1.0.json"
+
+    def start(self) -> None:
+        self.rules = {}
+        self._results_written = 0
+        self._file.write(
+            f'{{"version": "2.1.0", "$schema": "{self.schema}",\n'
+            ' "runs": [{"results": [\n'
+        )
+
+    def rule_index(self, checker_name: str) -> int:
+        """Index of a rule in the tool's list of rules, adding it if new."""
+        return self.rules.setdefault(checker_name, len(self.rules))
+
+    def write_result(self, result: "CheckResult") -> None:
+        location = {"artifactLocation": {"uri": Path(result.file_path).as_posix()}}
+        for test_result in result.test_results:
+            if test_result.passed:
+                continue
+            rule_index = self.rule_index(test_result.checker_name)
+            details = error_details(test_result.errors) or [(test_result.output, [])]
+            for message, lines in details:
+                for line in lines or [None]:
+                    physical_location = dict(location)
+                    if line is not None:
+                        physical_location["region"] = {"startLine": line}
+                    sarif_result = {
+                        "ruleId": test_result.checker_name,
+                        "ruleIndex": rule_index,
+                        # Any failure fails the file, so all are errors
+                        "level": "error",
+                        "message": {"text": message or test_result.checker_name},
+                        "locations": [{"physicalLocation": physical_location}],
+                    }
+                    separator = ",\n" if self._results_written else ""
+                    self._file.write(separator + json.dumps(sarif_result))
+                    self._results_written += 1
+
+    def finish(self) -> None:
+        driver = {
+            "name": "umdp3_checker",
+            "version": self.version,
+            "rules": [
+                {"id": name, "shortDescription": {"text": name}} for name in self.rules
+            ],
+        }
+        self._file.write(f'\n ],\n "tool": {{"driver": {json.dumps(driver)}}}}}]}}\n')
+
+
+# Writer for each report format
+result_writers = {
+    "json": JsonResultWriter,
+    "junit": JUnitResultWriter,
+    "sarif": SarifResultWriter,
+}
@@ -0,0 +1,152 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+Timing of the style checker rules, to find which rules (and which files)
+dominate the run time of a check.
+
+Times are recorded per (checker, rule, file) and summed over checkers and
+files or rules for the report. Line rules which run together in one fused
+pass over a file are timed as a single entry.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Name of the entry timing the reading and pre-lexing of each file
+read_rule_name = "(read and lex file)"
+
+
+def fused_pass_name(no_of_rules: int) -> str:
+    """Name of the entry timing a fused pass of several line rules."""
+    return f"(fused pass of {no_of_rules} line rules)"
+
+
+def load_rule_costs(file_path: Path) -> Dict[str, float]:
+    """The relative cost of each rule, from a profile written with
+    RuleProfile.write_json (seconds per call) or a baseline saved by
+    benchmark.py (seconds over the whole corpus), for running the cheapest
+    rules first."""
+    rules = json.loads(Path(file_path).read_text()).get("rules", {})
+    if isinstance(rules, dict):
+        return {rule: float(seconds) for rule, seconds in rules.items()}
+    return {entry["rule"]: entry["seconds"] / max(1, entry["calls"]) for entry in rules}
+
+
+class RuleProfile:
+    """Wall time and number of calls of each rule, for each checker and
+    file. Safe to record into from several threads, and profiles from
+    worker processes can be merged into the parent's."""
+
+    def __init__(self):
+        # (checker name, rule name, file path) : [calls, seconds]
+        self.timings: Dict[Tuple[str, str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict:
+        """Locks can't be pickled, so drop it when sending a profile to or
+        from a worker process."""
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict):
+        """Recreate the lock when unpickled."""
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def record(self, checker: str, rule: str, file_path: str, seconds: float):
+        """Add one call of a rule on a file, taking seconds, to the profile."""
+        with self._lock:
+            timing = self.timings.setdefault((checker, rule, file_path), [0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+
+    def merge(self, other: "RuleProfile") -> None:
+        """Add the timings from another profile to this one."""
+        with self._lock:
+            for key, (calls, seconds) in other.timings.items():
+                timing = self.timings.setdefault(key, [0, 0.0])
+                timing[0] += calls
+                timing[1] += seconds
+
+    def total_seconds(self) -> float:
+        """Total time spent in all rules."""
+        return sum(seconds for _, seconds in self.timings.values())
+
+    def rule_totals(self) -> List[Dict]:
+        """Time and calls of each rule of each checker, summed over all the
+        files, slowest first."""
+        totals = {}
+        for (checker, rule, _), (calls, seconds) in self.timings.items():
+            total = totals.setdefault((checker, rule), [0, 0.0])
+            total[0] += calls
+            total[1] += seconds
+        return self._sorted(
+            {"checker": checker, "rule": rule, "calls": calls, "seconds": seconds}
+            for (checker, rule), (calls, seconds) in totals.items()
+        )
+
+    def file_totals(self) -> List[Dict]:
+        """Time and number of rules run on each file, by each checker,
+        slowest first."""
+        totals = {}
+        for (checker, _, file_path), (calls, seconds) in self.timings.items():
+            total = totals.setdefault((checker, file_path), [0, 0.0])
+            total[0] += calls
+            total[1] += seconds
+        return self._sorted(
+            {"checker": checker, "file": file_path, "calls": calls, "seconds": seconds}
+            for (checker, file_path), (calls, seconds) in totals.items()
+        )
+
+    @staticmethod
+    def _sorted(entries) -> List[Dict]:
+        """Sort totals slowest first, breaking ties on the names so the
+        order is stable."""
+        return sorted(
+            entries,
+            key=lambda entry: (-entry["seconds"], *map(str, entry.values())),
+        )
+
+    def to_dict(self) -> Dict:
+        """The rule and file totals, as a JSON serialisable dictionary."""
+        return {
+            "total_seconds": self.total_seconds(),
+            "rules": self.rule_totals(),
+            "files": self.file_totals(),
+        }
+
+    def write_json(self, file_path: Path) -> None:
+        """Write the rule and file totals to a JSON file."""
+        Path(file_path).write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def report(self, limit: int = 10) -> str:
+        """Tables of the slowest rules and slowest files."""
+        total = self.total_seconds() or 1.0
+        rule_totals = self.rule_totals()
+        file_totals = self.file_totals()
+        lines = [f"Slowest rules (of {len(rule_totals)}) :"]
+        lines.append(
+            f"    {'Seconds':>9s} {'%':>5s} {'Calls':>7s}  {'Checker':24s} Rule"
+        )
+        for entry in rule_totals[:limit]:
+            lines.append(
+                f"    {entry['seconds']:9.4f} {100 * entry['seconds'] / total:5.1f}"
+                f" {entry['calls']:7d}  {entry['checker']:24s} {entry['rule']}"
+            )
+        lines.append(f"Slowest files (of {len(file_totals)}) :")
+        lines.append(
+            f"    {'Seconds':>9s} {'%':>5s} {'Rules':>7s}  {'Checker':24s} File"
+        )
+        for entry in file_totals[:limit]:
+            lines.append(
+                f"    {entry['seconds']:9.4f} {100 * entry['seconds'] / total:5.1f}"
+                f" {entry['calls']:7d}  {entry['checker']:24s} {entry['file']}"
+            )
+        return "\n".join(lines)
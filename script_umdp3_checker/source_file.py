@@ -0,0 +1,95 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+Access to the contents of a file being checked, which only does as much
+work as the rules run on it need.
+
+Large files are memory mapped rather than read in, bytes which aren't valid
+UTF-8 are replaced rather than failing the whole file, and binary files can
+be spotted (and skipped) from their first few kilobytes. Rules which only
+look at one line at a time can be given the lines as they're decoded, so
+the whole file is only decoded, split and pre-lexed into a
+FortranSourceView when a rule needs it.
+"""
+
+import mmap
+from functools import cached_property
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from file_discovery import binary_sniff_size
+from fortran_source_view import FortranSourceView
+
+# Files of at least this many bytes are memory mapped rather than read
+mmap_size = 1024 * 1024
+
+# Undecodable bytes are replaced by U+FFFD, one character per bad byte, so
+# line lengths stay much as they were
+encoding = "utf-8"
+decode_errors = "replace"
+
+
+class SourceFile:
+    """The contents of a file, as bytes (or a memory map of them), from
+    which the text, the lines or a FortranSourceView are made on demand.
+    Use as a context manager, or call close(), to release any memory map."""
+
+    def __init__(self, data: Union[bytes, mmap.mmap], file_path: Optional[Path] = None):
+        self.data = data
+        self.file_path = file_path
+
+    @classmethod
+    def open(cls, file_path: Path) -> "SourceFile":
+        """Read a file from disk, memory mapping it if it's large."""
+        with open(file_path, "rb") as file_in:
+            if Path(file_path).stat().st_size < mmap_size:
+                return cls(file_in.read(), file_path)
+            # The map stays valid once the file is closed
+            return cls(
+                mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ), file_path
+            )
+
+    def __enter__(self) -> "SourceFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the memory map, if the file was mapped."""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    @cached_property
+    def is_binary(self) -> bool:
+        """Guess whether the file is binary, from a NUL byte near its start."""
+        return b"\0" in self.data[:binary_sniff_size]
+
+    @cached_property
+    def text(self) -> str:
+        """The whole of the decoded file."""
+        return bytes(self.data).decode(encoding, errors=decode_errors)
+
+    def iter_lines(self) -> Iterator[str]:
+        """The lines of the file (without line endings, as given by
+        str.splitlines), decoded one at a time as they're needed."""
+        start = 0
+        size = len(self.data)
+        while start < size:
+            end = self.data.find(b"\n", start)
+            end = size if end < 0 else end + 1
+            # Any other line breaks within the line are split as they would
+            # be in the whole text
+            yield from (
+                self.data[start:end].decode(encoding, errors=decode_errors).splitlines()
+            )
+            start = end
+
+    @cached_property
+    def view(self) -> FortranSourceView:
+        """The pre-lexed lines of the whole file."""
+        return FortranSourceView.from_text(self.text)
@@ -0,0 +1,37 @@
+import random
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmark import compare, generate_corpus, generate_file, run_benchmarks
+
+
+def test_corpus_is_reproducible(tmp_path):
+    first = generate_file(random.Random(7), 0, 200)
+    assert first == generate_file(random.Random(7), 0, 200)
+    assert first != generate_file(random.Random(8), 0, 200)
+    assert len(first.splitlines()) >= 200
+
+    files = generate_corpus(tmp_path, no_of_files=3, no_of_lines=50)
+    assert [f.name for f in files] == [f"synthetic_{i:04d}.F90" for i in range(3)]
+
+
+def test_run_benchmarks(tmp_path):
+    results = run_benchmarks(
+        tmp_path, 2, 60, seed=1, executors=["thread"], workers=[1], repeats=1
+    )
+    assert results["parameters"] == {"files": 2, "lines": 60, "seed": 1}
+    assert "GO TO other than 9999" in results["rules"]
+    assert list(results["runs"]) == ["thread x 1"]
+
+
+def test_compare():
+    baseline = {"rules": {"fast": 1.0, "slow": 1.0, "tiny": 0.001}, "runs": {}}
+    results = {
+        "rules": {"fast": 1.1, "slow": 2.0, "tiny": 0.004, "new": 5.0},
+        "runs": {},
+    }
+    regressions = compare(results, baseline, tolerance=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("rules : slow")
@@ -0,0 +1,141 @@
+import stat
+import tempfile
+import threading
+import pytest
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from checker_daemon import (
+    CheckerDaemon,
+    default_socket_path,
+    is_running,
+    request_check,
+    send_request,
+    serve,
+)
+from result_cache import ResultCache
+from umdp3_checker_rules import VERSION
+
+good_fortran = """! Crown copyright
+! Code Owner: Someone
+MODULE good_mod
+IMPLICIT NONE
+INTEGER :: i
+END MODULE good_mod
+"""
+
+bad_fortran = """module bad_mod
+integer :: i
+  !$OMP PARALLEL
+end module bad_mod
+"""
+
+
+@pytest.fixture
+def daemon_socket(tmp_path):
+    """A daemon serving on a socket from a thread, stopped afterwards."""
+    socket_path = tmp_path / "daemon.sock"
+
+    def run_daemon():
+        # The cache must be made in the thread using it
+        cache = ResultCache(tmp_path / "cache.db", VERSION)
+        serve(socket_path, CheckerDaemon(cache), idle_timeout=60)
+
+    thread = threading.Thread(target=run_daemon, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if is_running(socket_path):
+            break
+        thread.join(0.05)
+    yield socket_path
+    if is_running(socket_path):
+        send_request({"command": "shutdown"}, socket_path)
+    thread.join(5)
+
+
+def test_check_paths_and_contents(tmp_path):
+    good_file = tmp_path / "good.F90"
+    good_file.write_text(good_fortran)
+    response = CheckerDaemon().handle(
+        {
+            "paths": [str(good_file)],
+            "files": [{"name": "src/bad.F90", "content": bad_fortran}],
+        }
+    )
+    results = {result["file_path"]: result for result in response["results"]}
+    assert set(results) == {str(good_file), "src/bad.F90"}
+    assert results[str(good_file)]["all_passed"]
+    assert not results["src/bad.F90"]["all_passed"]
+    assert not response["all_passed"]
+
+
+def test_unknown_command():
+    with pytest.raises(ValueError):
+        CheckerDaemon().handle({"command": "frobnicate"})
+
+
+def test_checkers_kept_between_requests():
+    checker_daemon = CheckerDaemon()
+    checkers = checker_daemon.checkers_for(["Fortran", "C"])
+    assert checker_daemon.checkers_for(["C", "Fortran"]) is checkers
+    checker_daemon.handle({"files": [{"name": "a.F90", "content": bad_fortran}]})
+    assert all(not checker.files_to_check for checker in checkers)
+
+
+def test_socket_round_trip(daemon_socket):
+    assert stat.S_IMODE(daemon_socket.stat().st_mode) == 0o600
+    request = {"files": [{"name": "bad.F90", "content": bad_fortran}]}
+    response = request_check(request, daemon_socket, autostart=False)
+    assert response["version"] == VERSION
+    assert [result["file_path"] for result in response["results"]] == ["bad.F90"]
+    assert not response["all_passed"]
+
+    # An error is reported to the client, and the daemon carries on
+    with pytest.raises(RuntimeError, match="Unknown command"):
+        request_check({"command": "frobnicate"}, daemon_socket, autostart=False)
+    assert request_check(request, daemon_socket, autostart=False) == response
+
+    send_request({"command": "shutdown"}, daemon_socket)
+    for _ in range(100):
+        if not daemon_socket.exists():
+            break
+        threading.Event().wait(0.05)
+    assert not daemon_socket.exists()
+
+
+def test_cache_shared_while_running(daemon_socket, tmp_path):
+    request = {"files": [{"name": "bad.F90", "content": bad_fortran}]}
+    request_check(request, daemon_socket, autostart=False)
+    # Another run can use the daemon's cache between its requests
+    cache = ResultCache(tmp_path / "cache.db", VERSION)
+    cache.put("key", {"result": 1})
+    cache.close()
+    assert request_check(request, daemon_socket, autostart=False)["results"]
+
+
+def test_no_daemon_without_autostart(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        request_check({"command": "ping"}, tmp_path / "none.sock", autostart=False)
+
+
+def test_socket_others_can_use(daemon_socket):
+    # A socket others could have made, or be listening on, isn't trusted
+    daemon_socket.chmod(0o666)
+    with pytest.raises(PermissionError):
+        request_check({"command": "ping"}, daemon_socket, autostart=False)
+    assert not is_running(daemon_socket)
+    daemon_socket.chmod(0o600)
+
+
+def test_default_socket_path(tmp_path, monkeypatch):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    socket_path = default_socket_path()
+    assert stat.S_IMODE(socket_path.parent.stat().st_mode) == 0o700
+    assert default_socket_path() == socket_path
+    # A directory others can write to isn't used
+    socket_path.parent.chmod(0o777)
+    with pytest.raises(PermissionError):
+        default_socket_path()
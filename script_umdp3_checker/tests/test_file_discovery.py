@@ -0,0 +1,51 @@
+import pytest
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from file_discovery import discover_files, git_files
+
+
+@pytest.fixture
+def source_tree(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "good.F90").write_text("PROGRAM good\nEND PROGRAM good\n")
+    (tmp_path / "src" / "script.py").write_text("x = 1\n")
+    (tmp_path / "src" / "binary.F90").write_bytes(b"\x7fELF\0\0\0")
+    (tmp_path / "src" / "huge.F90").write_text("! big\n" * 100)
+    (tmp_path / ".svn").mkdir()
+    (tmp_path / ".svn" / "pristine.F90").write_text("PROGRAM old\n")
+    return tmp_path
+
+
+discover_parameters = [
+    (None, ["src/good.F90", "src/script.py"], "Any extension"),
+    ({".F90"}, ["src/good.F90"], "Fortran only"),
+    ({".c"}, [], "No matching files"),
+]
+
+
+@pytest.mark.parametrize(
+    "file_extensions, expected",
+    [data[:2] for data in discover_parameters],
+    ids=[data[2] for data in discover_parameters],
+)
+def test_discover_files_walk(source_tree, file_extensions, expected, monkeypatch):
+    # Make sure the tree isn't treated as a git working copy
+    monkeypatch.setattr("file_discovery.git_files", lambda top: None)
+    found = discover_files(str(source_tree), file_extensions, max_size=100)
+    assert found == [Path(name) for name in expected]
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not available")
+def test_discover_files_git(source_tree):
+    subprocess.run(["git", "init", "-q"], cwd=source_tree, check=True)
+    (source_tree / ".gitignore").write_text("build/\n")
+    (source_tree / "build").mkdir()
+    (source_tree / "build" / "generated.F90").write_text("PROGRAM gen\n")
+    assert "build/generated.F90" not in git_files(source_tree)
+    found = discover_files(str(source_tree), {".F90"}, max_size=100)
+    assert found == [Path("src/good.F90")]
@@ -180,6 +180,12 @@ test_lowercase_variable_names_parameters = [
         1,
         "Uppercase variable name with leading whitespace",
     ),
+    (
+        ["REAL :: first_name,                  &", "        SECOND_NAME"],
+        1,
+        "Uppercase variable name on a continuation line",
+    ),
+    (["REAL :: x = HUGE(1.0)"], 0, "Uppercase intrinsic in initialisation"),
 ]
 
 
@@ -203,6 +209,12 @@ test_dimension_forbidden_parameters = [
         1,
         "Dimension specified in variable declaration with attributes",
     ),
+    (
+        ["INTEGER,                             &", "  DIMENSION(10) :: a, b"],
+        1,
+        "Dimension attribute on a continuation line",
+    ),
+    (["! REAL, DIMENSION(3) :: x"], 0, "Dimension in a comment"),
 ]
 
 
@@ -620,6 +632,9 @@ test_intrinsic_as_variable_parameters = [
     (["  REAL :: COS"], 1, "Use of intrinsic name as variable"),
     (["  REAL :: MYVAR"], 0, "No use of intrinsic name as variable"),
     (["  INTEGER :: TAN, MYVAR"], 1, "One intrinsic name as variable"),
+    (["  INTEGER :: MYVAR, tan"], 1, "Intrinsic name later in the list"),
+    (["  REAL :: x,                    &", "          exp"], 1, "Continued"),
+    (["  y = SIN(x)"], 0, "Intrinsic function called"),
 ]
 
 
@@ -634,6 +649,31 @@ def test_intrinsic_as_variable(lines, expected_result):
     assert result.failure_count == expected_result
 
 
+# The same names declared again in a second program unit
+two_subroutines = [
+    "SUBROUTINE first()",
+    "IMPLICIT NONE",
+    "REAL :: sin",
+    "REAL :: MYVAR",
+    "END SUBROUTINE first",
+    "SUBROUTINE second()",
+    "IMPLICIT NONE",
+    "REAL :: sin",
+    "REAL :: MYVAR",
+    "END SUBROUTINE second",
+]
+
+
+def test_names_declared_in_each_subroutine():
+    checker = UMDP3Checker()
+    result = checker.lowercase_variable_names(two_subroutines)
+    assert result.failure_count == 2
+    assert result.errors == {"UPPERCASE variable name MYVAR": [4, 9]}
+    result = checker.intrinsic_as_variable(two_subroutines)
+    assert result.failure_count == 2
+    assert result.errors == {"intrinsic function sin used as variable": [3, 8]}
+
+
 test_check_crown_copyright_parameters = [
     (["! Crown copyright 2024"], 0, "Correct crown copyright statement"),
     (["! Copyright 2024"], 0, "A copyright statement"),
@@ -653,6 +693,26 @@ def test_check_crown_copyright(lines, expected_result):
     assert result.failure_count == expected_result
 
 
+test_c_crown_copyright_parameters = [
+    (["/* (C) Crown copyright Met Office */"], 0, "Block comment"),
+    (["/*", " * Crown copyright 2024", " */"], 0, "Multi-line block comment"),
+    (["// Copyright 2024"], 0, "Line comment"),
+    (["! Crown copyright 2024"], 1, "Fortran comment"),
+    (['char *s = "Crown copyright";'], 1, "Copyright outside a comment"),
+]
+
+
+@pytest.mark.parametrize(
+    "lines, expected_result",
+    [data[:2] for data in test_c_crown_copyright_parameters],
+    ids=[data[2] for data in test_c_crown_copyright_parameters],
+)
+def test_c_crown_copyright(lines, expected_result):
+    checker = UMDP3Checker()
+    result = checker.c_crown_copyright(lines)
+    assert result.failure_count == expected_result
+
+
 test_check_code_owner_parameters = [
     (["! Code Owner: John Doe"], 0, "code owner statement"),
     (["! Code Owner : John Doe"], 0, "Another code owner statement"),
@@ -0,0 +1,97 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from fortran_declarations import Declaration, parse_declaration, split_top_level
+from fortran_source_view import FortranSourceView
+
+split_parameters = [
+    ("a, b(1, 2), c", ",", -1, ["a", " b(1, 2)", " c"], "Brackets kept whole"),
+    ("x = [1, 2], y", ",", -1, ["x = [1, 2]", " y"], "Array constructor"),
+    ("REAL :: a :: b", "::", 1, ["REAL ", " a :: b"], "Split once"),
+    ("a", ",", -1, ["a"], "Nothing to split"),
+]
+
+
+@pytest.mark.parametrize(
+    "text, separator, max_split, expected",
+    [data[:4] for data in split_parameters],
+    ids=[data[4] for data in split_parameters],
+)
+def test_split_top_level(text, separator, max_split, expected):
+    assert split_top_level(text, separator, max_split) == expected
+
+
+declaration_parameters = [
+    (
+        "INTEGER :: i, j = 2",
+        [("i", "INTEGER", ()), ("j", "INTEGER", ())],
+        "Simple declaration",
+    ),
+    (
+        "real(kind=real64), intent(in), dimension(n, m) :: field(:, :)",
+        [("field", "REAL(KIND=REAL64)", ("INTENT(IN)", "DIMENSION(N,M)"))],
+        "Kind and attributes",
+    ),
+    (
+        "CHARACTER(LEN=*), PARAMETER :: RoutineName = ",
+        [("RoutineName", "CHARACTER(LEN=*)", ("PARAMETER",))],
+        "Parameter with quoted value removed",
+    ),
+    (
+        "TYPE(my_type), POINTER :: ptr => NULL()",
+        [("ptr", "TYPE(MY_TYPE)", ("POINTER",))],
+        "Derived type",
+    ),
+    (
+        "DIMENSION a(5), b(3)",
+        [("a", "", ("DIMENSION",)), ("b", "", ("DIMENSION",))],
+        "",
+    ),
+    ("REAL FUNCTION f(x)", [], "Function statement"),
+    ("x = REAL(i)", [], "Assignment"),
+    ("INTEGER i", [], "Declaration without a double colon"),
+]
+
+
+@pytest.mark.parametrize(
+    "code, expected",
+    [data[:2] for data in declaration_parameters],
+    ids=[data[2] or "Dimension statement" for data in declaration_parameters],
+)
+def test_parse_declaration(code, expected):
+    assert parse_declaration(3, code) == [
+        Declaration(name, type_spec, attributes, 3)
+        for name, type_spec, attributes in expected
+    ]
+
+
+def test_symbol_table():
+    view = FortranSourceView(
+        [
+            "MODULE example_mod",
+            "IMPLICIT NONE",
+            "! INTEGER :: commented_out",
+            "INTEGER, PARAMETER ::                 &",
+            "  first = 1,                          &",
+            "! A comment in the middle",
+            "  second = 2",
+            "REAL, DIMENSION(first) :: values",
+            "REAL :: First",
+            "END MODULE example_mod",
+        ]
+    )
+    table = view.symbol_table
+    assert [d.name for d in table.declarations] == [
+        "first",
+        "second",
+        "values",
+        "First",
+    ]
+    assert "SECOND" in table and "commented_out" not in table
+    # The first declaration of a name is kept
+    assert table.get("FIRST").line == 4
+    assert table.get("second").attributes == ("PARAMETER",)
+    assert [d.name for d in table.with_attribute("DIMENSION")] == ["values"]
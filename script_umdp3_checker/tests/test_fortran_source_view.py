@@ -0,0 +1,95 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from fortran_source_view import FortranSourceView
+
+source_lines = [
+    "! A comment line",
+    "  ! An indented comment",
+    "x = 'quoted ! not a comment' ! real comment",
+    "CALL foo(a, &",
+    "! comment within continuation",
+    "         & b)",
+    "",
+    'y = "text" // z',
+]
+
+
+def test_behaves_as_lines():
+    view = FortranSourceView(source_lines)
+    assert len(view) == len(source_lines)
+    assert list(view) == source_lines
+    assert view[2] == source_lines[2]
+    assert "\n".join(view) == "\n".join(source_lines)
+
+
+def test_of_reuses_view():
+    view = FortranSourceView(source_lines)
+    assert FortranSourceView.of(view) is view
+    assert FortranSourceView.of(source_lines).lines == source_lines
+
+
+cleaned_parameters = [
+    (0, True, "", "! A comment line", "Comment line"),
+    (1, True, "  ", None, "Indented comment line"),
+    (2, False, "x =  ", "! real comment", "Quoted exclamation mark"),
+    (6, False, "", None, "Blank line"),
+]
+
+
+@pytest.mark.parametrize(
+    "index, is_comment, code, comment",
+    [data[:4] for data in cleaned_parameters],
+    ids=[data[4] for data in cleaned_parameters],
+)
+def test_cleaned_lines(index, is_comment, code, comment):
+    view = FortranSourceView(source_lines)
+    assert view.is_comment[index] == is_comment
+    assert view.code[index] == code
+    if comment is not None:
+        assert view.comments[index] == comment
+
+
+def test_statements():
+    view = FortranSourceView(source_lines)
+    assert view.statements == [
+        (2, "x ="),
+        (3, "CALL foo(a, b)"),
+        (7, "y =  // z"),
+    ]
+
+
+continued_lines = [
+    "CALL foo(a, &",  # 1
+    "! comment within continuation",  # 2
+    "         b, &",  # 3
+    "         c)",  # 4
+    "x = 1",  # 5
+    "y = 2",  # 6
+]
+statement_range_parameters = [
+    ([(3, 3)], [(1, 4)], "Middle of a continued statement"),
+    ([(1, 1)], [(1, 4)], "Start of a continued statement"),
+    ([(4, 5)], [(1, 5)], "End of a continued statement"),
+    ([(6, 6)], [(6, 6)], "Single line statement"),
+    ([(5, 9)], [(5, 6)], "Range beyond the end of the file"),
+]
+
+
+@pytest.mark.parametrize(
+    "ranges, expected",
+    [data[:2] for data in statement_range_parameters],
+    ids=[data[2] for data in statement_range_parameters],
+)
+def test_statement_ranges(ranges, expected):
+    view = FortranSourceView(continued_lines)
+    assert view.statement_ranges(ranges) == expected
+
+
+def test_only_lines():
+    view = FortranSourceView(continued_lines).only_lines([(6, 6)])
+    assert len(view) == len(continued_lines)
+    assert list(view) == ["", "", "", "", "", "y = 2"]
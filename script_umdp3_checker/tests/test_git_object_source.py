@@ -0,0 +1,174 @@
+import pickle
+import subprocess
+import pytest
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from git_object_source import GitObjectSource, GitObjectSourceError
+from result_cache import ResultCache
+from umdp3_conformance import ConformanceChecker, create_style_checkers
+
+good_fortran = """! Crown copyright
+! Code Owner: Someone
+MODULE good_mod
+IMPLICIT NONE
+INTEGER :: i
+END MODULE good_mod
+"""
+
+bad_fortran = """module bad_mod
+integer :: i
+  !$OMP PARALLEL
+end module bad_mod
+"""
+
+
+def git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com"]
+        + list(args),
+        cwd=repo,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def bare_repo(tmp_path):
+    """A bare repository with a branch adding and changing Fortran files."""
+    work = tmp_path / "work"
+    work.mkdir()
+    git(work, "init", "-q", "-b", "main")
+    (work / "src").mkdir()
+    (work / "src" / "good.F90").write_text(good_fortran)
+    (work / "README.md").write_text("Read me\n")
+    git(work, "add", ".")
+    git(work, "commit", "-q", "-m", "Initial")
+    git(work, "checkout", "-q", "-b", "feature")
+    (work / "src" / "bad.F90").write_text(bad_fortran)
+    (work / "src" / "good.F90").write_text(good_fortran + "! Extra\n")
+    git(work, "add", ".")
+    git(work, "commit", "-q", "-m", "Feature")
+    git(tmp_path, "clone", "-q", "--bare", "work", "bare.git")
+    return tmp_path / "bare.git"
+
+
+def test_read_files(bare_repo):
+    with GitObjectSource(bare_repo, "feature") as source:
+        assert source.read_text(Path("src/bad.F90")) == bad_fortran
+        assert source.read_text(Path("src/good.F90")) == good_fortran + "! Extra\n"
+        assert source.read_bytes(Path("README.md")) == b"Read me\n"
+        with pytest.raises(FileNotFoundError):
+            source.read_text(Path("src/missing.F90"))
+        assert sorted(source.list_files({".F90"})) == [
+            Path("src/bad.F90"),
+            Path("src/good.F90"),
+        ]
+    with GitObjectSource(bare_repo, "main") as source:
+        assert source.read_text(Path("src/good.F90")) == good_fortran
+        assert Path("src/bad.F90") not in source.list_files()
+
+
+def test_unknown_commit(bare_repo):
+    with pytest.raises(GitObjectSourceError):
+        GitObjectSource(bare_repo, "no-such-branch")
+
+
+def test_changes(bare_repo):
+    source = GitObjectSource(bare_repo, "feature")
+    assert sorted(source.changed_files("main")) == [
+        Path("src/bad.F90"),
+        Path("src/good.F90"),
+    ]
+    assert source.changed_lines("main") == {
+        Path("src/bad.F90"): [(1, 4)],
+        Path("src/good.F90"): [(7, 7)],
+    }
+
+
+@pytest.mark.parametrize("option", ["diff.mnemonicPrefix", "diff.noprefix"])
+def test_changed_lines_diff_prefix(bare_repo, monkeypatch, option):
+    # The user's diff options mustn't change the file names
+    monkeypatch.setenv("GIT_CONFIG_COUNT", "1")
+    monkeypatch.setenv("GIT_CONFIG_KEY_0", option)
+    monkeypatch.setenv("GIT_CONFIG_VALUE_0", "true")
+    source = GitObjectSource(bare_repo, "feature")
+    assert sorted(source.changed_lines("main")) == [
+        Path("src/bad.F90"),
+        Path("src/good.F90"),
+    ]
+    source.close()
+
+
+def test_changed_lines_like_headers(bare_repo, tmp_path):
+    # Added and removed lines starting "++" and "--" look like the header
+    # of a file's diff
+    work = tmp_path / "work"
+    (work / "src" / "good.F90").write_text(good_fortran + "++ not a file\nkept\n")
+    (work / "README.md").write_text("-- removed\n")
+    git(work, "commit", "-q", "-a", "-m", "Plus plus")
+    git(work, "push", "-q", str(bare_repo), "feature")
+    source = GitObjectSource(bare_repo, "feature")
+    assert source.changed_lines("main") == {
+        Path("README.md"): [(1, 1)],
+        Path("src/bad.F90"): [(1, 4)],
+        Path("src/good.F90"): [(7, 8)],
+    }
+    source.close()
+
+
+def test_pickle(bare_repo):
+    source = GitObjectSource(bare_repo, "feature")
+    source.read_text(Path("src/bad.F90"))
+    copy = pickle.loads(pickle.dumps(source))
+    assert copy.read_text(Path("src/bad.F90")) == bad_fortran
+    copy.close()
+    source.close()
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_check_commit(bare_repo, tmp_path, executor):
+    source = GitObjectSource(bare_repo, "feature")
+    files = source.changed_files("main")
+    cache = ResultCache(tmp_path / "cache.db")
+    for expected_hits in (0, 2):
+        checker = ConformanceChecker(
+            create_style_checkers(["Fortran"], files, print_volume=0),
+            max_workers=2,
+            executor=executor,
+            cache=cache,
+            source=source,
+        )
+        checker.check_files()
+        results = {result.file_path: result.all_passed for result in checker.results}
+        assert results == {"src/bad.F90": False, "src/good.F90": True}
+        assert cache.hits == expected_hits
+    cache.close()
+    source.close()
+
+
+def test_check_commit_fortran_and_c(bare_repo, tmp_path):
+    # Checkers for each file type in threads share the one source, and
+    # mustn't see its file list until it has all been read
+    work = tmp_path / "work"
+    (work / "src" / "util.c").write_text("int x = 1;\n")
+    git(work, "add", ".")
+    git(work, "commit", "-q", "-m", "Add C")
+    git(work, "push", "-q", str(bare_repo), "feature")
+    source = GitObjectSource(bare_repo, "feature")
+    files = source.changed_files("main")
+    checker = ConformanceChecker(
+        create_style_checkers(["Fortran", "C"], files, print_volume=0),
+        max_workers=4,
+        executor="thread",
+        source=source,
+    )
+    checker.check_files()
+    assert sorted(result.file_path for result in checker.results) == [
+        "src/bad.F90",
+        "src/good.F90",
+        "src/util.c",
+    ]
+    source.close()
@@ -0,0 +1,110 @@
+import json
+import pytest
+import sys
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from result_writers import (
+    JsonResultWriter,
+    JUnitResultWriter,
+    SarifResultWriter,
+    error_details,
+)
+from umdp3_checker_rules import TestResult
+from umdp3_conformance import CheckResult
+
+# Prevent pytest from trying to collect TestResult as more tests:
+TestResult.__test__ = False
+
+
+@pytest.fixture
+def results():
+    passed = TestResult(checker_name="Tabs", failure_count=0, passed=True)
+    go_to = TestResult(
+        checker_name="GO TO other than 9999",
+        failure_count=2,
+        passed=False,
+        output="Checked 4 lines, found 2 failures.",
+        errors={"GO TO 10": [2], "GO TO <20> & 'x'": [3]},
+    )
+    ruff = TestResult(
+        checker_name="ruff", failure_count=1, passed=False, errors={"ruff": "boom"}
+    )
+    return [
+        CheckResult("good.F90", 0, True, [passed]),
+        CheckResult("bad.F90", 1, False, [passed, go_to]),
+        CheckResult("bad.py", 1, False, [ruff]),
+    ]
+
+
+error_parameters = [
+    ({"GO TO 10": [2, 5]}, [("GO TO 10", [2, 5])], "Line numbers"),
+    ({"missing": [0]}, [("missing", [])], "Whole file"),
+    ({"ruff": "stderr text"}, [("ruff : stderr text", [])], "External text"),
+]
+
+
+@pytest.mark.parametrize(
+    "errors, expected",
+    [data[:2] for data in error_parameters],
+    ids=[data[2] for data in error_parameters],
+)
+def test_error_details(errors, expected):
+    assert error_details(errors) == expected
+
+
+def test_json_writer(results, tmp_path):
+    with JsonResultWriter(tmp_path / "results.json", version="1.0") as writer:
+        for result in results:
+            writer.write(result)
+    report = json.loads((tmp_path / "results.json").read_text())
+    assert report["checker_version"] == "1.0"
+    assert [r["file_path"] for r in report["results"]] == [
+        "good.F90",
+        "bad.F90",
+        "bad.py",
+    ]
+    assert report["summary"] == {"files_checked": 3, "files_failed": 2}
+    assert CheckResult.from_dict(report["results"][1]) == results[1]
+
+
+def test_junit_writer(results, tmp_path):
+    with JUnitResultWriter(tmp_path / "results.xml") as writer:
+        for result in results:
+            writer.write(result)
+    root = ElementTree.parse(tmp_path / "results.xml").getroot()
+    suites = root.findall("testsuite")
+    assert [suite.get("name") for suite in suites] == ["good.F90", "bad.F90", "bad.py"]
+    assert suites[1].get("failures") == "1"
+    failures = suites[1].findall("testcase/failure")
+    assert len(failures) == 1
+    assert failures[0].get("message") == "Found 2 failures"
+    assert "GO TO <20> & 'x' (lines 3)" in failures[0].text
+
+
+def test_sarif_writer(results, tmp_path):
+    with SarifResultWriter(tmp_path / "results.sarif", version="1.0") as writer:
+        for result in results:
+            writer.write(result)
+    report = json.loads((tmp_path / "results.sarif").read_text())
+    assert report["version"] == "2.1.0"
+    run = report["runs"][0]
+    assert [rule["id"] for rule in run["tool"]["driver"]["rules"]] == [
+        "GO TO other than 9999",
+        "ruff",
+    ]
+    locations = [
+        (
+            result["locations"][0]["physicalLocation"]["artifactLocation"]["uri"],
+            result["locations"][0]["physicalLocation"].get("region"),
+        )
+        for result in run["results"]
+    ]
+    assert locations == [
+        ("bad.F90", {"startLine": 2}),
+        ("bad.F90", {"startLine": 3}),
+        ("bad.py", None),
+    ]
+    assert {result["level"] for result in run["results"]} == {"error"}
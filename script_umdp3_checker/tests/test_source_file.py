@@ -0,0 +1,90 @@
+import mmap
+import pytest
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import source_file
+from fortran_source_view import FortranSourceView
+from source_file import SourceFile
+from umdp3_conformance import ConformanceChecker, create_style_checkers
+
+# Test data for iter_lines: (contents, test id)
+line_params = [
+    (b"", "empty"),
+    (b"one\ntwo\n", "final newline"),
+    (b"one\ntwo", "no final newline"),
+    (b"one\r\ntwo\r\n", "CRLF"),
+    (b"\n\none\n\n", "blank lines"),
+    (b"one\x0ctwo\rthree\n", "other line breaks"),
+    ("café °C\n".encode(), "UTF-8"),
+    (b"bad \xff byte\n", "invalid UTF-8"),
+]
+
+
+@pytest.mark.parametrize(
+    "data", [data[0] for data in line_params], ids=[data[1] for data in line_params]
+)
+def test_iter_lines(data):
+    contents = SourceFile(data)
+    assert list(contents.iter_lines()) == contents.text.splitlines()
+    assert contents.view.lines == contents.text.splitlines()
+
+
+def test_invalid_utf8_replaced():
+    contents = SourceFile(b"x = 1 ! \xe9t\xe9\n")
+    assert contents.text == "x = 1 ! �t�\n"
+
+
+def test_large_files_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(source_file, "mmap_size", 16)
+    small_file = tmp_path / "small.F90"
+    small_file.write_text("x = 1\n")
+    large_file = tmp_path / "large.F90"
+    large_file.write_text("x = 1\n" * 10)
+    with SourceFile.open(small_file) as contents:
+        assert isinstance(contents.data, bytes)
+    with SourceFile.open(large_file) as contents:
+        assert isinstance(contents.data, mmap.mmap)
+        assert list(contents.iter_lines()) == ["x = 1"] * 10
+        assert len(contents.view) == 10
+    assert contents.data.closed
+
+
+def test_binary():
+    assert SourceFile(b"\x7fELF\x00\x01").is_binary
+    assert not SourceFile(b"PROGRAM main\n").is_binary
+
+
+def test_checking_awkward_files(tmp_path, monkeypatch):
+    binary_file = tmp_path / "data.F90"
+    binary_file.write_bytes(b"\x00\x01\x02 \xff")
+    latin1_file = tmp_path / "latin1.F90"
+    latin1_file.write_bytes(b"! Crown copyright\n! Code Owner: Ren\xe9\n")
+    text_file = tmp_path / "table.txt"
+    text_file.write_text("1 2 3\n4 5 6 \n")
+    checkers = create_style_checkers(
+        ["Fortran", "Generic"], [binary_file, latin1_file, text_file], print_volume=0
+    )
+
+    # Only trailing whitespace is checked in a .txt file, which can be done
+    # a line at a time, so it needn't be pre-lexed.
+    from_text = FortranSourceView.from_text
+
+    def from_text_not_txt(text):
+        assert not text.startswith("1 2 3")
+        return from_text(text)
+
+    monkeypatch.setattr(FortranSourceView, "from_text", from_text_not_txt)
+    conformance = ConformanceChecker(checkers)
+    conformance.check_files()
+    results = {Path(result.file_path).name: result for result in conformance.results}
+
+    assert results["data.F90"].all_passed
+    assert [test.checker_name for test in results["data.F90"].test_results] == [
+        "Binary file skipped"
+    ]
+    assert len(results["latin1.F90"].test_results) > 1
+    (whitespace,) = results["table.txt"].test_results
+    assert whitespace.errors == {"trailing whitespace": [2]}
@@ -150,7 +150,7 @@ def test_c_specific():
 
     result = umdp3_checker.c_deprecated(c_deprecated)
     print(
-        f"Deprecated C identifiers test: {'PASS' if result > 0 else 'FAIL'} (expected failure)"
+        f"Deprecated C identifiers test: {'PASS' if result.failure_count > 0 else 'FAIL'} (expected failure)"
     )
 
     # Test format specifiers
@@ -158,7 +158,7 @@ def test_c_specific():
 
     result = umdp3_checker.c_integral_format_specifiers(c_format)
     print(
-        f"C format specifiers test: {'PASS' if result > 0 else 'FAIL'} (expected failure)"
+        f"C format specifiers test: {'PASS' if result.failure_count > 0 else 'FAIL'} (expected failure)"
     )
 
 
@@ -0,0 +1,596 @@
+import json
+import pickle
+import sqlite3
+from collections import Counter
+import pytest
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from umdp3_conformance import (
+    BatchCommand,
+    ConformanceChecker,
+    ExternalChecker,
+    UMDP3_checker,
+    create_style_checkers,
+    load_shard_results,
+    make_batches,
+    parse_ruff_json,
+    shard_files,
+)
+from checker_dispatch_tables import CheckerDispatchTables
+from umdp3_checker_rules import UMDP3Checker, line_rules
+import result_cache
+from result_cache import ResultCache
+from result_writers import JsonResultWriter
+from source_file import SourceFile
+from rule_profile import RuleProfile, load_rule_costs, read_rule_name
+
+good_fortran = """! Crown copyright
+! Code Owner: Someone
+MODULE good_mod
+IMPLICIT NONE
+INTEGER :: i
+END MODULE good_mod
+"""
+
+bad_fortran = """module bad_mod
+integer :: i
+  !$OMP PARALLEL
+end module bad_mod
+"""
+
+
+@pytest.fixture
+def fortran_files(tmp_path):
+    files = []
+    for count in range(6):
+        file_path = tmp_path / f"file_{count}.F90"
+        file_path.write_text(good_fortran if count % 2 else bad_fortran)
+        files.append(file_path)
+    return files
+
+
+def summarise(results):
+    return sorted(
+        (result.file_path, result.tests_failed, result.all_passed) for result in results
+    )
+
+
+batch_parameters = [
+    (list(range(5)), 2, [[0, 1], [2, 3], [4]], "Uneven batches"),
+    (list(range(4)), 4, [[0, 1, 2, 3]], "Single batch"),
+    ([], 3, [], "No files"),
+    (list(range(2)), 0, [[0], [1]], "Batch size clamped to one"),
+]
+
+
+@pytest.mark.parametrize(
+    "files, batch_size, expected",
+    [data[:3] for data in batch_parameters],
+    ids=[data[3] for data in batch_parameters],
+)
+def test_make_batches(files, batch_size, expected):
+    assert make_batches(files, batch_size) == expected
+
+
+def test_unknown_executor():
+    with pytest.raises(ValueError):
+        ConformanceChecker([], executor="carrier pigeon")
+
+
+def test_process_pool_matches_thread_pool(fortran_files):
+    checkers = create_style_checkers(["Fortran"], fortran_files, print_volume=0)
+    threaded = ConformanceChecker(checkers, max_workers=2, executor="thread")
+    threaded.check_files()
+    processes = ConformanceChecker(
+        checkers, max_workers=2, executor="process", batch_size=2
+    )
+    processes.check_files()
+    assert len(processes.results) == len(fortran_files)
+    assert summarise(processes.results) == summarise(threaded.results)
+    assert not all(result.all_passed for result in processes.results)
+
+
+@pytest.mark.parametrize("executor", ConformanceChecker.executors)
+def test_results_streamed_then_sorted(fortran_files, executor):
+    checkers = create_style_checkers(["Fortran"], fortran_files, print_volume=0)
+    conformance = ConformanceChecker(
+        checkers, max_workers=2, executor=executor, batch_size=1
+    )
+    streamed = []
+    conformance.check_files(on_result=streamed.append)
+    assert sorted(r.file_path for r in streamed) == sorted(map(str, fortran_files))
+    assert [r.file_path for r in conformance.results] == sorted(map(str, fortran_files))
+
+
+def test_default_batch_size(fortran_files):
+    dispatch_tables = CheckerDispatchTables()
+    checker = UMDP3_checker(
+        "Fortran",
+        {".F90"},
+        dispatch_tables.get_file_dispatch_table_all(),
+        fortran_files * 100,
+    )
+    conformance = ConformanceChecker([checker], max_workers=2, executor="process")
+    assert conformance.get_batch_size() == 64
+    conformance.max_workers = 200
+    assert conformance.get_batch_size() == 1
+
+
+# Code breaking each of the line rules, in some of the ways they can be broken
+line_rules_fortran = """\
+! Crown copyright
+! Code Owner: Someone
+! GO TO 10 and PRINT * in a comment aren't code
+SUBROUTINE everything()
+USE iso_c_binding
+USE, INTRINSIC :: ISO_FORTRAN_ENV
+USE :: ISO_C_BINDING, ONLY: c_int
+IMPLICIT NONE
+REAL :: x, y
+EQUIVALENCE (x, y)
+IF (x .GT. y .and. y .Ne. 0.0) THEN
+  GO TO 10
+ELSEIF (x > 1.0) THEN
+  GOTO 9999
+  go to 20
+ENDIF
+PRINT *, 'WRITE(*,*) in a string'
+print*, x
+WRITE(*,*) x
+WRITE(6, '(A)') "GO TO 30"
+write ( 6 , * ) y
+x = ALOG(y) + amax1(x, y) + alog10(y)
+DO
+  EXIT
+END DO
+outer: DO
+  exit outer
+ENDDO outer
+READ(5, *) x
+READ (UNIT=5, FMT=*) y
+read(unit, *) y
+PAUSE
+STOP
+CALL Abort()
+10 CONTINUE
+20 CONTINUE
+9999 CONTINUE
+END SUBROUTINE everything
+"""
+
+# The results of each line rule on line_rules_fortran, as found by the
+# original one regex loop per rule implementation
+line_rules_expected = {
+    "unseparated_keywords": (
+        4,
+        {
+            "unseparated keyword in line: ELSEIF (x > 1.0) THEN": [13],
+            "unseparated keyword in line: ENDDO outer": [28],
+            "unseparated keyword in line: ENDIF": [16],
+            "unseparated keyword in line: GOTO 9999": [14],
+        },
+    ),
+    "go_to_other_than_9999": (2, {"GO TO 10": [12], "GO TO 20": [15]}),
+    "write_using_default_format": (1, {"WRITE(*,*) found": [19]}),
+    "forbidden_keywords": (2, {"forbidden keyword": [10, 32]}),
+    "forbidden_operators": (
+        2,
+        {"old operator .GT.": [11], "old operator .NE.": [11]},
+    ),
+    "printstar": (2, {"PRINT * used": [17, 18]}),
+    "write6": (2, {"WRITE(6) used": [20, 21]}),
+    "obsolescent_fortran_intrinsic": (
+        3,
+        {
+            "obsolescent intrinsic: ALOG": [22],
+            "obsolescent intrinsic: ALOG10": [22],
+            "obsolescent intrinsic: AMAX1": [22],
+        },
+    ),
+    "exit_stmt_label": (1, {"unlabelled EXIT statement": [24]}),
+    "intrinsic_modules": (
+        2,
+        {"intrinsic module ISO_C_BINDING without INTRINSIC": [5, 7]},
+    ),
+    "read_unit_args": (2, {"READ without explicit UNIT=": [29, 31]}),
+    "forbidden_stop": (2, {"STOP or CALL abort used": [33, 34]}),
+}
+
+
+def test_line_rules_match_original(tmp_path):
+    assert set(line_rules_expected) == set(line_rules)
+    lines = line_rules_fortran.splitlines()
+    umdp3_checker = UMDP3Checker()
+    for name, expected in line_rules_expected.items():
+        result = getattr(umdp3_checker, name)(lines)
+        assert (result.failure_count, result.errors) == expected, name
+
+    # All the line rules run in one pass give the same results
+    file_path = tmp_path / "line_rules.F90"
+    file_path.write_text(line_rules_fortran)
+    check_functions = CheckerDispatchTables().get_diff_dispatch_table_fortran()
+    checker = UMDP3_checker("Fortran", {".F90"}, check_functions, [file_path])
+    assert checker.line_rule_names
+    results = {
+        result.checker_name: (result.failure_count, result.errors)
+        for result in checker.check(file_path).test_results
+    }
+    compared = [
+        name for name in line_rules_expected if line_rules[name].checker_name in results
+    ]
+    assert len(compared) == len(checker.line_rule_names)
+    for name in compared:
+        checker_name = line_rules[name].checker_name
+        assert results[checker_name] == line_rules_expected[name], name
+
+
+def test_rules_hold_no_per_file_state(fortran_files):
+    dispatch_tables = CheckerDispatchTables()
+    umdp3_checker = dispatch_tables.umdp3_checker
+    state = dict(vars(umdp3_checker))
+    check_functions = dispatch_tables.get_diff_dispatch_table_fortran()
+    for file_path in fortran_files:
+        lines = file_path.read_text().splitlines()
+        for check_function in check_functions.values():
+            check_function(lines)
+    assert vars(umdp3_checker) == state
+    # No locks or the like, so it can be sent to worker processes as is
+    assert vars(pickle.loads(pickle.dumps(umdp3_checker))) == state
+
+
+def test_changed_lines_only(tmp_path):
+    file_path = tmp_path / "legacy.F90"
+    file_path.write_text("PROGRAM legacy\nGO TO 10\nGO TO 20\nEND PROGRAM legacy\n")
+    checkers = create_style_checkers(
+        ["Fortran"], [file_path], print_volume=0, changed_lines={file_path: [(3, 3)]}
+    )
+    results = {
+        result.checker_name: result
+        for result in checkers[0].check(file_path).test_results
+    }
+    # Only the changed GO TO is reported, but whole file checks still run
+    assert results["GO TO other than 9999"].errors == {"GO TO 20": [3]}
+    assert results["implicit none"].failure_count == 1
+
+
+def test_result_cache(fortran_files, tmp_path):
+    cache = ResultCache(tmp_path / "cache.sqlite", version="test")
+    checkers = create_style_checkers(["Fortran"], fortran_files, print_volume=0)
+    first = ConformanceChecker(checkers, max_workers=2, cache=cache)
+    first.check_files()
+    assert (cache.hits, cache.misses) == (0, len(fortran_files))
+
+    fortran_files[0].write_text(good_fortran + "\n")
+    second = ConformanceChecker(checkers, max_workers=2, cache=cache)
+    second.check_files()
+    assert (cache.hits, cache.misses) == (
+        len(fortran_files) - 1,
+        len(fortran_files) + 1,
+    )
+    changed = [r for r in second.results if r.file_path == str(fortran_files[0])]
+    assert changed[0].all_passed
+    unchanged = sorted(summarise(second.results))[1:]
+    assert unchanged == sorted(summarise(first.results))[1:]
+
+    assert cache.prune(max_age_days=1) == 0
+    cache.version = "newer"
+    # Content addressed : one entry each for the good, bad and changed files
+    assert cache.prune(max_age_days=1) == 3
+    cache.close()
+
+
+def test_result_cache_shared(fortran_files, tmp_path):
+    # Another run using the same cache, e.g. a shard of the same check
+    path = tmp_path / "cache.sqlite"
+    other = ResultCache(path, version="test")
+    other.put("other", {"result": 1})
+    cache = ResultCache(path, version="test")
+    checkers = create_style_checkers(["Fortran"], fortran_files, print_volume=0)
+    ConformanceChecker(checkers, max_workers=2, cache=cache).check_files()
+    # Neither holds on to the database between changes
+    assert other.get("other") == {"result": 1}
+    other.put("other", {"result": 2})
+    assert cache.get("other") == {"result": 2}
+    assert cache.enabled and other.enabled
+    other.close()
+    cache.close()
+
+
+def test_result_cache_locked(fortran_files, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(result_cache, "busy_timeout", 0.1)
+    path = tmp_path / "cache.sqlite"
+    cache = ResultCache(path, version="test")
+    locker = sqlite3.connect(path)
+    locker.execute("BEGIN EXCLUSIVE")
+    checkers = create_style_checkers(["Fortran"], fortran_files, print_volume=0)
+    conformance = ConformanceChecker(checkers, max_workers=2, cache=cache)
+    conformance.check_files()
+    assert len(conformance.results) == len(fortran_files)
+    assert not cache.enabled
+    assert "continuing without it" in capsys.readouterr().err
+    locker.rollback()
+    locker.close()
+    cache.close()
+
+
+def test_one_result_per_file(tmp_path, monkeypatch):
+    fortran_file = tmp_path / "code.F90"
+    fortran_file.write_text(good_fortran + "x = 1 \n")
+    c_file = tmp_path / "code.c"
+    c_file.write_text("#ifdef _OPENMP\nint i;")
+    python_file = tmp_path / "code.py"
+    python_file.write_text("x = 1\n")
+    files = [fortran_file, c_file, python_file]
+
+    read_counts = Counter()
+    open_file = SourceFile.open.__func__
+
+    def counting_open(cls, file_path):
+        read_counts[file_path.name] += 1
+        return open_file(cls, file_path)
+
+    monkeypatch.setattr(SourceFile, "open", classmethod(counting_open))
+    checkers = create_style_checkers(
+        ["Fortran", "C", "Python", "Generic"], files, print_volume=0
+    )
+    conformance = ConformanceChecker(checkers, max_workers=2)
+    conformance.check_files()
+    assert [r.file_path for r in conformance.results] == sorted(map(str, files))
+    assert read_counts["code.F90"] == 1 and read_counts["code.c"] == 1
+
+    results = {Path(r.file_path).suffix: r for r in conformance.results}
+    names = {
+        suffix: [test.checker_name for test in result.test_results]
+        for suffix, result in results.items()
+    }
+    # The generic trailing whitespace check is run once on each file
+    assert all(tests.count("Trailing Whitespace") == 1 for tests in names.values())
+    assert "C Final Newline" in names[".c"]
+    assert "ruff" in names[".py"]
+    failed = {
+        test.checker_name for test in results[".c"].test_results if not test.passed
+    }
+    assert failed >= {"C Final Newline", "C #ifdef Defines"}
+    assert results[".c"].tests_failed == len(failed)
+
+
+def test_compliant_c_file(tmp_path):
+    c_file = tmp_path / "code.c"
+    c_file.write_text(
+        "/* (C) Crown copyright Met Office. All rights reserved.\n"
+        " * Code Owner: Someone */\n"
+        "#include <stdio.h>\n"
+        "\n"
+        "int main(void) {\n"
+        '  printf("%d \\n", 42);\n'
+        "  return 0;\n"
+        "}\n"
+    )
+    checkers = create_style_checkers(["C"], [c_file], print_volume=0)
+    conformance = ConformanceChecker(checkers)
+    conformance.check_files()
+    [result] = conformance.results
+    assert "Crown Copyright Statement" in [
+        test.checker_name for test in result.test_results
+    ]
+    assert result.all_passed, [
+        test.checker_name for test in result.test_results if not test.passed
+    ]
+
+
+@pytest.mark.parametrize("executor", ConformanceChecker.executors)
+def test_profile(fortran_files, tmp_path, executor):
+    profile = RuleProfile()
+    checkers = create_style_checkers(["Fortran"], fortran_files, print_volume=0)
+    conformance = ConformanceChecker(
+        checkers, max_workers=2, executor=executor, batch_size=2, profile=profile
+    )
+    conformance.check_files()
+    files = profile.file_totals()
+    assert sorted(entry["file"] for entry in files) == sorted(
+        str(file_path) for file_path in fortran_files
+    )
+    rules = {entry["rule"]: entry for entry in profile.rule_totals()}
+    assert rules[read_rule_name]["calls"] == len(fortran_files)
+    assert "Lowercase or CamelCase variable names only" in rules
+    seconds = [entry["seconds"] for entry in profile.rule_totals()]
+    assert seconds == sorted(seconds, reverse=True)
+    assert profile.total_seconds() == pytest.approx(sum(seconds))
+
+    profile.write_json(tmp_path / "profile.json")
+    assert json.loads((tmp_path / "profile.json").read_text())["rules"]
+    assert "Slowest rules" in profile.report(limit=3)
+
+
+# Stand in for a linter : reports a failure on line 1 of any file named bad*
+fake_linter = """
+import json, sys
+from pathlib import Path
+print(json.dumps([
+    {"filename": name, "code": "X1", "message": "bad file",
+     "location": {"row": 1, "column": 1}}
+    for name in sys.argv[1:] if Path(name).name.startswith("bad")
+]))
+"""
+
+
+@pytest.fixture
+def python_files(tmp_path):
+    files = []
+    for name in ["good_1.py", "bad_1.py", "good_2.py", "bad_2.py"]:
+        file_path = tmp_path / name
+        file_path.write_text("x = 1\n")
+        files.append(file_path)
+    return files
+
+
+def test_parse_ruff_json(tmp_path):
+    output = json.dumps(
+        [
+            {
+                "filename": str(tmp_path / "a.py"),
+                "code": "F401",
+                "message": "unused import",
+                "location": {"row": 3, "column": 8},
+            }
+        ]
+    )
+    assert parse_ruff_json(output) == {
+        str((tmp_path / "a.py").resolve()): ["3:8: F401 unused import"]
+    }
+    assert parse_ruff_json("") == {}
+
+
+def test_external_checker_batches(python_files):
+    batch_command = BatchCommand([sys.executable, "-c", fake_linter], parse_ruff_json)
+    checker = ExternalChecker(
+        "Fake",
+        {".py"},
+        {"fake": [sys.executable, "-c", "pass"]},
+        python_files,
+        batch_commands={"fake": batch_command},
+    )
+    checker.max_argument_length = len(str(python_files[0])) * 3
+    chunks = checker.make_chunks(python_files)
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+
+    conformance = ConformanceChecker([checker], max_workers=2)
+    conformance.check_files()
+    failed = sorted(
+        Path(result.file_path).name
+        for result in conformance.results
+        if not result.all_passed
+    )
+    assert failed == ["bad_1.py", "bad_2.py"]
+    assert len(conformance.results) == len(python_files)
+
+
+def test_external_checker_without_batches(python_files):
+    checker = ExternalChecker(
+        "Fake", {".py"}, {"fake": [sys.executable, "-c", "pass"]}, python_files
+    )
+    assert checker.make_chunks(python_files) == [[f] for f in python_files]
+    results = checker.check_batch(python_files)
+    assert all(result.all_passed for result in results)
+
+
+def run_fake_batch(script, python_files):
+    """Results of an ExternalChecker batch command running a Python script."""
+    batch_command = BatchCommand([sys.executable, "-c", script], parse_ruff_json)
+    checker = ExternalChecker(
+        "Fake",
+        {".py"},
+        {"fake": [sys.executable, "-c", "pass"]},
+        python_files,
+        batch_commands={"fake": batch_command},
+    )
+    return checker.check_batch(python_files)
+
+
+def test_external_checker_batch_command_fails(python_files):
+    # As ruff does with a bad configuration : no output, but exit status 2
+    script = "import sys; sys.stderr.write('bad ruff.toml'); sys.exit(2)"
+    results = run_fake_batch(script, python_files)
+    assert len(results) == len(python_files)
+    for result in results:
+        assert not result.all_passed
+        assert result.test_results[0].errors == {"fake": "bad ruff.toml"}
+
+
+def test_external_checker_unmatched_failures(python_files):
+    # Failures for a path which isn't one of the files checked
+    script = fake_linter.replace("for name in sys.argv[1:]", "for name in ['x/bad']")
+    results = run_fake_batch(script, python_files)
+    assert not any(result.all_passed for result in results)
+    assert "unknown files" in results[0].test_results[0].output
+
+
+def test_shard_files():
+    sizes = {Path(f"file_{i:02d}.F90"): (i * 37) % 101 + 1 for i in range(40)}
+    files = list(sizes)
+    shards = [shard_files(files, index, 3, sizes.get) for index in (1, 2, 3)]
+    # Every file is in exactly one shard, whatever order they're found in
+    assert sorted(sum(shards, [])) == sorted(files)
+    assert shard_files(files[::-1], 2, 3, sizes.get) == shards[1]
+    # Shards are balanced by size, to within the largest file
+    totals = [sum(sizes[f] for f in shard) for shard in shards]
+    assert max(totals) - min(totals) <= max(sizes.values())
+    with pytest.raises(ValueError):
+        shard_files(files, 4, 3, sizes.get)
+
+
+def test_merge_shards(fortran_files, tmp_path):
+    checker = ConformanceChecker(
+        create_style_checkers(["Fortran"], fortran_files, print_volume=0)
+    )
+    checker.check_files()
+    paths = []
+    for index, result in enumerate(checker.results, start=1):
+        path = tmp_path / f"shard_{index}.json"
+        with JsonResultWriter(path, version="1", shard=(index, 6)) as writer:
+            writer.write(result)
+        paths.append(path)
+
+    assert load_shard_results(paths[::-1]) == checker.results
+    with pytest.raises(ValueError, match="Expected each of shards"):
+        load_shard_results(paths[:1])
+    with pytest.raises(ValueError, match="Expected each of shards"):
+        load_shard_results(paths + paths[:1])
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_fail_fast(tmp_path, executor):
+    files = []
+    for count in range(100):
+        file_path = tmp_path / f"file_{count:02d}.F90"
+        file_path.write_text(bad_fortran)
+        files.append(file_path)
+    checker = ConformanceChecker(
+        create_style_checkers(["Fortran"], files, print_volume=0),
+        max_workers=1,
+        executor=executor,
+        batch_size=1,
+        max_failures=2,
+    )
+    checker.check_files()
+    assert 2 <= len(checker.results) < len(files)
+    assert checker.stopped
+    # Each failed file stops at its first failing check
+    assert all(result.tests_failed == 1 for result in checker.results)
+
+
+def test_fail_fast_runs_cheapest_first(tmp_path):
+    file_path = tmp_path / "bad.F90"
+    file_path.write_text(bad_fortran)
+    (umdp3_checker,) = create_style_checkers(["Fortran"], [file_path], print_volume=0)
+    rule_costs = {name: 1.0 for name in umdp3_checker.check_functions}
+    rule_costs["File missing crown copyright statement or agreement reference"] = 0.0
+    checker = ConformanceChecker([umdp3_checker], max_failures=1, rule_costs=rule_costs)
+    checker.check_files()
+    (result,) = checker.results
+    assert [test.checker_name for test in result.test_results] == [
+        "Crown Copyright Statement"
+    ]
+
+    # Without fail fast, every check is run
+    checker = ConformanceChecker([umdp3_checker], rule_costs=rule_costs)
+    checker.check_files()
+    assert len(checker.results[0].test_results) == len(umdp3_checker.check_functions)
+
+
+def test_load_rule_costs(tmp_path):
+    profile = RuleProfile()
+    profile.record("UMDP3 Checker", "Slow rule", "a.F90", 3.0)
+    profile.record("UMDP3 Checker", "Slow rule", "b.F90", 1.0)
+    profile.record("UMDP3 Checker", "Fast rule", "a.F90", 0.5)
+    profile.write_json(tmp_path / "profile.json")
+    assert load_rule_costs(tmp_path / "profile.json") == {
+        "Slow rule": 2.0,
+        "Fast rule": 0.5,
+    }
+    baseline = {"rules": {"Slow rule": 4.0, "Fast rule": 1.0}, "runs": {}}
+    (tmp_path / "baseline.json").write_text(json.dumps(baseline))
+    assert load_rule_costs(tmp_path / "baseline.json") == baseline["rules"]
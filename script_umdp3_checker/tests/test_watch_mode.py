@@ -0,0 +1,126 @@
+import os
+import threading
+import pytest
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from umdp3_conformance import ConformanceChecker, create_style_checkers
+from watch_mode import (
+    IncrementalChecker,
+    InotifyWatcher,
+    PollingWatcher,
+    violations,
+)
+
+good_fortran = """! Crown copyright
+! Code Owner: Someone
+MODULE good_mod
+IMPLICIT NONE
+INTEGER :: i
+END MODULE good_mod
+"""
+
+
+@pytest.fixture
+def checked_files(tmp_path):
+    """Two Fortran files, checked once, with their IncrementalChecker."""
+    files = [tmp_path / "one.F90", tmp_path / "two.F90"]
+    for file_path in files:
+        file_path.write_text(good_fortran)
+    checkers = create_style_checkers(["Fortran"], files, print_volume=0)
+    conformance = ConformanceChecker(checkers)
+    conformance.check_files()
+    return files, IncrementalChecker(checkers, conformance.results)
+
+
+def test_recheck_reports_changes(checked_files):
+    (one, two), incremental = checked_files
+    assert incremental.all_passed
+
+    # Touching a file without changing it doesn't re-check it
+    os.utime(two)
+    assert incremental.recheck({two}) == []
+
+    one.write_text(good_fortran.replace("INTEGER :: i", "INTEGER :: i \t"))
+    changes = incremental.recheck({one, two})
+    assert changes == [
+        f"+ {one}:5 : Line includes tab character : tab character found",
+        f"+ {one}:5 : Trailing Whitespace : trailing whitespace",
+    ]
+    assert not incremental.all_passed
+
+    one.write_text(good_fortran.replace("INTEGER :: i", "INTEGER :: i \n"))
+    # The tab is fixed, while the trailing whitespace remains
+    assert incremental.recheck({one}) == [
+        f"- {one}:5 : Line includes tab character : tab character found",
+    ]
+
+
+def test_recheck_follows_moved_lines(checked_files):
+    (one, _), incremental = checked_files
+    one.write_text(good_fortran.replace("INTEGER :: i", "INTEGER :: i \nREAL :: x "))
+    assert incremental.recheck({one}) == [
+        f"+ {one}:5 : Trailing Whitespace : trailing whitespace",
+        f"+ {one}:6 : Trailing Whitespace : trailing whitespace",
+    ]
+    # Lines added above the violations move them, without changing them
+    one.write_text(
+        good_fortran.replace(
+            "IMPLICIT NONE", "IMPLICIT NONE\n! Added\n! Lines\nREAL :: y \t"
+        ).replace("INTEGER :: i", "INTEGER :: i \nREAL :: x ")
+    )
+    assert incremental.recheck({one}) == [
+        f"+ {one}:7 : Line includes tab character : tab character found",
+        f"+ {one}:7 : Trailing Whitespace : trailing whitespace",
+    ]
+    # Only the violation fixed is reported, though the others have moved
+    one.write_text(
+        good_fortran.replace("IMPLICIT NONE", "IMPLICIT NONE\nREAL :: y \t")
+        .replace("INTEGER :: i", "INTEGER :: i \nREAL :: x")
+        .replace("MODULE good_mod\nI", "MODULE good_mod\n\nI")
+    )
+    assert incremental.recheck({one}) == [
+        f"- {one}:9 : Trailing Whitespace : trailing whitespace",
+    ]
+
+
+def test_violations(checked_files):
+    (one, _), incremental = checked_files
+    assert violations(incremental.results[str(one)], one.read_text().splitlines()) == {}
+
+
+def change_soon(file_path, text):
+    """Write to a file from another thread, once the watcher is waiting."""
+    timer = threading.Timer(0.2, file_path.write_text, args=(text,))
+    timer.start()
+    return timer
+
+
+def test_polling_watcher(tmp_path):
+    file_path = tmp_path / "one.F90"
+    file_path.write_text(good_fortran)
+    watcher = PollingWatcher([file_path], interval=0.05)
+    assert watcher.wait(timeout=0.1) == set()
+    change_soon(file_path, good_fortran + "! Changed size\n").join()
+    assert watcher.wait(timeout=5) == {file_path}
+    watcher.close()
+
+
+def test_inotify_watcher(tmp_path):
+    file_path = tmp_path / "one.F90"
+    other_path = tmp_path / "other.F90"
+    file_path.write_text(good_fortran)
+    try:
+        watcher = InotifyWatcher([file_path])
+    except (OSError, AttributeError):
+        pytest.skip("inotify isn't available")
+    assert watcher.wait(timeout=0.1) == set()
+    # Changes to other files in the directory are ignored
+    change_soon(other_path, "! Other\n")
+    assert watcher.wait(timeout=0.5) == set()
+    timer = change_soon(file_path, good_fortran + "! Changed\n")
+    assert watcher.wait(timeout=5) == {file_path}
+    timer.join()
+    watcher.close()
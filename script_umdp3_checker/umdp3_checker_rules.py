@@ -9,10 +9,12 @@ Package to contain functions which test for UMDP3 compliance.
 Python translation of the original Perl UMDP3.pm module.
 """
 
+import functools
 import re
-import threading
-from typing import List, Dict
-from fortran_keywords import fortran_keywords
+from typing import FrozenSet, List, Dict
+from fortran_keywords import fortran_keywords_set
+from fortran_source_view import FortranSourceView, remove_quoted
+from line_rule_engine import LineRule, LineRuleScanner, WordListRule
 from search_lists import (
     obsolescent_intrinsics,
     unseparated_keywords_list,
@@ -31,7 +33,154 @@ TODO : Several of the test functions are poor shadows of the original
 """
 
 # Declare version
-VERSION = "13.5.0"
+VERSION = "13.5.2"
+
+
+class GoToRule(LineRule):
+    """GO TO statements fail unless going to label 9999"""
+
+    def find_errors(self, view, count, words):
+        if match := self.pattern.search(self.line(view, count)):
+            if match.group(1) != "9999":
+                return [f"GO TO {match.group(1)}"]
+        return []
+
+
+class OldOperatorRule(LineRule):
+    """Fails once for each older form of relational operator on a line"""
+
+    old_operators = [".GT.", ".GE.", ".LT.", ".LE.", ".EQ.", ".NE."]
+
+    def find_errors(self, view, count, words):
+        upper_line = self.line(view, count).upper()
+        return [f"old operator {op}" for op in self.old_operators if op in upper_line]
+
+
+class IntrinsicModuleRule(LineRule):
+    """Intrinsic modules must be USEd with the INTRINSIC keyword"""
+
+    module_patterns = {
+        module: re.compile(rf"\bUSE\s+(::)*\s*{module}\b", re.IGNORECASE)
+        for module in ["ISO_C_BINDING", "ISO_FORTRAN_ENV"]
+    }
+
+    def find_errors(self, view, count, words):
+        if "INTRINSIC" in words:
+            return []
+        line = self.line(view, count)
+        return [
+            f"intrinsic module {module} without INTRINSIC"
+            for module, pattern in self.module_patterns.items()
+            if pattern.search(line)
+        ]
+
+
+class ReadUnitRule(LineRule):
+    """READ statements must have UNIT= as their first argument"""
+
+    def find_errors(self, view, count, words):
+        if match := self.pattern.search(self.line(view, count)):
+            if not match.group(1).strip().upper().startswith("UNIT="):
+                return [self.message]
+        return []
+
+
+# Intrinsic functions which mustn't be declared as variables
+shadowed_intrinsics = ["SIN", "COS", "LOG", "EXP", "TAN"]
+
+# Two or more capitals together, which aren't allowed in variable names
+uppercase_run = re.compile(r"[A-Z]{2,}")
+
+
+"""
+Rules tested a line at a time, keyed by the name of the UMDP3Checker method
+which runs them. These can be run together in one pass over a file by a
+LineRuleScanner. See line_rule_engine.py"""
+line_rules = {
+    "unseparated_keywords": WordListRule(
+        "Unseparated Keywords",
+        frozenset(unseparated_keywords_list),
+        "unseparated keyword in line: ",
+        source="unquoted",
+        skip_comments=True,
+        message_uses_line=True,
+    ),
+    "go_to_other_than_9999": GoToRule(
+        "GO TO other than 9999",
+        frozenset({"GO", "GOTO"}),
+        pattern=re.compile(r"\bGO\s*TO\s+(\d+)", re.IGNORECASE),
+    ),
+    "write_using_default_format": LineRule(
+        "WRITE using default format",
+        frozenset({"WRITE"}),
+        "WRITE(*,*) found",
+        re.compile(r"\bWRITE\s*\(\s*\*\s*,\s*\*\s*\)", re.IGNORECASE),
+    ),
+    "forbidden_keywords": LineRule(
+        "Use of forbidden keywords EQUIVALENCE or PAUSE",
+        frozenset({"EQUIVALENCE", "PAUSE"}),
+        "forbidden keyword",
+    ),
+    "forbidden_operators": OldOperatorRule(
+        "Use of older form of relational operator (.GT. etc.)",
+        frozenset({"GT", "GE", "LT", "LE", "EQ", "NE"}),
+    ),
+    "printstar": LineRule(
+        "Use of PRINT rather than umMessage and umPrint",
+        frozenset({"PRINT"}),
+        "PRINT * used",
+        re.compile(r"\bPRINT\s*\*", re.IGNORECASE),
+    ),
+    "write6": LineRule(
+        "Use of WRITE(6) rather than umMessage and umPrint",
+        frozenset({"WRITE"}),
+        "WRITE(6) used",
+        re.compile(r"\bWRITE\s*\(\s*6\s*,", re.IGNORECASE),
+    ),
+    "obsolescent_fortran_intrinsic": WordListRule(
+        "obsolescent intrinsic",
+        frozenset(obsolescent_intrinsics),
+        "obsolescent intrinsic: ",
+    ),
+    "exit_stmt_label": LineRule(
+        "unlabelled EXIT statement",
+        frozenset({"EXIT"}),
+        "unlabelled EXIT statement",
+        re.compile(r"\bEXIT\s*$", re.IGNORECASE),
+    ),
+    "intrinsic_modules": IntrinsicModuleRule(
+        "intrinsic modules",
+        frozenset(IntrinsicModuleRule.module_patterns),
+    ),
+    "read_unit_args": ReadUnitRule(
+        "read unit args",
+        frozenset({"READ"}),
+        "READ without explicit UNIT=",
+        re.compile(r"\bREAD\s*\(\s*([^,)]+)", re.IGNORECASE),
+    ),
+    "forbidden_stop": LineRule(
+        "forbidden stop",
+        frozenset({"STOP", "CALL"}),
+        "STOP or CALL abort used",
+        re.compile(r"\b(STOP|CALL\s+abort)\b", re.IGNORECASE),
+    ),
+}
+
+
+"""
+Rules which only look at the raw text of each line in turn, by the name of
+the UMDP3Checker method. These can be given the lines of a file one at a
+time as they're read, rather than a FortranSourceView of the whole file."""
+streaming_rules = frozenset(
+    {"line_over_80chars", "tab_detection", "line_trail_whitespace"}
+)
+
+
+@functools.lru_cache(maxsize=None)
+def line_rule_scanner(rule_names: FrozenSet[str]) -> LineRuleScanner:
+    """LineRuleScanner running a set of the line_rules. Built once for each
+    set of rules asked for, and shared by all checkers and threads."""
+    return LineRuleScanner({name: line_rules[name] for name in sorted(rule_names)})
 
 
 @dataclass
@@ -53,61 +202,31 @@ class UMDP3Checker:
     """UMDP3 compliance checker class"""
 
     """
+    Holds no per-file state : the errors found by each rule are collected
+    in an error log made for that call, and returned in its TestResult. So a
+    single instance can be shared by any number of threads without locking,
+    and copied to worker processes as is.
+
     TODO : This class could possibly be abandoned, or replaced
-       by a similar class at a different level. Presently only one
-       instance is created in such a way that the original
-       _extra_error_info can't be used to hold extra information
-       at a per file level. resulting in the need to pass error_log
-       back, which feels like a bodge."""
+       by a similar class at a different level."""
     # precompiled, regularly used search patterns.
     comment_line = re.compile(r"!.*$")
+    c_comment = re.compile(r"/\*.*?(?:\*/|\Z)|//[^\n]*", re.DOTALL)
     word_splitter = re.compile(r"\b\w+\b")
 
     def __init__(self):
-        self._extra_error_info = {}
-        self._lock = threading.Lock()
         """
-    TODO: The Perl version had a dodgy looking subroutine to calculate
-        this, but I can't find where it was called from within the files in
-        'bin'. It used all args as a 'list' - searched them for '#include' and
-        then returned the count as well as adding 1 to this global var if any
-        were found.
-        This is either redundant and needs removing, or needs implementing
-        properly."""
+        TODO: The Perl version had a dodgy looking subroutine to calculate
+            this, but I can't find where it was called from within the files in
+            'bin'. It used all args as a 'list' - searched them for '#include' and
+            then returned the count as well as adding 1 to this global var if any
+            were found.
+            This is either redundant and needs removing, or needs implementing
+            properly."""
         self._number_of_files_with_variable_declarations_in_includes = 0
 
-    def reset_extra_error_information(self):
-        """Reset extra error information :
-        Appears to be used 'between' blocks of tests such as those on diffs and
-        those on full files.
-        """
-        with self._lock:
-            self._extra_error_info = {}
-
-    def get_extra_error_information(self) -> Dict:
-        """
-        Get extra error information. Dictionary with file names as the keys.
-        """
-        """
-
-    TODO: I presume this is what's used when creating the report of the
-        actual failures and not just the count. However, this information
-        doesn't seem to be output as yet and will need implementing.
-        """
-        with self._lock:
-            return self._extra_error_info.copy()
-
-    def add_extra_error(self, key: str, value: str = ""):
-        """Add extra error information to the dictionary"""
-        """
-    TODO: The usefulness of the information added has not been assessed,
-        nor does it appear to be reported as yet."""
-        with self._lock:
-            self._extra_error_info[key] = value
-
-    def add_error_log(
-        self, error_log: Dict, key: str = "no key", value: int = 0
-    ) -> Dict:
+    @staticmethod
+    def add_error_log(error_log: Dict, key: str = "no key", value: int = 0) -> Dict:
         """Add extra error information to the dictionary"""
         """
     TODO: This is a bodge to get more detailed info about
@@ -128,26 +247,44 @@ class UMDP3Checker:
         from anywhere..... So this getter is probably very redundant."""
         return self._number_of_files_with_variable_declarations_in_includes
 
+    def scan_line_rules(
+        self, lines: List[str], rule_names: List[str]
+    ) -> Dict[str, TestResult]:
+        """Run several of the line_rules in a single pass over the lines,
+        returning a TestResult for each, keyed by the rule name."""
+        error_logs = line_rule_scanner(frozenset(rule_names)).scan(lines)
+        results = {}
+        for name in rule_names:
+            error_log = error_logs[name]
+            failures = 0
+            for error, line_numbers in error_log.items():
+                failures += len(line_numbers)
+            results[name] = TestResult(
+                checker_name=line_rules[name].checker_name,
+                failure_count=failures,
+                passed=(failures == 0),
+                output=f"Checked {len(lines)} lines, found {failures} failures.",
+                errors=error_log,
+            )
+        return results
+
+    def run_line_rule(self, name: str, lines: List[str]) -> TestResult:
+        """Run a single one of the line_rules over the lines."""
+        return self.scan_line_rules(lines, [name])[name]
+
     def remove_quoted(self, line: str) -> str:
         """Remove quoted strings from a line"""
         """
     TODO: The original version replaced the quoted sections with a
         "blessed reference", presumably becuase they were 're-inserted' at some
         stage. No idea if that capability is still required."""
-        # Simple implementation - remove single and double quoted strings
-        result = line
-
-        # Remove double quoted strings
-        result = re.sub(r'"[^"]*"', "", result)
-
-        # Remove single quoted strings
-        result = re.sub(r"'[^']*'", "", result)
-
-        return result
+        return remove_quoted(line)
 
     """Test functions :
         Each accepts a list of 'lines' to search and returns a
-        TestResult object containing all the information."""
+        TestResult object containing all the information.
+        The Fortran tests will also accept a FortranSourceView of the lines,
+        which saves each test from stripping quotes and comments itself."""
     """
     TODO: One thought here is each test should also be told whether it's
     being passed the contents of a full file, or just a selection of lines
@@ -165,19 +302,17 @@ class UMDP3Checker:
         line_count = 0
         error_log = {}
         # print("Debug: In capitulated_keywords test")
-        for line in lines:
+        view = FortranSourceView.of(lines)
+        for clean_line, is_comment in zip(view.code, view.is_comment):
             line_count += 1
-            # Remove quoted strings and comments
-            if line.lstrip(" ").startswith("!"):
+            # Skip comment lines, use line with quotes and comments removed
+            if is_comment:
                 continue
-            clean_line = self.remove_quoted(line)
-            clean_line = self.comment_line.sub("", clean_line)
 
             # Check for lowercase keywords
             for word in self.word_splitter.findall(clean_line):
                 upcase = word.upper()
-                if upcase in fortran_keywords and word != upcase:
-                    self.add_extra_error(f"lowercase keyword: {word}")
+                if upcase in fortran_keywords_set and word != upcase:
                     error_log = self.add_error_log(
                         error_log, f"capitulated keyword: {word}", line_count
                     )
@@ -188,27 +323,24 @@ class UMDP3Checker:
             failure_count=failures,
             passed=(failures == 0),
             output=f"Checked {line_count} lines, found {failures} failures.",
-            # errors=self.get_extra_error_information()
             errors=error_log,
         )
 
     def capitalised_keywords(self, lines: List[str]) -> TestResult:
         """Check for the presence of lowercase Fortran keywords, which are
-        taken from an imported list 'fortran_keywords'."""
+        taken from an imported set 'fortran_keywords_set'."""
         failures = 0
         error_log = {}
         count = -1
-        for count, line in enumerate(lines):
-            # Remove quoted strings and comments
-            if line.lstrip(" ").startswith("!"):
+        view = FortranSourceView.of(lines)
+        for count, clean_line in enumerate(view.code):
+            # Skip comment lines, use line with quotes and comments removed
+            if view.is_comment[count]:
                 continue
-            clean_line = self.remove_quoted(line)
-            clean_line = self.comment_line.sub("", clean_line)
             # Check for lowercase keywords
             for word in self.word_splitter.findall(clean_line):
                 upcase = word.upper()
-                if upcase in fortran_keywords and word != upcase:
-                    self.add_extra_error(f"lowercase keyword: {word}")
+                if upcase in fortran_keywords_set and word != upcase:
                     failures += 1
                     error_log = self.add_error_log(
                         error_log, f"lowercase keyword: {word}", count + 1
@@ -229,7 +361,6 @@ class UMDP3Checker:
         count = -1
         for count, line in enumerate(lines):
             if re.search(r"^\s+!\$OMP", line):
-                self.add_extra_error("OpenMP sentinel not in column 1")
                 failures += 1
                 error_log = self.add_error_log(
                     error_log, "OpenMP sentinel not in column 1:", count + 1
@@ -245,113 +376,37 @@ class UMDP3Checker:
 
     def unseparated_keywords(self, lines: List[str]) -> TestResult:
         """Check for omitted optional spaces in keywords"""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            if line.lstrip(" ").startswith("!"):
-                continue
-            clean_line = self.remove_quoted(line)
-            for pattern in [f"\\b{kw}\\b" for kw in unseparated_keywords_list]:
-                if re.search(pattern, clean_line, re.IGNORECASE):
-                    self.add_extra_error(f"unseparated keyword in line: {line.strip()}")
-                    failures += 1
-                    error_log = self.add_error_log(
-                        error_log,
-                        f"unseparated keyword in line: {line.strip()}",
-                        count + 1,
-                    )
-        output = f"Checked {count + 1} lines, found {failures} failures."
-        return TestResult(
-            checker_name="Unseparated Keywords",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=output,
-            errors=error_log,
-        )
+        return self.run_line_rule("unseparated_keywords", lines)
 
     def go_to_other_than_9999(self, lines: List[str]) -> TestResult:
         """Check for GO TO statements other than 9999"""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            if match := re.search(r"\bGO\s*TO\s+(\d+)", clean_line, re.IGNORECASE):
-                label = match.group(1)
-                if label != "9999":
-                    self.add_extra_error(f"GO TO {label}")
-                    failures += 1
-                    error_log = self.add_error_log(
-                        error_log, f"GO TO {label}", count + 1
-                    )
-        output = f"Checked {count + 1} lines, found {failures} failures."
-        return TestResult(
-            checker_name="GO TO other than 9999",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=output,
-            errors=error_log,
-        )
+        return self.run_line_rule("go_to_other_than_9999", lines)
 
     def write_using_default_format(self, lines: List[str]) -> TestResult:
         """Check for WRITE without format"""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            if re.search(r"\bWRITE\s*\(\s*\*\s*,\s*\*\s*\)", clean_line, re.IGNORECASE):
-                self.add_extra_error("WRITE(*,*) found")
-                failures += 1
-                error_log = self.add_error_log(error_log, "WRITE(*,*) found", count + 1)
-        output = f"Checked {count + 1} lines, found {failures} failures."
-        return TestResult(
-            checker_name="WRITE using default format",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=output,
-            errors=error_log,
-        )
+        return self.run_line_rule("write_using_default_format", lines)
 
     def lowercase_variable_names(self, lines: List[str]) -> TestResult:
         """Check for lowercase or CamelCase variable names only"""
         """
-    TODO: This is a very simplistic check and will not detect many
-        cases which break UMDP3. I suspect the Perl Predecessor concatenated
-        continuation lines prior to 'cleaning' and checking. Having identified
-        a declaration, it also then scanned the rest of the file for that
-        variable name in any case."""
+    TODO: This only checks the names where they're declared. I suspect the
+        Perl Predecessor, having identified a declaration, also then scanned
+        the rest of the file for that variable name in any case."""
         failures = 0
         error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            # Simple check for UPPERCASE variable declarations
-            if re.search(
-                r"^\s*(INTEGER|REAL|LOGICAL|CHARACTER|TYPE)\s*.*::\s*[A-Z_]+",
-                clean_line,
-                re.IGNORECASE,
-            ):
-                clean_line = re.sub(
-                    r"^\s*(INTEGER|REAL|LOGICAL|CHARACTER|TYPE)\s*.*::\s*",
-                    "",
-                    clean_line,
+        view = FortranSourceView.of(lines)
+        # Every declaration, as the same name may be declared again in each
+        # program unit in the file
+        for declaration in view.symbol_table.declarations:
+            if uppercase_run.search(declaration.name):
+                failures += 1
+                error_log = self.add_error_log(
+                    error_log,
+                    f"UPPERCASE variable name {declaration.name}",
+                    declaration.line,
                 )
-                if re.search(r"[A-Z]{2,}", clean_line):
-                    self.add_extra_error("UPPERCASE variable name")
-                    failures += 1
-                    error_log = self.add_error_log(
-                        error_log, "UPPERCASE variable name", count + 1
-                    )
 
-        output = f"Checked {count + 1} lines, found {failures} failures."
+        output = f"Checked {len(view)} lines, found {failures} failures."
         return TestResult(
             checker_name="Lowercase or CamelCase variable names only",
             failure_count=failures,
@@ -364,24 +419,19 @@ class UMDP3Checker:
         """Check for use of dimension attribute"""
         failures = 0
         error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
+        view = FortranSourceView.of(lines)
+        # One failure per statement, however many names it declares
+        for line in sorted(
+            {d.line for d in view.symbol_table.with_attribute("DIMENSION")}
+        ):
+            failures += 1
+            error_log = self.add_error_log(error_log, "DIMENSION attribute used", line)
 
-            if re.search(r"\bDIMENSION\b", clean_line, re.IGNORECASE):
-                self.add_extra_error("DIMENSION attribute used")
-                failures += 1
-                error_log = self.add_error_log(
-                    error_log, "DIMENSION attribute used", count + 1
-                )
-
-        output = f"Checked {count + 1} lines, found {failures} failures."
         return TestResult(
             checker_name="Use of dimension attribute",
             failure_count=failures,
             passed=(failures == 0),
-            output=output,
+            output=f"Checked {len(view)} lines, found {failures} failures.",
             errors=error_log,
         )
 
@@ -392,7 +442,6 @@ class UMDP3Checker:
         count = -1
         for count, line in enumerate(lines):
             if re.search(r"^\s*&", line):
-                self.add_extra_error("continuation line starts with &")
                 failures += 1
                 error_log = self.add_error_log(
                     error_log, "continuation line starts with &", count + 1
@@ -411,54 +460,11 @@ class UMDP3Checker:
         """
     TODO: Can't believe this will allow a COMMON BLOCK....
         Need to check against what the original did.."""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            if re.search(r"\b(EQUIVALENCE|PAUSE)\b", clean_line, re.IGNORECASE):
-                self.add_extra_error("forbidden keyword")
-                failures += 1
-                error_log = self.add_error_log(
-                    error_log, "forbidden keyword", count + 1
-                )
-
-        return TestResult(
-            checker_name="Use of forbidden keywords EQUIVALENCE or PAUSE",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
-            errors=error_log,
-        )
+        return self.run_line_rule("forbidden_keywords", lines)
 
     def forbidden_operators(self, lines: List[str]) -> TestResult:
         """Check for older form of relational operators"""
-        failures = 0
-        error_log = {}
-        count = -1
-        old_operators = [".GT.", ".GE.", ".LT.", ".LE.", ".EQ.", ".NE."]
-
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            for op in old_operators:
-                if op in clean_line.upper():
-                    self.add_extra_error(f"old operator {op}")
-                    failures += 1
-                    error_log = self.add_error_log(
-                        error_log, f"old operator {op}", count + 1
-                    )
-
-        return TestResult(
-            checker_name="Use of older form of relational operator " + "(.GT. etc.)",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
-            errors=error_log,
-        )
+        return self.run_line_rule("forbidden_operators", lines)
 
     def line_over_80chars(self, lines: List[str]) -> TestResult:
         """Check for lines longer than 80 characters"""
@@ -467,7 +473,6 @@ class UMDP3Checker:
         count = -1
         for count, line in enumerate(lines):
             if len(line.rstrip()) > 80:
-                self.add_extra_error("line too long")
                 failures += 1
                 error_log = self.add_error_log(error_log, "line too long", count + 1)
 
@@ -486,7 +491,6 @@ class UMDP3Checker:
         count = -1
         for count, line in enumerate(lines):
             if "\t" in line:
-                self.add_extra_error("tab character found")
                 failures += 1
                 error_log = self.add_error_log(
                     error_log, "tab character found", count + 1
@@ -507,7 +511,6 @@ class UMDP3Checker:
         count = -1
         for count, line in enumerate(lines):
             if re.search(r"\bUSE\s+printstatus_mod\b", line, re.IGNORECASE):
-                self.add_extra_error("printstatus_mod used")
                 failures += 1
                 error_log = self.add_error_log(
                     error_log, "printstatus_mod used", count + 1
@@ -523,47 +526,11 @@ class UMDP3Checker:
 
     def printstar(self, lines: List[str]) -> TestResult:
         """Check for PRINT rather than umMessage and umPrint"""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            if re.search(r"\bPRINT\s*\*", clean_line, re.IGNORECASE):
-                self.add_extra_error("PRINT * used")
-                failures += 1
-                error_log = self.add_error_log(error_log, "PRINT * used", count + 1)
-
-        return TestResult(
-            checker_name="Use of PRINT rather than umMessage and umPrint",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
-            errors=error_log,
-        )
+        return self.run_line_rule("printstar", lines)
 
     def write6(self, lines: List[str]) -> TestResult:
         """Check for WRITE(6) rather than umMessage and umPrint"""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            if re.search(r"\bWRITE\s*\(\s*6\s*,", clean_line, re.IGNORECASE):
-                self.add_extra_error("WRITE(6) used")
-                failures += 1
-                error_log = self.add_error_log(error_log, "WRITE(6) used", count + 1)
-
-        return TestResult(
-            checker_name="Use of WRITE(6) rather than umMessage and umPrint",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
-            errors=error_log,
-        )
+        return self.run_line_rule("write6", lines)
 
     def um_fort_flush(self, lines: List[str]) -> TestResult:
         """Check for um_fort_flush rather than umPrintFlush"""
@@ -572,7 +539,6 @@ class UMDP3Checker:
         count = -1
         for count, line in enumerate(lines):
             if re.search(r"\bum_fort_flush\b", line):
-                self.add_extra_error("um_fort_flush used")
                 failures += 1
                 error_log = self.add_error_log(
                     error_log, "um_fort_flush used", count + 1
@@ -592,7 +558,6 @@ class UMDP3Checker:
         count = -1
         for count, line in enumerate(lines):
             if re.search(r"\$\w+\$", line):
-                self.add_extra_error("SVN keyword substitution")
                 failures += 1
                 error_log = self.add_error_log(
                     error_log, "SVN keyword substitution", count + 1
@@ -612,7 +577,6 @@ class UMDP3Checker:
         count = -1
         for count, line in enumerate(lines):
             if re.search(r"!\s*OMP\b", line) and not re.search(r"!\$OMP", line):
-                self.add_extra_error("!OMP without $")
                 failures += 1
                 error_log = self.add_error_log(error_log, "!OMP without $", count + 1)
 
@@ -631,7 +595,6 @@ class UMDP3Checker:
         count = -1
         for count, line in enumerate(lines):
             if re.search(r"^\s*#\s*if(n)?def\b", line):
-                self.add_extra_error("#ifdef/#ifndef used")
                 failures += 1
                 error_log = self.add_error_log(
                     error_log, "#ifdef/#ifndef used", count + 1
@@ -659,7 +622,6 @@ class UMDP3Checker:
             ) or re.search(r"^\s*#(else) *(.*)", line)
             if match:
                 if re.search(r".*!", match.group(2)):
-                    self.add_extra_error("Fortran comment in CPP directive")
                     failures += 1
                     error_log = self.add_error_log(
                         error_log, "Fortran comment in CPP directive", count + 1
@@ -675,108 +637,19 @@ class UMDP3Checker:
 
     def obsolescent_fortran_intrinsic(self, lines: List[str]) -> TestResult:
         """Check for archaic Fortran intrinsic functions"""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            for intrinsic in obsolescent_intrinsics:
-                if re.search(rf"\b{intrinsic}\b", clean_line, re.IGNORECASE):
-                    self.add_extra_error(f"obsolescent intrinsic: {intrinsic}")
-                    failures += 1
-                    error_log = self.add_error_log(
-                        error_log, f"obsolescent intrinsic: {intrinsic}", count + 1
-                    )
-
-        return TestResult(
-            checker_name="obsolescent intrinsic",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
-            errors=error_log,
-        )
+        return self.run_line_rule("obsolescent_fortran_intrinsic", lines)
 
     def exit_stmt_label(self, lines: List[str]) -> TestResult:
         """Check that EXIT statements are labelled"""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            if re.search(r"\bEXIT\s*$", clean_line, re.IGNORECASE):
-                self.add_extra_error("unlabelled EXIT statement")
-                failures += 1
-                error_log = self.add_error_log(
-                    error_log, "unlabelled EXIT statement", count + 1
-                )
-
-        return TestResult(
-            checker_name="unlabelled EXIT statement",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
-            errors=error_log,
-        )
+        return self.run_line_rule("exit_stmt_label", lines)
 
     def intrinsic_modules(self, lines: List[str]) -> TestResult:
         """Check intrinsic modules are USEd with INTRINSIC keyword"""
-        failures = 0
-        intrinsic_modules = ["ISO_C_BINDING", "ISO_FORTRAN_ENV"]
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            for module in intrinsic_modules:
-                if re.search(
-                    rf"\bUSE\s+(::)*\s*{module}\b", clean_line, re.IGNORECASE
-                ) and not re.search(r"\bINTRINSIC\b", clean_line, re.IGNORECASE):
-                    self.add_extra_error(f"intrinsic module {module} without INTRINSIC")
-                    failures += 1
-                    error_log = self.add_error_log(
-                        error_log,
-                        f"intrinsic module {module} without INTRINSIC",
-                        count + 1,
-                    )
-
-        return TestResult(
-            checker_name="intrinsic modules",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
-            errors=error_log,
-        )
+        return self.run_line_rule("intrinsic_modules", lines)
 
     def read_unit_args(self, lines: List[str]) -> TestResult:
         """Check READ statements have explicit UNIT= as first argument"""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            if match := re.search(r"\bREAD\s*\(\s*([^,)]+)", clean_line, re.IGNORECASE):
-                first_arg = match.group(1).strip()
-                if not first_arg.upper().startswith("UNIT="):
-                    self.add_extra_error("READ without explicit UNIT=")
-                    failures += 1
-                    error_log = self.add_error_log(
-                        error_log, "READ without explicit UNIT=", count + 1
-                    )
-
-        return TestResult(
-            checker_name="read unit args",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
-            errors=error_log,
-        )
+        return self.run_line_rule("read_unit_args", lines)
 
     def retire_if_def(self, lines: List[str]) -> TestResult:
         """Check for if-defs due for retirement"""
@@ -786,8 +659,6 @@ class UMDP3Checker:
         error_log = {}
         count = -1
         for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
             if match := re.search(
                 r"^#(?:(?:ifn?def|"  # ifdef/ifndef
                 r"(?:el)?if\s*\S*?defined\s*\()"  # elif/if defined(
@@ -800,7 +671,6 @@ class UMDP3Checker:
                 # SYMBOL = [x for x in match.groups() if x] # reduce to a
                 # list of 1 element
                 if match.group(1) in retired_ifdefs:
-                    self.add_extra_error(f"retired if-def: {match.group(1)}")
                     failures += 1
                     error_log = self.add_error_log(
                         error_log, f"retired if-def: {match.group(1)}", count + 1
@@ -823,7 +693,6 @@ class UMDP3Checker:
                 break
 
         if no_implicit_none:
-            self.add_extra_error("missing IMPLICIT NONE")
             error_log = self.add_error_log(
                 error_log, "No IMPLICIT NONE found in file", 0
             )
@@ -838,59 +707,36 @@ class UMDP3Checker:
 
     def forbidden_stop(self, lines: List[str]) -> TestResult:
         """Check for STOP or CALL abort"""
-        failures = 0
-        error_log = {}
-        count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            clean_line = re.sub(r"!.*$", "", clean_line)
-
-            if re.search(r"\b(STOP|CALL\s+abort)\b", clean_line, re.IGNORECASE):
-                self.add_extra_error("STOP or CALL abort used")
-                failures += 1
-                error_log = self.add_error_log(
-                    error_log, "STOP or CALL abort used", count + 1
-                )
-
-        return TestResult(
-            checker_name="forbidden stop",
-            failure_count=failures,
-            passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
-            errors=error_log,
-        )
+        return self.run_line_rule("forbidden_stop", lines)
 
     def intrinsic_as_variable(self, lines: List[str]) -> TestResult:
         """Check for Fortran function used as variable name"""
+        """
+    TODO: Only a few of the intrinsic functions are looked for. This needs
+        to be compared to the Perl, as I doubt it's anything near what that
+        did..."""
         failures = 0
         error_log = {}
-        count = -1
-        # This would check for intrinsic function names used as variables
-        # Simplified implementation
-        # The AI said that - This needs to be compared to the Perl
-        # as I doubt this does anything near what that did...
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
-            check = (
-                r"^\s*(INTEGER|REAL|LOGICAL|CHARACTER)\s*.*:"
-                + r":\s*(SIN|COS|LOG|EXP|TAN)\b"
-            )
-            if re.search(
-                check,
-                clean_line,
-                re.IGNORECASE,
+        view = FortranSourceView.of(lines)
+        # Names only given a DIMENSION, with no type, aren't counted
+        for declaration in view.symbol_table.declarations:
+            if (
+                declaration.name.upper() not in shadowed_intrinsics
+                or not declaration.type_spec
             ):
-                self.add_extra_error("intrinsic function used as variable")
-                failures += 1
-                error_log = self.add_error_log(
-                    error_log, "intrinsic function used as variable", count + 1
-                )
+                continue
+            failures += 1
+            error_log = self.add_error_log(
+                error_log,
+                f"intrinsic function {declaration.name} used as variable",
+                declaration.line,
+            )
 
         return TestResult(
             checker_name="intrinsic as variable",
             failure_count=failures,
             passed=(failures == 0),
-            output=f"Checked {count + 1} lines, found {failures} failures.",
+            output=f"Checked {len(view)} lines, found {failures} failures.",
             errors=error_log,
         )
 
@@ -900,17 +746,28 @@ class UMDP3Checker:
     TODO: This is a very simplistic check and will not detect many
         cases which break UMDP3. I suspect the Perl Predeccessor
         did much more convoluted tests"""
+        view = FortranSourceView.of(lines)
         comment_lines = [
-            line.upper() for line in lines if line.lstrip(" ").startswith("!")
+            line.upper()
+            for line, is_comment in zip(view, view.is_comment)
+            if is_comment
         ]
-        file_content = "\n".join(comment_lines)
+        return self.copyright_in_comments("\n".join(comment_lines))
+
+    def c_crown_copyright(self, lines: List[str]) -> TestResult:
+        """Check for crown copyright statement in a C /* */ or // comment"""
+        comments = self.c_comment.findall("\n".join(lines))
+        return self.copyright_in_comments("\n".join(comments).upper())
+
+    def copyright_in_comments(self, file_content: str) -> TestResult:
+        """The result of the crown copyright check, given the upper cased
+        text of a file's comments"""
         error_log = {}
         found_copyright = False
         if "CROWN COPYRIGHT" in file_content or "COPYRIGHT" in file_content:
             found_copyright = True
 
         if not found_copyright:
-            self.add_extra_error("missing copyright or crown copyright statement")
             error_log = self.add_error_log(
                 error_log, "missing copyright or crown copyright statement", 0
             )
@@ -941,7 +798,6 @@ class UMDP3Checker:
 
         # This is often a warning rather than an error
         if not found_code_owner:
-            self.add_extra_error("missing code owner comment")
             error_log = self.add_error_log(error_log, "missing code owner comment", 0)
         return TestResult(
             checker_name="Code Owner Comment",
@@ -960,10 +816,9 @@ class UMDP3Checker:
         failures = 0
         error_log = {}
         count = -1
-        for count, line in enumerate(lines):
-            clean_line = self.remove_quoted(line)
+        view = FortranSourceView.of(lines)
+        for count, clean_line in enumerate(view.unquoted):
             if re.search(r"\(/.*?\/\)", clean_line):
-                self.add_extra_error("old array initialization form (/ /)")
                 failures += 1
                 error_log = self.add_error_log(
                     error_log, "old array initialization form (/ /)", count + 1
@@ -983,7 +838,6 @@ class UMDP3Checker:
         error_log = {}
         for count, line in enumerate(lines):
             if re.search(r"\s+$", line):
-                self.add_extra_error("trailing whitespace")
                 failures += 1
                 error_log = self.add_error_log(
                     error_log, "trailing whitespace", count + 1
@@ -998,70 +852,116 @@ class UMDP3Checker:
 
     # C-specific tests
 
-    def c_integral_format_specifiers(self, lines: List[str]) -> int:
+    def c_integral_format_specifiers(self, lines: List[str]) -> TestResult:
         """Check C integral format specifiers have space"""
         failures = 0
-        for line in lines:
+        error_log = {}
+        for count, line in enumerate(lines):
             if re.search(r'%\d+[dioxX]"', line):
-                self.add_extra_error("missing space in format specifier")
                 failures += 1
+                error_log = self.add_error_log(
+                    error_log, "missing space in format specifier", count + 1
+                )
 
-        return failures
+        return TestResult(
+            checker_name="C Integral Format Specifiers",
+            failure_count=failures,
+            passed=(failures == 0),
+            output=f"Checked {len(lines)} lines, found {failures} failures.",
+            errors=error_log,
+        )
 
-    def c_deprecated(self, lines: List[str]) -> int:
+    def c_deprecated(self, lines: List[str]) -> TestResult:
         """Check for deprecated C identifiers"""
         failures = 0
-        for line in lines:
+        error_log = {}
+        for count, line in enumerate(lines):
             for identifier in deprecated_c_identifiers:
                 if re.search(rf"\b{identifier}\b", line):
-                    self.add_extra_error(f"deprecated C identifier: {identifier}")
                     failures += 1
+                    error_log = self.add_error_log(
+                        error_log, f"deprecated C identifier: {identifier}", count + 1
+                    )
 
-        return failures
+        return TestResult(
+            checker_name="Deprecated C Identifiers",
+            failure_count=failures,
+            passed=(failures == 0),
+            output=f"Checked {len(lines)} lines, found {failures} failures.",
+            errors=error_log,
+        )
 
-    def c_openmp_define_pair_thread_utils(self, lines: List[str]) -> int:
+    def c_openmp_define_pair_thread_utils(self, lines: List[str]) -> TestResult:
         """Check C OpenMP define pairing with thread utils"""
         failures = 0
-        for line in lines:
+        error_log = {}
+        for count, line in enumerate(lines):
             if re.search(r"#\s*if.*_OPENMP", line):
                 if not re.search(r"SHUM_USE_C_OPENMP_VIA_THREAD_UTILS", line):
-                    self.add_extra_error(
-                        "_OPENMP without SHUM_USE_C_OPENMP_VIA_THREAD_UTILS"
-                    )
                     failures += 1
+                    error_log = self.add_error_log(
+                        error_log,
+                        "_OPENMP without SHUM_USE_C_OPENMP_VIA_THREAD_UTILS",
+                        count + 1,
+                    )
 
-        return failures
+        return TestResult(
+            checker_name="C OpenMP Define Pairing",
+            failure_count=failures,
+            passed=(failures == 0),
+            output=f"Checked {len(lines)} lines, found {failures} failures.",
+            errors=error_log,
+        )
 
-    def c_openmp_define_no_combine(self, lines: List[str]) -> int:
+    def c_openmp_define_no_combine(self, lines: List[str]) -> TestResult:
         """Check C OpenMP defines not combined with third macro"""
         failures = 0
-        for line in lines:
+        error_log = {}
+        for count, line in enumerate(lines):
             if re.search(
                 r"_OPENMP.*&&.*SHUM_USE_C_OPENMP_VIA_THREAD_UTILS.*&&", line
             ) or re.search(
                 r"&&.*_OPENMP.*&&.*SHUM_USE_C_OPENMP_VIA_THREAD_UTILS", line
             ):
-                self.add_extra_error("OpenMP defines combined with third macro")
                 failures += 1
+                error_log = self.add_error_log(
+                    error_log, "OpenMP defines combined with third macro", count + 1
+                )
 
-        return failures
+        return TestResult(
+            checker_name="C OpenMP Define Combination",
+            failure_count=failures,
+            passed=(failures == 0),
+            output=f"Checked {len(lines)} lines, found {failures} failures.",
+            errors=error_log,
+        )
 
-    def c_openmp_define_not(self, lines: List[str]) -> int:
+    def c_openmp_define_not(self, lines: List[str]) -> TestResult:
         """Check for !defined(_OPENMP) usage"""
         failures = 0
-        for line in lines:
+        error_log = {}
+        for count, line in enumerate(lines):
             if re.search(r"!\s*defined\s*\(\s*_OPENMP\s*\)", line):
-                self.add_extra_error("!defined(_OPENMP) used")
                 failures += 1
+                error_log = self.add_error_log(
+                    error_log, "!defined(_OPENMP) used", count + 1
+                )
 
-        return failures
+        return TestResult(
+            checker_name="C !defined(_OPENMP)",
+            failure_count=failures,
+            passed=(failures == 0),
+            output=f"Checked {len(lines)} lines, found {failures} failures.",
+            errors=error_log,
+        )
 
-    def c_protect_omp_pragma(self, lines: List[str]) -> int:
+    def c_protect_omp_pragma(self, lines: List[str]) -> TestResult:
         """Check OMP pragma is protected with ifdef"""
         failures = 0
+        error_log = {}
         in_openmp_block = False
 
-        for line in lines:
+        for count, line in enumerate(lines):
             if re.search(r"#\s*if.*_OPENMP", line):
                 in_openmp_block = True
             elif re.search(r"#\s*endif", line):
@@ -1070,25 +970,58 @@ class UMDP3Checker:
                 r"#\s*include\s*<omp\.h>", line
             ):
                 if not in_openmp_block:
-                    self.add_extra_error("unprotected OMP pragma/include")
                     failures += 1
+                    error_log = self.add_error_log(
+                        error_log, "unprotected OMP pragma/include", count + 1
+                    )
 
-        return failures
+        return TestResult(
+            checker_name="C Protect OMP Pragma",
+            failure_count=failures,
+            passed=(failures == 0),
+            output=f"Checked {len(lines)} lines, found {failures} failures.",
+            errors=error_log,
+        )
 
-    def c_ifdef_defines(self, lines: List[str]) -> int:
+    def c_ifdef_defines(self, lines: List[str]) -> TestResult:
         """Check for #ifdef style rather than #if defined()"""
         failures = 0
-        for line in lines:
+        error_log = {}
+        for count, line in enumerate(lines):
             if re.search(r"^\s*#\s*ifdef\b", line):
-                self.add_extra_error("#ifdef used instead of #if defined()")
                 failures += 1
+                error_log = self.add_error_log(
+                    error_log, "#ifdef used instead of #if defined()", count + 1
+                )
 
-        return failures
+        return TestResult(
+            checker_name="C #ifdef Defines",
+            failure_count=failures,
+            passed=(failures == 0),
+            output=f"Checked {len(lines)} lines, found {failures} failures.",
+            errors=error_log,
+        )
 
-    def c_final_newline(self, lines: List[str]) -> int:
-        """Check C unit ends with final newline"""
-        if lines and not lines[-1].endswith("\n"):
-            self.add_extra_error("missing final newline")
-            return 1
+    def c_final_newline(self, lines: List[str]) -> TestResult:
+        """Check C unit ends with final newline.
+        Lines split from the text of a file have lost their line endings, so
+        a FortranSourceView records whether the text ended with one."""
+        failures = 0
+        error_log = {}
+        if isinstance(lines, FortranSourceView):
+            missing = len(lines) > 0 and not lines.final_newline
+        else:
+            missing = len(lines) > 0 and not lines[-1].endswith("\n")
+        if missing:
+            failures = 1
+            error_log = self.add_error_log(
+                error_log, "missing final newline", len(lines)
+            )
 
-        return 0
+        return TestResult(
+            checker_name="C Final Newline",
+            failure_count=failures,
+            passed=(failures == 0),
+            output="Checked for a final newline.",
+            errors=error_log,
+        )
@@ -1,12 +1,36 @@
 import subprocess
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Callable, List, Dict, Set
-from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Dict, Optional, Set, Tuple
+from dataclasses import asdict, dataclass, field
 import argparse
+import json
+import time
 from checker_dispatch_tables import CheckerDispatchTables
-from umdp3_checker_rules import TestResult
+from umdp3_checker_rules import (
+    TestResult,
+    UMDP3Checker,
+    line_rules,
+    streaming_rules,
+    VERSION,
+)
+from result_cache import ResultCache, file_digest, make_key
+from file_discovery import discover_files
+from git_object_source import GitObjectSource
+from rule_profile import (
+    RuleProfile,
+    fused_pass_name,
+    load_rule_costs,
+    read_rule_name,
+)
+from result_writers import result_writers
+from fortran_source_view import FortranSourceView
+from source_file import SourceFile
+import collections
 import concurrent.futures
+import heapq
+import itertools
+import statistics
 
 # Add custom modules to Python path if needed
 # Add the repository root to access fcm_bdiff and git_bdiff packages
@@ -37,6 +61,40 @@ class CheckResult:
     all_passed: bool = False
     test_results: List[TestResult] = field(default_factory=list)
 
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CheckResult":
+        """Rebuild a CheckResult from the output of dataclasses.asdict"""
+        test_results = [TestResult(**result) for result in data["test_results"]]
+        return cls(**{**data, "test_results": test_results})
+
+    @classmethod
+    def merge(cls, results: List["CheckResult"]) -> "CheckResult":
+        """Combine the results of several checkers on the same file."""
+        if len(results) == 1:
+            return results[0]
+        return cls(
+            file_path=results[0].file_path,
+            tests_failed=sum(result.tests_failed for result in results),
+            all_passed=all(result.all_passed for result in results),
+            test_results=[test for result in results for test in result.test_results],
+        )
+
+
+@dataclass
+class RuleSet:
+    """
+    A dispatch table of checks for files with any of file_extensions, or for
+    any file if file_extensions is empty. The checks named in diff_checks
+    are those which can be limited to the changed lines of a file."""
+
+    file_extensions: Set[str]
+    check_functions: Dict[str, Callable]
+    diff_checks: Set[str] = field(default_factory=set)
+
+    def applies_to(self, file_path: Path) -> bool:
+        """Whether this rule set should be run on a file."""
+        return not self.file_extensions or file_path.suffix in self.file_extensions
+
 
 class CMSSystem(ABC):
     """Abstract base class for CMS systems like git or FCM."""
@@ -56,6 +114,11 @@ class CMSSystem(ABC):
         """Get the current branch name."""
         pass
 
+    def get_changed_lines(self) -> Dict[Path, List[Tuple[int, int]]]:
+        """Get the (first, last) ranges of lines changed in each file.
+        An empty dictionary means the changed lines aren't known."""
+        return {}
+
 
 class GitBdiffWrapper(CMSSystem):
     """Wrapper around git_bdiff to get changed files."""
@@ -80,6 +143,10 @@ class GitBdiffWrapper(CMSSystem):
         """Get the current branch name."""
         return self.info_obj.branch
 
+    def get_changed_lines(self) -> Dict[Path, List[Tuple[int, int]]]:
+        """Get the ranges of lines changed in each file, from git diff -U0"""
+        return {Path(f): ranges for f, ranges in self.bdiff_obj.changed_lines().items()}
+
 
 class FCMBdiffWrapper(CMSSystem):
     """Wrapper around fcm_bdiff to get changed files."""
@@ -102,26 +169,31 @@ class FCMBdiffWrapper(CMSSystem):
         """Get the current branch name."""
         return self.bdiff_obj.branch
 
+    def get_changed_lines(self) -> Dict[Path, List[Tuple[int, int]]]:
+        """Get the ranges of lines changed in each file, from fcm bdiff"""
+        return {Path(f): ranges for f, ranges in self.bdiff_obj.changed_lines().items()}
+
 
 class StyleChecker(ABC):
     """Abstract base class for style checkers."""
 
     """
-    TODO: This is where it might be good to set up a threadsafe
-        class instance to hold the 'expanded' check outputs.
-        One for each file being checked in parallel.
-        Curently the UMDP3 class holds "_extra_error_info" which
-        was used to provide more detailed error logging.
-        However, this is not threadsafe, so in a multithreaded
-        environment, the extra error info could get mixed up between
-        different files being checked in parallel.
-        For now, I've modified the UMDP3 class methods to return
-        a TestResult object directly, which includes the extra error
-        info, so that each thread can work independently."""
+    The 'expanded' check outputs for each file are held in the TestResults
+    returned by each check, rather than in the checker, so no state is
+    shared between files being checked in parallel and a checker can be
+    used from any number of threads or worker processes."""
     name: str
     file_extensions: Set[str]
     check_functions: Dict[str, Callable]
     files_to_check: List[Path]
+    # If set, the time taken by each rule on each file is recorded here
+    profile: Optional[RuleProfile] = None
+    # If set, files are read from this git commit rather than from disk
+    source: Optional[GitObjectSource] = None
+    # If set, checks on a file stop at the first failure, having run the
+    # cheapest checks (by rule_costs, if known) first
+    fail_fast: bool = False
+    rule_costs: Optional[Dict[str, float]] = None
 
     def __init__(
         self,
@@ -149,6 +221,41 @@ class StyleChecker(ABC):
         """Run the style checker on a file."""
         pass
 
+    def cache_key(self, file_path: Path) -> Optional[str]:
+        """Key under which this checker's result for a file can be cached,
+        or None if the result shouldn't be cached."""
+        return None
+
+    def open_file(self, file_path: Path) -> SourceFile:
+        """The contents of a file, from the git source if set."""
+        if self.source is not None:
+            return SourceFile(self.source.read_bytes(file_path), file_path)
+        return SourceFile.open(file_path)
+
+    def content_digest(self, file_path: Path) -> str:
+        """Hash of the contents of a file. For a file in the git source this
+        is its blob id, so the file needn't be read."""
+        if self.source is not None:
+            return self.source.object_id(file_path)
+        return file_digest(file_path)
+
+    def make_chunks(self, file_paths: List[Path]) -> List[List[Path]]:
+        """Split files into the chunks a checker prefers to check together,
+        which by default is one file per chunk."""
+        return [[file_path] for file_path in file_paths]
+
+    def check_batch(self, file_paths: List[Path]) -> List[CheckResult]:
+        """Run the style checker on several files."""
+        return [self.check(file_path) for file_path in file_paths]
+
+    def record_time(self, rule: str, file_path: Path, start: float) -> None:
+        """If profiling, record the time since start (from perf_counter)
+        as taken by a rule on a file."""
+        if self.profile is not None:
+            self.profile.record(
+                self.name, rule, str(file_path), time.perf_counter() - start
+            )
+
     @classmethod
     def from_full_list(
         cls,
@@ -171,9 +278,28 @@ class StyleChecker(ABC):
         return [f for f in files if f.suffix in file_extensions]
 
 
+# Result given for a file which looks to be binary, so isn't checked
+binary_file_skipped = TestResult(
+    checker_name="Binary file skipped",
+    failure_count=0,
+    passed=True,
+    output="Found a NUL byte near the start, so assumed binary and not checked.",
+    errors={},
+)
+
+
 class UMDP3_checker(StyleChecker):
     """UMDP3 built-in style checker."""
 
+    """
+    If changed_lines is given, the checks named in diff_checks are only run
+    on the changed lines of each file in it (widened to whole statements),
+    while all other checks still see the whole file.
+
+    Several rule sets (e.g. for Fortran, C and any file) can be given, in
+    which case file_extensions, check_functions and diff_checks are taken
+    from them. Each file is then read once, and checked by every rule set
+    applying to it, with a check found in several rule sets run once."""
     files_to_check: List[Path]
 
     def __init__(
@@ -183,15 +309,49 @@ class UMDP3_checker(StyleChecker):
         check_functions: Dict[str, Callable],
         changed_files: List[Path] = [],
         print_volume: int = 3,
+        diff_checks: Optional[Set[str]] = None,
+        changed_lines: Optional[Dict[Path, List[Tuple[int, int]]]] = None,
+        rule_sets: Optional[List[RuleSet]] = None,
     ):
         self.name = name
-        self.file_extensions = file_extensions or set()
-        self.check_functions = check_functions or {}
+        self.changed_lines = changed_lines or {}
+        self.rule_sets = rule_sets or [
+            RuleSet(
+                file_extensions or set(), check_functions or {}, diff_checks or set()
+            )
+        ]
+        # Files with any extension are checked if any rule set takes them all
+        if all(rule_set.file_extensions for rule_set in self.rule_sets):
+            self.file_extensions = set().union(
+                *(rule_set.file_extensions for rule_set in self.rule_sets)
+            )
+        else:
+            self.file_extensions = set()
+        self.check_functions = {}
+        self.diff_checks = set()
+        for rule_set in self.rule_sets:
+            self.check_functions |= rule_set.check_functions
+            self.diff_checks |= rule_set.diff_checks
         self.files_to_check = (
             super().filter_files(changed_files, self.file_extensions)
             if changed_files
             else []
         )
+        # Line based rules which can be run together in a single pass over
+        # each file, keyed by the check name, holding the rule name.
+        self.line_rule_names = {
+            check_name: check_function.__name__
+            for check_name, check_function in self.check_functions.items()
+            if isinstance(getattr(check_function, "__self__", None), UMDP3Checker)
+            and check_function.__name__ in line_rules
+        }
+        # Checks whose rule can be given the lines one at a time
+        self.streaming_rule_names = {
+            check_name
+            for check_name, check_function in self.check_functions.items()
+            if isinstance(getattr(check_function, "__self__", None), UMDP3Checker)
+            and check_function.__name__ in streaming_rules
+        }
         if print_volume >= 5:
             print(
                 f"UMDP3_checker initialized :\n"
@@ -204,12 +364,47 @@ class UMDP3_checker(StyleChecker):
     def get_name(self) -> str:
         return self.name
 
+    def file_checks(self, file_path: Path) -> Tuple[Dict[str, Callable], Set[str]]:
+        """The checks of every rule set applying to a file, in rule set
+        order, and the names of those which are diff checks."""
+        check_functions = {}
+        diff_checks = set()
+        for rule_set in self.rule_sets:
+            if rule_set.applies_to(file_path):
+                check_functions |= rule_set.check_functions
+                diff_checks |= rule_set.diff_checks
+        return check_functions, diff_checks
+
     def check(self, file_path: Path) -> CheckResult:
         """Run UMDP3 check function on file."""
-        lines = file_path.read_text().splitlines()
-        file_results = []  # list of TestResult objects
-        for check_name, check_function in self.check_functions.items():
-            file_results.append(check_function(lines))
+        check_functions, diff_check_names = self.file_checks(file_path)
+        diff_checked = bool(diff_check_names) and file_path in self.changed_lines
+        start = time.perf_counter()
+        with self.open_file(file_path) as source_file:
+            if source_file.is_binary:
+                self.record_time(read_rule_name, file_path, start)
+                check_results = {"binary": binary_file_skipped}
+                check_functions = check_results
+            elif not diff_checked and all(
+                name in self.streaming_rule_names for name in check_functions
+            ):
+                # The lines needn't all be held, or pre-lexed, at once
+                self.record_time(read_rule_name, file_path, start)
+                check_results = self.run_streaming(
+                    list(check_functions), source_file, file_path
+                )
+            else:
+                # Read and pre-lex the file once, so the cleaned lines are
+                # shared by all rules of all rule sets
+                lines = source_file.view
+                self.record_time(read_rule_name, file_path, start)
+                check_results = self.run_on_view(
+                    check_functions, diff_check_names, lines, file_path
+                )
+        # list of TestResult objects, in dispatch table order
+        file_results = [
+            check_results[name] for name in check_functions if name in check_results
+        ]
 
         tests_failed = sum([0 if result.passed else 1 for result in file_results])
         return CheckResult(
@@ -219,10 +414,164 @@ class UMDP3_checker(StyleChecker):
             test_results=file_results,
         )
 
+    def run_on_view(
+        self,
+        check_functions: Dict[str, Callable],
+        diff_check_names: Set[str],
+        lines: FortranSourceView,
+        file_path: Path,
+    ) -> Dict[str, TestResult]:
+        """Run the checks on the pre-lexed lines of a file, with any diff
+        checks only seeing its changed lines."""
+        if diff_check_names and file_path in self.changed_lines:
+            diff_lines = lines.only_lines(self.changed_lines[file_path])
+            file_checks = [
+                name for name in check_functions if name not in diff_check_names
+            ]
+            diff_checks = [name for name in check_functions if name in diff_check_names]
+            runs = [(file_checks, lines), (diff_checks, diff_lines)]
+        else:
+            runs = [(list(check_functions), lines)]
+        if self.fail_fast:
+            return self.run_cheapest_first(runs, file_path)
+        check_results = {}
+        for check_names, view in runs:
+            check_results |= self.run_checks(check_names, view, file_path)
+        return check_results
+
+    def run_streaming(
+        self, check_names: List[str], source_file: SourceFile, file_path: Path
+    ) -> Dict[str, TestResult]:
+        """Run checks which only look at one line at a time, each on the
+        lines of the file as they're decoded."""
+        results = {}
+        for check_name in check_names:
+            start = time.perf_counter()
+            results[check_name] = self.check_functions[check_name](
+                source_file.iter_lines()
+            )
+            self.record_time(check_name, file_path, start)
+            if self.fail_fast and not results[check_name].passed:
+                break
+        return results
+
+    def cache_key(self, file_path: Path) -> Optional[str]:
+        """Key made from the file contents, the rules version, and the checks
+        run (including which lines the diff checks are limited to)."""
+        try:
+            digest = self.content_digest(file_path)
+        except OSError:
+            return None
+        check_functions, diff_checks = self.file_checks(file_path)
+        parts = [digest, VERSION, self.name, *check_functions]
+        if diff_checks and file_path in self.changed_lines:
+            parts += sorted(diff_checks)
+            parts.append(str(self.changed_lines[file_path]))
+        return make_key(parts)
+
+    def check_cost(self, check_names: List[str]) -> float:
+        """Expected cost of running some checks together, from rule_costs.
+        Checks without a known cost are taken to cost the median."""
+        costs = self.rule_costs or {}
+        fused_name = fused_pass_name(len(check_names))
+        if len(check_names) > 1 and fused_name in costs:
+            return costs[fused_name]
+        default = statistics.median(costs.values()) if costs else 0.0
+        return sum(costs.get(name, default) for name in check_names)
+
+    def run_cheapest_first(
+        self, runs: List[Tuple[List[str], FortranSourceView]], file_path: Path
+    ) -> Dict[str, TestResult]:
+        """Run the checks named in each (check names, lines) pair, cheapest
+        first, stopping once one fails. The line rules of each run are
+        still run together in a single pass, which without known costs goes
+        first, followed by the other checks in dispatch table order."""
+        groups = []
+        for check_names, lines in runs:
+            line_checks = [name for name in check_names if name in self.line_rule_names]
+            if line_checks:
+                groups.append((line_checks, lines))
+            groups += [
+                ([name], lines)
+                for name in check_names
+                if name not in self.line_rule_names
+            ]
+        groups.sort(key=lambda group: self.check_cost(group[0]))
+        results = {}
+        for check_names, lines in groups:
+            results |= self.run_checks(check_names, lines, file_path)
+            if not all(results[name].passed for name in check_names):
+                break
+        return results
+
+    def run_checks(
+        self, check_names: List[str], lines: FortranSourceView, file_path: Path
+    ) -> Dict[str, TestResult]:
+        """Run the named checks on the lines of file_path, with all the line
+        rules among them run together in a single pass (which is profiled as
+        a single rule)."""
+        line_rule_names = {
+            name: self.line_rule_names[name]
+            for name in check_names
+            if name in self.line_rule_names
+        }
+        line_rule_results = {}
+        if line_rule_names:
+            start = time.perf_counter()
+            umdp3_checker = self.check_functions[next(iter(line_rule_names))].__self__
+            line_rule_results = umdp3_checker.scan_line_rules(
+                lines, list(line_rule_names.values())
+            )
+            self.record_time(fused_pass_name(len(line_rule_names)), file_path, start)
+        results = {}
+        for check_name in check_names:
+            if check_name in line_rule_names:
+                results[check_name] = line_rule_results[line_rule_names[check_name]]
+            else:
+                start = time.perf_counter()
+                results[check_name] = self.check_functions[check_name](lines)
+                self.record_time(check_name, file_path, start)
+        return results
+
+
+@dataclass
+class BatchCommand:
+    """An external command which can check many files in one invocation.
+    The files are appended to the command, and parser turns its stdout into
+    a dictionary of (resolved) file path : list of failure messages. Any
+    exit status other than those in returncodes (by default, ruff's 0 for
+    no failures and 1 for some) means the command itself failed."""
+
+    command: List[str]
+    parser: Callable[[str], Dict[str, List[str]]]
+    returncodes: Tuple[int, ...] = (0, 1)
+
+
+def parse_ruff_json(stdout: str) -> Dict[str, List[str]]:
+    """Parse the output of "ruff check --output-format=json" into failure
+    messages for each file."""
+    failures = {}
+    for diagnostic in json.loads(stdout or "[]"):
+        file_name = str(Path(diagnostic["filename"]).resolve())
+        location = diagnostic.get("location") or {}
+        failures.setdefault(file_name, []).append(
+            f"{location.get('row', 0)}:{location.get('column', 0)}: "
+            f"{diagnostic.get('code')} {diagnostic.get('message')}"
+        )
+    return failures
+
 
 class ExternalChecker(StyleChecker):
     """Wrapper for external style checking tools."""
 
+    """
+    Any check with an entry in batch_commands is run as that command on
+    chunks of many files at once, rather than once per file, saving the
+    start up cost of the tool on each file. The chunks are kept below
+    max_argument_length characters of file names to stay well within the
+    system limit on command line length."""
+    max_argument_length = 100000
+
     """
     TODO : This is overriding the 'syle type hint from the base class.
     As we're currently passing in a list of strings to pass to 'subcommand'.
@@ -238,10 +587,12 @@ class ExternalChecker(StyleChecker):
         check_functions: Dict[str, List[str]],
         changed_files: List[Path],
         print_volume: int = 3,
+        batch_commands: Optional[Dict[str, BatchCommand]] = None,
     ):
         self.name = name
         self.file_extensions = file_extensions or set()
         self.check_commands = check_functions or {}
+        self.batch_commands = batch_commands or {}
         self.files_to_check = (
             super().filter_files(changed_files, self.file_extensions)
             if changed_files
@@ -262,46 +613,16 @@ class ExternalChecker(StyleChecker):
     def check(self, file_path: Path) -> CheckResult:
         """Run external checker commands on file."""
         file_results = []
-        tests_failed = 0
         for test_name, command in self.check_commands.items():
-            try:
-                cmd = command + [str(file_path)]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            except subprocess.TimeoutExpired:
-                file_results.append(
-                    TestResult(
-                        checker_name=test_name,
-                        failure_count=1,
-                        passed=False,
-                        output=f"Checker {test_name} timed out",
-                        errors={test_name: "TimeoutExpired"},
-                    )
-                )
-                tests_failed += 1
-            except Exception as e:
-                file_results.append(
-                    TestResult(
-                        checker_name=test_name,
-                        failure_count=1,
-                        passed=False,
-                        output=str(e),
-                        errors={test_name: str(e)},
-                    )
-                )
-                tests_failed += 1
-            else:
-                error_text = result.stderr if result.stderr else ""
-                file_results.append(
-                    TestResult(
-                        checker_name=test_name,
-                        failure_count=0 if result.returncode == 0 else 1,
-                        passed=result.returncode == 0,
-                        output=result.stdout,
-                        errors={test_name: error_text} if error_text else {},
-                    )
-                )
-                if result.returncode != 0:
-                    tests_failed += 1
+            start = time.perf_counter()
+            file_results.append(self.run_command(test_name, command, file_path))
+            self.record_time(test_name, file_path, start)
+        return self.make_result(file_path, file_results)
+
+    @staticmethod
+    def make_result(file_path: Path, file_results: List[TestResult]) -> CheckResult:
+        """Collect the TestResults for a file into a CheckResult."""
+        tests_failed = sum(0 if result.passed else 1 for result in file_results)
         return CheckResult(
             file_path=str(file_path),
             tests_failed=tests_failed,
@@ -309,62 +630,451 @@ class ExternalChecker(StyleChecker):
             test_results=file_results,
         )
 
+    @staticmethod
+    def failed_result(test_name: str, output: str, error: str) -> TestResult:
+        """TestResult for a command which couldn't be run."""
+        return TestResult(
+            checker_name=test_name,
+            failure_count=1,
+            passed=False,
+            output=output,
+            errors={test_name: error},
+        )
+
+    def run_command(
+        self, test_name: str, command: List[str], file_path: Path
+    ) -> TestResult:
+        """Run a single external checker command on a file."""
+        try:
+            cmd = command + [str(file_path)]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        except subprocess.TimeoutExpired:
+            return self.failed_result(
+                test_name, f"Checker {test_name} timed out", "TimeoutExpired"
+            )
+        except Exception as e:
+            return self.failed_result(test_name, str(e), str(e))
+        error_text = result.stderr if result.stderr else ""
+        return TestResult(
+            checker_name=test_name,
+            failure_count=0 if result.returncode == 0 else 1,
+            passed=result.returncode == 0,
+            output=result.stdout,
+            errors={test_name: error_text} if error_text else {},
+        )
+
+    def make_chunks(self, file_paths: List[Path]) -> List[List[Path]]:
+        """Split files into chunks whose names fit on one command line.
+        Without any batch commands, each file is checked on its own."""
+        if not self.batch_commands:
+            return super().make_chunks(file_paths)
+        chunks = []
+        chunk = []
+        length = 0
+        for file_path in file_paths:
+            if chunk and length + len(str(file_path)) + 1 > self.max_argument_length:
+                chunks.append(chunk)
+                chunk = []
+                length = 0
+            chunk.append(file_path)
+            length += len(str(file_path)) + 1
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def check_batch(self, file_paths: List[Path]) -> List[CheckResult]:
+        """Run external checker commands on several files, running each
+        batch command once per chunk of files and everything else once
+        per file. When profiling, the time taken by a batch command is
+        shared equally between the files in the chunk."""
+        file_results = {file_path: [] for file_path in file_paths}
+        for chunk in self.make_chunks(file_paths):
+            for test_name, command in self.check_commands.items():
+                if test_name in self.batch_commands:
+                    start = time.perf_counter()
+                    chunk_results = self.run_batch_command(
+                        test_name, self.batch_commands[test_name], chunk
+                    )
+                    if self.profile is not None:
+                        share = (time.perf_counter() - start) / len(chunk)
+                        for file_path in chunk:
+                            self.profile.record(
+                                self.name, test_name, str(file_path), share
+                            )
+                else:
+                    chunk_results = []
+                    for file_path in chunk:
+                        start = time.perf_counter()
+                        chunk_results.append(
+                            self.run_command(test_name, command, file_path)
+                        )
+                        self.record_time(test_name, file_path, start)
+                for file_path, result in zip(chunk, chunk_results):
+                    file_results[file_path].append(result)
+        return [
+            self.make_result(file_path, results)
+            for file_path, results in file_results.items()
+        ]
+
+    def run_batch_command(
+        self, test_name: str, batch_command: BatchCommand, file_paths: List[Path]
+    ) -> List[TestResult]:
+        """Run a batch command on a chunk of files, returning a TestResult for
+        each file in turn."""
+        try:
+            cmd = batch_command.command + [str(f) for f in file_paths]
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=60 + len(file_paths)
+            )
+            if result.returncode not in batch_command.returncodes:
+                # e.g. a bad configuration : nothing has been checked
+                error = result.stderr.strip() or f"exit status {result.returncode}"
+                return [
+                    self.failed_result(
+                        test_name, f"Checker {test_name} failed : {error}", error
+                    )
+                ] * len(file_paths)
+            failures = batch_command.parser(result.stdout)
+        except subprocess.TimeoutExpired:
+            return [
+                self.failed_result(
+                    test_name, f"Checker {test_name} timed out", "TimeoutExpired"
+                )
+            ] * len(file_paths)
+        except Exception as e:
+            return [self.failed_result(test_name, str(e), str(e))] * len(file_paths)
+        error_text = result.stderr if result.stderr else ""
+        resolved = [str(file_path.resolve()) for file_path in file_paths]
+        # Failures reported for a path which isn't any of the files can't be
+        # told apart, so no file without failures of its own can be passed
+        unmatched = sorted(set(failures) - set(resolved))
+        test_results = []
+        for file_path, file_name in zip(file_paths, resolved):
+            messages = failures.get(file_name, [])
+            if not messages and unmatched:
+                messages = [
+                    f"{test_name} reported failures for unknown files : "
+                    + ", ".join(unmatched)
+                ]
+            test_results.append(
+                TestResult(
+                    checker_name=test_name,
+                    failure_count=len(messages),
+                    passed=not messages,
+                    output="\n".join(messages),
+                    errors={test_name: error_text} if error_text else {},
+                )
+            )
+        return test_results
+
+
+# Checkers held by each worker process of a process pool. Set once per worker
+# by _init_worker so the checkers (and their file lists) are only pickled once
+# per process rather than once per batch.
+_worker_checkers: List[StyleChecker] = []
+
+
+def _init_worker(checkers: List[StyleChecker]) -> None:
+    """Initialiser for process pool workers : store the checkers."""
+    global _worker_checkers
+    _worker_checkers = checkers
+
+
+def _check_batch(
+    checker_index: int, file_paths: List[Path]
+) -> Tuple[List[CheckResult], Optional[RuleProfile]]:
+    """Run one of the worker's checkers over a batch of files, returning
+    the results and, if profiling, the profile of just this batch.
+    Lives at module level so it can be sent to a worker process."""
+    checker = _worker_checkers[checker_index]
+    if checker.profile is not None:
+        checker.profile = RuleProfile()
+    return checker.check_batch(file_paths), checker.profile
+
+
+def make_batches(files: List[Path], batch_size: int) -> List[List[Path]]:
+    """Split a list of files into consecutive batches of batch_size."""
+    batch_size = max(1, batch_size)
+    return [files[i : i + batch_size] for i in range(0, len(files), batch_size)]
+
+
+def size_on_disk(file_path: Path) -> int:
+    """Size of a file in bytes, or 0 if it can't be found."""
+    try:
+        return file_path.stat().st_size
+    except OSError:
+        return 0
+
+
+def shard_files(
+    files: List[Path], index: int, count: int, file_size: Callable[[Path], int]
+) -> List[Path]:
+    """The files in shard index (numbered from 1) of count, balanced by the
+    total size of the files in each shard rather than their number.
+    Files are dealt out largest first (then by path) to whichever shard has
+    least so far, so every node gets the same split of the same files."""
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard {index} isn't between 1 and {count}")
+    sized_files = sorted(
+        ((file_size(f), str(f), f) for f in files),
+        key=lambda sized_file: (-sized_file[0], sized_file[1]),
+    )
+    # (total size so far, shard index) for each shard
+    loads = [(0, shard) for shard in range(1, count + 1)]
+    shard = []
+    for size, _, file_path in sized_files:
+        load, file_shard = heapq.heappop(loads)
+        heapq.heappush(loads, (load + size, file_shard))
+        if file_shard == index:
+            shard.append(file_path)
+    return sorted(shard)
+
+
+def load_shard_results(paths: List[Path]) -> List[CheckResult]:
+    """The results of a sharded run, from the JSON results of each shard,
+    sorted by file. All the shards of one run must be given."""
+    results = []
+    versions = set()
+    shards = collections.Counter()
+    counts = set()
+    for path in paths:
+        data = json.loads(Path(path).read_text())
+        if "shard" not in data:
+            raise ValueError(f"{path} doesn't hold the results of a shard")
+        index, count = data["shard"]
+        shards[index] += 1
+        counts.add(count)
+        versions.add(data.get("checker_version"))
+        results += [CheckResult.from_dict(result) for result in data["results"]]
+    if len(counts) > 1:
+        raise ValueError(f"Shards are from runs split different ways : {counts}")
+    if len(versions) > 1:
+        raise ValueError(f"Shards are from different checker versions : {versions}")
+    expected = set(range(1, counts.pop() + 1)) if counts else set()
+    if set(shards) != expected or any(n > 1 for n in shards.values()):
+        raise ValueError(
+            f"Expected each of shards {sorted(expected)} once, "
+            f"got {sorted(shards.elements())}"
+        )
+    return sorted(results, key=lambda result: result.file_path)
+
 
 class ConformanceChecker:
     """Main framework for running style checks in parallel."""
 
+    """
+    The rules are pure Python and hold the GIL, so the default thread pool
+    only really helps the ExternalChecker (which spends its time waiting on
+    subprocesses). The "process" executor ships batches of files to a pool
+    of worker processes instead, so large runs can use every core.
+
+    With max_failures set, the run is a quick pass/fail gate rather than a
+    full report : the checks on each file run cheapest first (using
+    rule_costs) and stop at its first failure, and once max_failures files
+    have failed no more are checked."""
+    executors = ("thread", "process")
+
     def __init__(
         self,
         checkers: List[StyleChecker],
         max_workers: int = 8,
+        executor: str = "thread",
+        batch_size: int = 0,
+        cache: Optional[ResultCache] = None,
+        profile: Optional[RuleProfile] = None,
+        source: Optional[GitObjectSource] = None,
+        max_failures: int = 0,
+        rule_costs: Optional[Dict[str, float]] = None,
     ):
+        if executor not in self.executors:
+            raise ValueError(
+                f"Unknown executor '{executor}', expected one of {self.executors}"
+            )
         self.checkers = checkers
         self.max_workers = max_workers
-
-    def check_files(self) -> None:
+        self.executor = executor
+        self.batch_size = batch_size
+        self.cache = cache
+        # Only files actually checked are profiled, not those found in cache
+        self.profile = profile
+        self.max_failures = max_failures
+        for checker in self.checkers:
+            checker.profile = profile
+            checker.source = source
+            checker.fail_fast = max_failures > 0
+            checker.rule_costs = rule_costs
+        self.results = []
+        # Whether the last run stopped at max_failures, leaving files unchecked
+        self.stopped = False
+
+    def get_batch_size(self) -> int:
+        """Number of files to send to a worker process at a time.
+        Unless set explicitly, aim for ~4 batches per worker, which keeps the
+        workers busy without paying for a round trip on every file."""
+        if self.batch_size > 0:
+            return self.batch_size
+        no_of_files = sum(len(checker.files_to_check) for checker in self.checkers)
+        return min(64, max(1, no_of_files // (self.max_workers * 4)))
+
+    def check_files(
+        self, on_result: Optional[Callable[[CheckResult], None]] = None
+    ) -> None:
         """Run all checkers on given files in parallel.
         ========================================================
+        Files checked by several checkers get a single CheckResult, merged
+        from those of each checker (in checker order) once all are done.
+        If given, on_result is called with each CheckResult as soon as it's
+        available (in the calling thread). Once all are done, self.results
+        holds them sorted by file, so repeated runs are comparable.
         Note :
         Each checker runs on its own set of files, and has a list of
-        appropriate checkers for that file type.
-        The loop to create the threads currently creates a thread for each
-        (checker, file) pair, which may not be optimal.
-        However, given that the number of files is likely to be small,
-        and the number of checkers is also small, this should be acceptable
-        for now.
+        appropriate checks for that file type. The built in rule sets are all
+        run by a single UMDP3_checker, reading each file once, while each
+        external tool is its own ExternalChecker.
+        The work is split into tasks of one checker and a chunk of its files,
+        run in a pool of max_workers threads, or of worker processes
+        (executor="process"). In threads, each chunk is as the checker's
+        make_chunks() gives it : a single file, or as many as fit on one
+        command line for an ExternalChecker with a batch command. In
+        processes, each task is a batch of get_batch_size() files, to save a
+        round trip per file. Results found in the cache aren't checked again.
         """
         """
         TODO : Might be good to have a threadsafe object for each file and
         allow multiple checks to be run at once on that file.
         """
-        """
-        TODO : Poor terminology makes discerning what is actually happening
-        here hard work. A 'checker' is an instance of a StyleChecker
-        (sub)class. Each of which has a list of checks to perform and a list of
-        files to perform them on. e.g. A UMDP3_checker for Fortran files. or
-        the ExternalChecker for Python files.
-        However, when the 'results' are collected, each result is for a single
-        file+check pair and holds no information about which 'checker' it was
-        part of. Thus some files can be checked by multiple checkers, and the
-        filename will appear multiple times in the output. Not Good!
-        """
         results = []
+        # Files still to be checked, for each checker (by index)
+        work = {
+            index: list(checker.files_to_check)
+            for index, checker in enumerate(self.checkers)
+        }
+        # Number of checkers still to report on each file
+        outstanding = collections.Counter(
+            str(file_path)
+            for checker in self.checkers
+            for file_path in checker.files_to_check
+        )
+        partial_results = {}
+        cached_results = []
+        cache_keys = {}
+        if self.cache is not None:
+            cached_results, work, cache_keys = self._use_cache()
+        if self.executor == "process":
+            new_results = self._check_files_in_processes(work)
+        else:
+            new_results = self._check_files_in_threads(work)
+        files_failed = 0
+        self.stopped = False
+        for index, result in itertools.chain(cached_results, new_results):
+            key = cache_keys.get((index, result.file_path))
+            # A failing file's checks are incomplete when failing fast
+            if (
+                key
+                and (result.all_passed or not self.max_failures)
+                and all(isinstance(test, TestResult) for test in result.test_results)
+            ):
+                self.cache.put(key, asdict(result))
+            partial_results.setdefault(result.file_path, []).append((index, result))
+            outstanding[result.file_path] -= 1
+            if outstanding[result.file_path] > 0:
+                continue
+            file_results = sorted(
+                partial_results.pop(result.file_path), key=lambda entry: entry[0]
+            )
+            result = CheckResult.merge([result for _, result in file_results])
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+            if not result.all_passed:
+                files_failed += 1
+                if self.max_failures and files_failed >= self.max_failures:
+                    self.stopped = sum(outstanding.values()) > 0
+                    # Cancels the checks not yet started
+                    new_results.close()
+                    break
+        # Completion order varies from run to run, so sort by file
+        results.sort(key=lambda result: result.file_path)
+        self.results = results
+        return
+
+    def _use_cache(self):
+        """Look up each (checker, file) pair in the cache.
+        Returns the (checker index, CheckResult) pairs found, the files left
+        to check for each checker, and the cache keys of those files, keyed
+        by (checker index, file)."""
+        results = []
+        work = {}
+        cache_keys = {}
+        for index, checker in enumerate(self.checkers):
+            work[index] = []
+            for file_path in checker.files_to_check:
+                key = checker.cache_key(file_path)
+                cached = self.cache.get(key) if key else None
+                if cached is None:
+                    work[index].append(file_path)
+                    cache_keys[(index, str(file_path))] = key
+                else:
+                    result = CheckResult.from_dict(cached)
+                    result.file_path = str(file_path)
+                    results.append((index, result))
+        return results, work, cache_keys
+
+    def _check_files_in_threads(
+        self, work: Dict[int, List[Path]]
+    ) -> Iterator[Tuple[int, CheckResult]]:
+        """Run all checkers on their files using a pool of threads.
+        Yields (checker index, CheckResult) pairs in order of completion."""
         # print(f"About to use {len(self.checkers)} checkers")
         with concurrent.futures.ThreadPoolExecutor(
             max_workers=self.max_workers
         ) as executor:
             future_to_task = {
-                executor.submit(checker.check, file_path): file_path
-                for checker in self.checkers
-                for file_path in checker.files_to_check
+                executor.submit(self.checkers[index].check_batch, chunk): index
+                for index, file_paths in work.items()
+                for chunk in self.checkers[index].make_chunks(file_paths)
             }
 
-            for future in concurrent.futures.as_completed(future_to_task):
-                result = future.result()
-                # print(f"Completed check for file: {result}")
-                results.append(result)
-        self.results = results
-        return
+            try:
+                for future in concurrent.futures.as_completed(future_to_task):
+                    index = future_to_task[future]
+                    # print(f"Completed check for files: {future.result()}")
+                    for result in future.result():
+                        yield index, result
+            finally:
+                # If the results are no longer wanted, skip those not started
+                for future in future_to_task:
+                    future.cancel()
+
+    def _check_files_in_processes(
+        self, work: Dict[int, List[Path]]
+    ) -> Iterator[Tuple[int, CheckResult]]:
+        """Run all checkers on their files using a pool of worker processes.
+        Each task is a batch of files for one checker, and returns a list of
+        CheckResults, which are yielded in order of completion."""
+        batch_size = self.get_batch_size()
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(self.checkers,),
+        ) as executor:
+            future_to_task = {
+                executor.submit(_check_batch, index, batch): index
+                for index, file_paths in work.items()
+                for batch in make_batches(file_paths, batch_size)
+            }
+            try:
+                for future in concurrent.futures.as_completed(future_to_task):
+                    index = future_to_task[future]
+                    batch_results, profile = future.result()
+                    if profile is not None:
+                        self.profile.merge(profile)
+                    for result in batch_results:
+                        yield index, result
+            finally:
+                # If the results are no longer wanted, skip those not started
+                for future in future_to_task:
+                    future.cancel()
 
     def print_results(self, print_volume: int = 3, quiet_pass: bool = True) -> bool:
         """Print results and return True if all checks passed.
@@ -376,38 +1086,43 @@ class ConformanceChecker:
         each file object to print its details at the desired verbosity."""
         all_passed = True
         for result in self.results:
-            file_status = "✓ PASS" if result.all_passed else "✗ FAIL"
             # Lousy variable names here: 'result' is the CheckResult for a file
             # which had multiple tests, so result.all_passed is for that file.
             all_passed = all_passed and result.all_passed
-            # verbosity level 4 overides quiet_pass for file summary.
-            if quiet_pass and result.all_passed and print_volume < 4:
-                continue
-            print(f"{file_status:7s} file : {result.file_path:50s}")
-            if print_volume >= 3 and not result.all_passed:
-                print(" " * 4 + line_2(86))
-            for test_result in result.test_results:
-                if print_volume < 5 and test_result.passed:
-                    continue
-                if print_volume >= 3 and not test_result.passed:
-                    plural = "" if test_result.failure_count == 1 else "s"
-                    print(
-                        f"     {test_result.checker_name:60s} : Found "
-                        + f"{test_result.failure_count:3} failure{plural}."
-                    )
-                    if test_result.errors and print_volume >= 4:
-                        print(" " * 8 + line_2(82))
-                        for count, (title, info) in enumerate(
-                            test_result.errors.items()
-                        ):
-                            print(" " * 8 + f"{count + 1:2} : {title} : {info}")
-                        print(" " * 8 + line_2(82))
-                elif print_volume >= 3:
-                    print(f"     {test_result.checker_name:60s} : ✓ PASS")
-            if print_volume >= 3 and not result.all_passed:
-                print(" " * 4 + line_2(86))
+            self.print_result(result, print_volume, quiet_pass)
         return all_passed
 
+    @staticmethod
+    def print_result(
+        result: CheckResult, print_volume: int = 3, quiet_pass: bool = True
+    ) -> None:
+        """Print the results for a single file."""
+        file_status = "✓ PASS" if result.all_passed else "✗ FAIL"
+        # verbosity level 4 overides quiet_pass for file summary.
+        if quiet_pass and result.all_passed and print_volume < 4:
+            return
+        print(f"{file_status:7s} file : {result.file_path:50s}")
+        if print_volume >= 3 and not result.all_passed:
+            print(" " * 4 + line_2(86))
+        for test_result in result.test_results:
+            if print_volume < 5 and test_result.passed:
+                continue
+            if print_volume >= 3 and not test_result.passed:
+                plural = "" if test_result.failure_count == 1 else "s"
+                print(
+                    f"     {test_result.checker_name:60s} : Found "
+                    + f"{test_result.failure_count:3} failure{plural}."
+                )
+                if test_result.errors and print_volume >= 4:
+                    print(" " * 8 + line_2(82))
+                    for count, (title, info) in enumerate(test_result.errors.items()):
+                        print(" " * 8 + f"{count + 1:2} : {title} : {info}")
+                    print(" " * 8 + line_2(82))
+            elif print_volume >= 3:
+                print(f"     {test_result.checker_name:60s} : ✓ PASS")
+        if print_volume >= 3 and not result.all_passed:
+            print(" " * 4 + line_2(86))
+
 
 def process_arguments():
     """Process command line arguments.
@@ -422,7 +1137,7 @@ def process_arguments():
         "--file-types",
         type=str,
         nargs="+",
-        choices=["Fortran", "Python", "Generic"],
+        choices=["Fortran", "C", "Python", "Generic"],
         default=["Fortran"],
         help="File types to check, comma-separated",
     )
@@ -435,12 +1150,139 @@ def process_arguments():
     parser.add_argument(
         "--max-workers", type=int, default=8, help="Maximum number of parallel workers"
     )
+    parser.add_argument(
+        "--executor",
+        type=str,
+        choices=ConformanceChecker.executors,
+        default="thread",
+        help="Run checks in a pool of threads, or a pool of processes. "
+        "Processes scale better for large numbers of Fortran files.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=0,
+        help="Number of files sent to each worker process at a time. "
+        "Default (0) chooses a size based on the number of files and workers.",
+    )
     parser.add_argument(
         "--fullcheck",
         action="store_true",
         help="Instead of just checking changed files, check all files in "
         "the repository",
     )
+    parser.add_argument(
+        "--changed-lines",
+        action="store_true",
+        help="Only run the Fortran 'diff' checks on the lines changed on the "
+        "branch. Whole file checks still see the whole of each changed file. "
+        "Ignored with --fullcheck.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't use (or update) the cache of results from previous runs.",
+    )
+    parser.add_argument(
+        "--cache-file",
+        type=str,
+        default=None,
+        help="Cache database of results from previous runs. Defaults to "
+        "$XDG_CACHE_HOME/umdp3_checker/results.sqlite",
+    )
+    parser.add_argument(
+        "--prune-cache",
+        type=float,
+        default=None,
+        metavar="DAYS",
+        help="Before checking, remove cached results from other checker "
+        "versions or not used in the last DAYS days.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time each rule on each file, and print the slowest rules and "
+        "files. Results found in the cache aren't timed, so combine with "
+        "--no-cache to profile every file.",
+    )
+    parser.add_argument(
+        "--profile-json",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="With --profile, also write the timings of every rule and file "
+        "to FILE as JSON.",
+    )
+    for report_format in result_writers:
+        parser.add_argument(
+            f"--results-{report_format}",
+            type=str,
+            default=None,
+            metavar="FILE",
+            help=f"Write the results to FILE in {report_format.upper()} format, "
+            "as they are found.",
+        )
+    parser.add_argument(
+        "--git-commit",
+        type=str,
+        default=None,
+        metavar="REV",
+        help="Check the files of commit REV straight from the git objects of "
+        "the repository at --path (which may be a bare mirror), rather than "
+        "a working tree. Can't be used with the Python (external) checkers.",
+    )
+    parser.add_argument(
+        "--base-branch",
+        type=str,
+        default="main",
+        help="With --git-commit, the files and lines changed since the commit "
+        "branched from this branch are checked.",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        type=int,
+        nargs="?",
+        const=1,
+        default=0,
+        metavar="N",
+        help="Only find whether files fail, stopping once N files (by default "
+        "1) have failed. The checks on each file run cheapest first, and stop "
+        "at its first failure, so the results of failed files are incomplete.",
+    )
+    parser.add_argument(
+        "--rule-costs",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="With --fail-fast, order the checks by the costs in FILE, a "
+        "profile from --profile-json or a baseline from benchmark.py.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After checking, keep watching the files checked, re-checking "
+        "any whose contents change and printing only the violations added "
+        "or fixed. The files (and any changed lines) found at start up are "
+        "kept. Stop with Ctrl-C.",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="With --watch, how often to poll files where inotify isn't available.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        metavar="INDEX/COUNT",
+        help="Only check shard INDEX (numbered from 1) of COUNT, of the files "
+        "found split by size, writing its results to --results-json (by "
+        "default umdp3_results_shard_INDEX_of_COUNT.json). Combine the "
+        "shards with the merge sub-command : "
+        "umdp3_conformance.py merge SHARD.json ...",
+    )
     parser.add_argument(
         "--printpass",
         action="store_true",
@@ -464,11 +1306,64 @@ def process_arguments():
     # parser.add_argument("--checker-configs", type=str, default=None,
     #                     help="Checker configuration file")
     args = parser.parse_args()
+    if args.git_commit and "Python" in args.file_types:
+        parser.error("the Python checkers need a working tree, not --git-commit")
+    if args.watch and (args.git_commit or args.fail_fast):
+        parser.error("--watch needs full results of files on disk")
+    if args.shard and not args.results_json:
+        args.results_json = "umdp3_results_shard_{}_of_{}.json".format(*args.shard)
     # Determine output verbosity level
     args.volume = 3 + args.verbose - args.quiet
     return args
 
 
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse a shard given as INDEX/COUNT, with INDEX numbered from 1."""
+    try:
+        index, count = (int(number) for number in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT, not '{text}'")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {index} isn't between 1 and {count}")
+    return index, count
+
+
+def process_merge_arguments(argv: List[str]):
+    """Process command line arguments of the merge sub-command."""
+    parser = argparse.ArgumentParser(
+        prog="umdp3_conformance.py merge",
+        description="Combine the JSON results of each shard of a sharded run "
+        "into the summary and exit status of a whole run.",
+    )
+    parser.add_argument(
+        "shard_results", nargs="+", help="JSON results file of each shard"
+    )
+    for report_format in result_writers:
+        parser.add_argument(
+            f"--results-{report_format}",
+            type=str,
+            default=None,
+            metavar="FILE",
+            help=f"Write the combined results to FILE in {report_format.upper()} "
+            "format.",
+        )
+    parser.add_argument(
+        "--printpass",
+        action="store_true",
+        help="Print details of passed checks as well as failed ones.",
+    )
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "-v", "--verbose", action="count", default=0, help="Increase output verbosity"
+    )
+    group.add_argument(
+        "-q", "--quiet", action="count", default=0, help="Decrease output verbosity"
+    )
+    args = parser.parse_args(argv)
+    args.volume = 3 + args.verbose - args.quiet
+    return args
+
+
 def line_1(length: int = 80) -> str:
     """Helper function to print a line for separating output sections."""
     repeats = length // 3
@@ -529,52 +1424,156 @@ def which_cms_is_it(path: str, print_volume: int = 3) -> CMSSystem:
     return cms
 
 
+# File extensions checked for each file type, an empty set meaning any file.
+file_type_extensions = {
+    "Fortran": {".f", ".for", ".f90", ".f95", ".f03", ".f08", ".F90"},
+    "C": {".c", ".h"},
+    "Python": {".py"},
+    "Generic": set(),
+}
+
+
+def get_file_extensions(file_types: List[str]) -> Optional[Set[str]]:
+    """All the file extensions checked for the given file types, or None if
+    files with any extension will be checked."""
+    extensions = set()
+    for file_type in file_types or ["Generic"]:
+        if not file_type_extensions[file_type]:
+            return None
+        extensions |= file_type_extensions[file_type]
+    return extensions
+
+
 def create_style_checkers(
-    file_types: List[str], changed_files: List[Path], print_volume: int = 3
+    file_types: List[str],
+    changed_files: List[Path],
+    print_volume: int = 3,
+    changed_lines: Optional[Dict[Path, List[Tuple[int, int]]]] = None,
 ) -> List[StyleChecker]:
-    """Create style checkers based on requested file types."""
+    """Create style checkers based on requested file types.
+    The built in Fortran, C and Generic rule sets are combined into a single
+    UMDP3_checker, so each file is only read once however many apply.
+    If changed_lines is given, the Fortran and C 'diff' checks only look at
+    the changed lines of each file."""
     dispatch_tables = CheckerDispatchTables()
     checkers = []
+    rule_sets = []
+    generic_file_table = dispatch_tables.get_file_dispatch_table_all()
     if "Fortran" in file_types:
-        file_extensions = {".f", ".for", ".f90", ".f95", ".f03", ".f08", ".F90"}
+        if print_volume >= 3:
+            print("Configuring Fortran checkers:")
         fortran_diff_table = dispatch_tables.get_diff_dispatch_table_fortran()
         fortran_file_table = dispatch_tables.get_file_dispatch_table_fortran()
-        generic_file_table = dispatch_tables.get_file_dispatch_table_all()
+        rule_sets.append(
+            RuleSet(
+                file_type_extensions["Fortran"],
+                fortran_diff_table | fortran_file_table | generic_file_table,
+                diff_checks=set(fortran_diff_table),
+            )
+        )
+    if "C" in file_types:
         if print_volume >= 3:
-            print("Configuring Fortran checkers:")
-        combined_checkers = fortran_diff_table | fortran_file_table | generic_file_table
-        fortran_file_checker = UMDP3_checker.from_full_list(
-            "Fortran Checker", file_extensions, combined_checkers, changed_files
+            print("Configuring C checkers:")
+        c_diff_table = dispatch_tables.get_diff_dispatch_table_c()
+        c_file_table = dispatch_tables.get_file_dispatch_table_c()
+        rule_sets.append(
+            RuleSet(
+                file_type_extensions["C"],
+                c_diff_table | c_file_table | generic_file_table,
+                diff_checks=set(c_diff_table),
+            )
         )
-        checkers.append(fortran_file_checker)
+    if "Generic" in file_types or file_types == []:
+        if print_volume >= 3:
+            print("Configuring Generic File Checkers:")
+        rule_sets.append(RuleSet(set(), generic_file_table))
+    if rule_sets:
+        umdp3_file_checker = UMDP3_checker(
+            "UMDP3 Checker",
+            set(),
+            {},
+            changed_files,
+            print_volume,
+            changed_lines=changed_lines,
+            rule_sets=rule_sets,
+        )
+        checkers.append(umdp3_file_checker)
     if "Python" in file_types:
         if print_volume >= 3:
             print("Configuring External Python checkers:")
-        file_extensions = {".py"}
+        file_extensions = file_type_extensions["Python"]
         python_checkers = {
             # "flake 8":     ["flake8", "-q"],
             # "black":       ["black", "--check"],
             # "pylint":      ["pylint", "-E"],
             "ruff": ["ruff", "check"],
         }
+        # Checks which can be run on many files at once
+        python_batch_checkers = {
+            "ruff": BatchCommand(
+                ["ruff", "check", "--output-format=json"], parse_ruff_json
+            ),
+        }
         python_file_checker = ExternalChecker(
-            "External Python Checkers", file_extensions, python_checkers, changed_files
+            "External Python Checkers",
+            file_extensions,
+            python_checkers,
+            changed_files,
+            batch_commands=python_batch_checkers,
         )
         checkers.append(python_file_checker)
-    if "Generic" in file_types or file_types == []:
-        if print_volume >= 3:
-            print("Configuring Generic File Checkers:")
-        all_file_dispatch_table = dispatch_tables.get_file_dispatch_table_all()
-        generic_checker = UMDP3_checker(
-            "Generic File Checker", set(), all_file_dispatch_table, changed_files
-        )
-        checkers.append(generic_checker)
 
     return checkers
 
 
+def print_summary(results: List[CheckResult], print_volume: int = 3) -> bool:
+    """Print the files failed and totals of a run, returning whether all
+    the files passed."""
+    all_passed = all(result.all_passed for result in results)
+    if print_volume >= 4:
+        print("\n" + line_1(81))
+        print("## Summary :" + " " * 67 + "##")
+        print(line_1(81))
+    if print_volume >= 2 and not all_passed:
+        print("Files failed :")
+        for result in results:
+            if not result.all_passed:
+                print(f"    {result.file_path}")
+    print(f"Total files checked: {len(results)}")
+    print(f"Total files failed: {sum(1 for r in results if not r.all_passed)}")
+    return all_passed
+
+
+def merge_shards(args) -> bool:
+    """The merge sub-command : print (and write) the combined results of
+    the shards of a run, returning whether all the files passed."""
+    try:
+        results = load_shard_results([Path(path) for path in args.shard_results])
+    except (OSError, ValueError) as error:
+        print(f"Can't merge the shard results : {error}")
+        exit(2)
+    writers = [
+        writer_class(getattr(args, f"results_{report_format}"), version=VERSION)
+        for report_format, writer_class in result_writers.items()
+        if getattr(args, f"results_{report_format}")
+    ]
+    print("Results  :")
+    for result in results:
+        ConformanceChecker.print_result(
+            result, print_volume=args.volume, quiet_pass=not args.printpass
+        )
+        for writer in writers:
+            writer.write(result)
+    for writer in writers:
+        writer.close()
+    return print_summary(results, args.volume)
+
+
 def get_files_to_check(
-    path: str, full_check: bool, print_volume: int = 3
+    path: str,
+    full_check: bool,
+    print_volume: int = 3,
+    file_extensions: Optional[Set[str]] = None,
 ) -> List[Path]:
     """
     Docstring for get_files_to_check : A routine to get the list of files to
@@ -588,12 +1587,14 @@ def get_files_to_check(
     :type full_check: bool
     :param print_volume: Verbosity level for printing. Default is 3.
     :type print_volume: int
+    :param file_extensions: For a full check, only find files with these
+    extensions. Default of None finds files with any extension.
+    :type file_extensions: Optional[Set[str]]
     :return: List of relative file paths to check.
     :rtype: List[Path]
     """
     if full_check:  # Override to check all files present.
-        repo_path = Path(path)
-        all_files = [f for f in repo_path.rglob("*") if f.is_file()]
+        all_files = discover_files(path, file_extensions)
         if print_volume >= 1:
             print("Full check override enabled.")
         if print_volume >= 3:
@@ -612,13 +1613,49 @@ def get_files_to_check(
 
 # Usage when run from command line.
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["merge"]:
+        all_passed = merge_shards(process_merge_arguments(sys.argv[2:]))
+        exit(0 if all_passed else 1)
+
     args = process_arguments()
 
     log_volume = args.volume
     quiet_pass = not args.printpass
 
-    file_paths = get_files_to_check(args.path, args.fullcheck, log_volume)
-    full_file_paths = [Path(args.path) / f for f in file_paths]
+    changed_lines = None
+    source = None
+    if args.git_commit:
+        # Paths are relative to the top of the repository, and read from git
+        source = GitObjectSource(Path(args.path), args.git_commit)
+        file_extensions = get_file_extensions(args.file_types)
+        if args.fullcheck:
+            full_file_paths = source.list_files(file_extensions)
+        else:
+            full_file_paths = source.changed_files(args.base_branch)
+            if args.changed_lines:
+                changed_lines = source.changed_lines(args.base_branch)
+        if log_volume >= 3:
+            print(
+                f"Found {len(full_file_paths)} files to check in commit "
+                f"{source.commit} of {args.path}"
+            )
+    elif args.changed_lines and not args.fullcheck:
+        if log_volume >= 1:
+            print("Using a CMS to determine changed files and lines.")
+        cms = which_cms_is_it(args.path, log_volume)
+        file_paths = cms.get_changed_files()
+        changed_lines = {
+            Path(args.path) / f: ranges for f, ranges in cms.get_changed_lines().items()
+        }
+        full_file_paths = [Path(args.path) / f for f in file_paths]
+    else:
+        file_paths = get_files_to_check(
+            args.path,
+            args.fullcheck,
+            log_volume,
+            file_extensions=get_file_extensions(args.file_types),
+        )
+        full_file_paths = [Path(args.path) / f for f in file_paths]
 
     # Configure checkers
     """
@@ -627,18 +1664,62 @@ if __name__ == "__main__":
         Later, could add configuration files to specify which
         checkers to use for each file type."""
 
-    active_checkers = create_style_checkers(args.file_types, full_file_paths)
+    if args.shard:
+        file_size = source.size if source is not None else size_on_disk
+        no_of_files = len(full_file_paths)
+        full_file_paths = shard_files(full_file_paths, *args.shard, file_size)
+        if log_volume >= 3:
+            print(
+                "Shard {} of {} : ".format(*args.shard)
+                + f"checking {len(full_file_paths)} of {no_of_files} files."
+            )
+
+    active_checkers = create_style_checkers(
+        args.file_types, full_file_paths, changed_lines=changed_lines
+    )
 
     # TODO : Could create a conformance checker for each
     #  file type.
     #  Currently, just create a single conformance checker
     #  with all active checkers.
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_file, version=VERSION)
+        if args.prune_cache is not None:
+            pruned = cache.prune(args.prune_cache)
+            if log_volume >= 3:
+                print(f"Pruned {pruned} entries from the results cache.")
+
+    profile = RuleProfile() if args.profile or args.profile_json else None
+
     checker = ConformanceChecker(
         active_checkers,
         max_workers=args.max_workers,
+        executor=args.executor,
+        batch_size=args.batch_size,
+        cache=cache,
+        profile=profile,
+        source=source,
+        max_failures=args.fail_fast,
+        rule_costs=load_rule_costs(args.rule_costs) if args.rule_costs else None,
     )
 
-    checker.check_files()
+    writers = [
+        writer_class(
+            getattr(args, f"results_{report_format}"),
+            version=VERSION,
+            shard=args.shard,
+        )
+        for report_format, writer_class in result_writers.items()
+        if getattr(args, f"results_{report_format}")
+    ]
+
+    def report_result(result: CheckResult) -> None:
+        """Print and write out each result as soon as it's available."""
+        checker.print_result(result, print_volume=log_volume, quiet_pass=quiet_pass)
+        sys.stdout.flush()
+        for writer in writers:
+            writer.write(result)
 
     if log_volume >= 3:
         print(line_1(81))
@@ -646,12 +1727,38 @@ if __name__ == "__main__":
         print(line_1(81) + "\n")
     else:
         print("Results  :")
-    all_passed = checker.print_results(print_volume=log_volume, quiet_pass=quiet_pass)
-    if log_volume >= 4:
+    checker.check_files(on_result=report_result)
+    for writer in writers:
+        writer.close()
+    if source is not None:
+        source.close()
+    if cache is not None:
+        cache.close()
+        if log_volume >= 4:
+            print(f"Results cache : {cache.hits} hits, {cache.misses} misses.")
+
+    if checker.stopped and log_volume >= 1:
+        print(
+            f"Fail fast : stopped after {args.fail_fast} failed file(s), "
+            "without checking every file."
+        )
+    all_passed = print_summary(checker.results, log_volume)
+
+    if profile is not None:
         print("\n" + line_1(81))
-        print("## Summary :" + " " * 67 + "##")
+        print("## Profile :" + " " * 67 + "##")
         print(line_1(81))
-    print(f"Total files checked: {len(checker.results)}")
-    print(f"Total files failed: {sum(1 for r in checker.results if not r.all_passed)}")
+        print(profile.report(limit=10 if log_volume < 4 else 25))
+        if args.profile_json:
+            profile.write_json(Path(args.profile_json))
+            print(f"Profile written to {args.profile_json}")
+
+    if args.watch:
+        from watch_mode import IncrementalChecker, watch
+
+        incremental = IncrementalChecker(
+            active_checkers, checker.results, max_workers=args.max_workers
+        )
+        all_passed = watch(incremental, args.watch_interval, log_volume)
 
     exit(0 if all_passed else 1)
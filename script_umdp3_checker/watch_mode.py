@@ -0,0 +1,307 @@
+# -----------------------------------------------------------------------------
+# (C) Crown copyright Met Office. All rights reserved.
+# The file LICENCE, distributed with this code, contains details of the terms
+# under which the code may be used.
+# -----------------------------------------------------------------------------
+
+"""
+Watch mode : after a normal run, keep watching the files checked and
+re-check each one whose contents change, printing only the violations
+which are new or have been fixed since it was last checked.
+
+The files watched are those found at start up (e.g. the change set of the
+branch), which isn't recomputed. Changes are found with inotify on Linux,
+through the C library as there's no binding in the standard library, or
+by polling the size and modification time of each file otherwise.
+"""
+
+import copy
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from result_cache import ResultCache, file_digest
+from result_writers import error_details
+from umdp3_conformance import CheckResult, ConformanceChecker, StyleChecker
+
+# Time to wait for the rest of a burst of events (e.g. an editor's save)
+settle_time = 0.1
+
+
+class PollingWatcher:
+    """Finds changed files by polling their size and modification time."""
+
+    def __init__(self, files: List[Path], interval: float = 1.0):
+        self.files = list(files)
+        self.interval = interval
+        self.signatures = {file_path: self.signature(file_path) for file_path in files}
+
+    @staticmethod
+    def signature(file_path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            status = file_path.stat()
+        except OSError:
+            return None
+        return status.st_size, status.st_mtime_ns
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Wait up to timeout seconds (or forever) for files to change,
+        returning those which have (or an empty set)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for file_path in self.files:
+                signature = self.signature(file_path)
+                if signature != self.signatures[file_path]:
+                    self.signatures[file_path] = signature
+                    changed.add(file_path)
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, max(0.0, deadline - time.monotonic()))
+            time.sleep(delay)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Finds changed files with Linux inotify. The directories holding the
+    files are watched, rather than the files, so files replaced by editors
+    saving to a new file and renaming it are still followed."""
+
+    # inotify_event header : wd, mask, cookie, len
+    event_header = struct.Struct("iIII")
+    in_close_write = 0x008
+    in_moved_from = 0x040
+    in_moved_to = 0x080
+    in_delete = 0x200
+
+    def __init__(self, files: List[Path]):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("No C library to use inotify from")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Absolute path of each file, to the path it was given as
+        self.files = {os.path.abspath(file_path): file_path for file_path in files}
+        self.directories = {}
+        mask = (
+            self.in_close_write | self.in_moved_from | self.in_moved_to | self.in_delete
+        )
+        for directory in sorted({os.path.dirname(path) for path in self.files}):
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if wd < 0:
+                error = ctypes.get_errno()
+                self.close()
+                raise OSError(error, f"Can't watch {directory}")
+            self.directories[wd] = directory
+
+    def read_events(self) -> Set[Path]:
+        """The watched files named in the events waiting to be read."""
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, _, _, length = self.event_header.unpack_from(data, offset)
+                offset += self.event_header.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                path = os.path.join(self.directories.get(wd, ""), os.fsdecode(name))
+                if path in self.files:
+                    changed.add(self.files[path])
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Wait up to timeout seconds (or forever) for files to change,
+        returning those which have (or an empty set)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return set()
+            changed = self.read_events()
+            # Gather the rest of the burst of events
+            while select.select([self.fd], [], [], settle_time)[0]:
+                changed |= self.read_events()
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def make_watcher(files: List[Path], interval: float = 1.0):
+    """An InotifyWatcher if inotify can be used, otherwise a PollingWatcher."""
+    try:
+        return InotifyWatcher(files)
+    except (OSError, AttributeError):
+        return PollingWatcher(files, interval)
+
+
+def violations(
+    result: CheckResult, lines: List[str]
+) -> Dict[Tuple[str, str, str], List[int]]:
+    """The line numbers of each violation in a file's result, keyed on its
+    (check, message, stripped text of the line), given the file's lines.
+    Those not on a particular line are given line 0 and no text. Keying on
+    the text rather than the line number means violations don't appear to
+    change when lines are added or removed above them."""
+    found = {}
+    for test_result in result.test_results:
+        if test_result.passed:
+            continue
+        for message, line_numbers in error_details(test_result.errors) or [
+            (test_result.output, [])
+        ]:
+            for line in line_numbers or [0]:
+                text = lines[line - 1].strip() if 0 < line <= len(lines) else ""
+                key = (test_result.checker_name, message, text)
+                found.setdefault(key, []).append(line)
+    return found
+
+
+def violation_changes(
+    old: Dict[Tuple[str, str, str], List[int]],
+    new: Dict[Tuple[str, str, str], List[int]],
+) -> List[Tuple[str, str, str, int]]:
+    """The (sign, check, message, line) of the violations fixed (-) and
+    added (+) between two sets of violations(). Where a violation is found
+    on several lines with the same text, they are paired in line order and
+    only those left over are reported."""
+    changes = []
+    for sign, before, after in (("-", old, new), ("+", new, old)):
+        found = []
+        for (checker_name, message, text), line_numbers in before.items():
+            matched = len(after.get((checker_name, message, text), []))
+            for line in sorted(line_numbers)[matched:]:
+                found.append((checker_name, message, line))
+        changes += [(sign, *violation) for violation in sorted(found, key=str)]
+    return changes
+
+
+def read_lines(file_path: Path) -> List[str]:
+    """The lines of a file, or none if it can't be read."""
+    try:
+        return file_path.read_bytes().decode("utf-8", "replace").splitlines()
+    except OSError:
+        return []
+
+
+class IncrementalChecker:
+    """Holds the latest result for each file, and re-checks files whose
+    contents have changed, describing the violations added and fixed."""
+
+    def __init__(
+        self,
+        checkers: List[StyleChecker],
+        results: List[CheckResult],
+        max_workers: int = 8,
+        cache: Optional[ResultCache] = None,
+    ):
+        self.checkers = checkers
+        self.max_workers = max_workers
+        self.cache = cache
+        self.results: Dict[str, CheckResult] = {
+            result.file_path: result for result in results
+        }
+        self.files = sorted(
+            {file_path for checker in checkers for file_path in checker.files_to_check}
+        )
+        self.digests = {file_path: self.digest(file_path) for file_path in self.files}
+        # The text each result was found in, to follow violations whose line
+        # numbers change
+        self.lines = {str(file_path): read_lines(file_path) for file_path in self.files}
+
+    @staticmethod
+    def digest(file_path: Path) -> Optional[str]:
+        try:
+            return file_digest(file_path)
+        except OSError:
+            return None
+
+    @property
+    def all_passed(self) -> bool:
+        return all(result.all_passed for result in self.results.values())
+
+    def recheck(self, file_paths: Set[Path]) -> List[str]:
+        """Re-check those of the files whose contents have changed, and
+        describe the violations added (+) and fixed (-) in each."""
+        changed = []
+        for file_path in sorted(file_paths):
+            digest = self.digest(file_path)
+            if digest is not None and digest != self.digests.get(file_path):
+                self.digests[file_path] = digest
+                changed.append(file_path)
+        if not changed:
+            return []
+
+        checkers = []
+        for checker in self.checkers:
+            checker = copy.copy(checker)
+            checker.files_to_check = [f for f in checker.files_to_check if f in changed]
+            checkers.append(checker)
+        conformance = ConformanceChecker(
+            checkers, max_workers=self.max_workers, cache=self.cache
+        )
+        conformance.check_files()
+
+        lines = []
+        for result in conformance.results:
+            before = self.results.get(result.file_path)
+            old_lines = self.lines.get(result.file_path, [])
+            old = violations(before, old_lines) if before is not None else {}
+            new_lines = read_lines(Path(result.file_path))
+            new = violations(result, new_lines)
+            self.results[result.file_path] = result
+            self.lines[result.file_path] = new_lines
+            for sign, checker_name, message, line in violation_changes(old, new):
+                where = f"{result.file_path}:{line}" if line else result.file_path
+                lines.append(f"{sign} {where} : {checker_name} : {message}")
+        return lines
+
+
+def watch(
+    incremental: IncrementalChecker,
+    interval: float = 1.0,
+    print_volume: int = 3,
+) -> bool:
+    """Re-check files as they change, printing the changes in violations,
+    until interrupted. Returns whether all the files last passed."""
+    watcher = make_watcher(incremental.files, interval)
+    if print_volume >= 1:
+        print(
+            f"Watching {len(incremental.files)} files "
+            f"({type(watcher).__name__}), press Ctrl-C to stop."
+        )
+    try:
+        while True:
+            changes = incremental.recheck(watcher.wait())
+            if not changes:
+                continue
+            print(time.strftime("[%H:%M:%S]"))
+            for change in changes:
+                print(f"    {change}")
+            failed = sum(not r.all_passed for r in incremental.results.values())
+            print(f"Total files failed: {failed}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return incremental.all_passed
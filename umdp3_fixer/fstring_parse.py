@@ -15,6 +15,7 @@ quoted strings in Fortran
 """
 
 import re
+from functools import lru_cache, wraps
 
 
 class ParsingError(Exception):
@@ -55,6 +56,41 @@ DQUOTE = 1
 PBLANKFSTRRE = re.compile("^[^!]*?('|\")")
 BLANKFCOMSRE = re.compile("('|\")(.*)!(.*)&")
 ISPPCONTCR = re.compile(r"\\\s*$", flags=re.IGNORECASE)
+PPCONTSUBRE = re.compile(r"\\(\s*)$")
+CONTSUBRE = re.compile(r"&(\s*)$")
+BLANKLINERE = re.compile(r"^\s*$")
+PPDIRECTIVERE = re.compile(r"^\s*#\w+")
+
+# The fixer's stages each lex the same lines again (and again on every pass
+# until the fixes converge), so the results of lexing the most recently seen
+# lines are kept, keyed by the line and its string continuation state.
+LEXER_CACHE_SIZE = 32768
+
+
+def cached_lexer(function):
+    """
+    Decorator which memoises a function of a line and its string
+    continuation state, so each distinct line is only lexed once however
+    many stages look at it. Lists returned are copied, so callers may
+    modify them.
+    """
+
+    @lru_cache(maxsize=LEXER_CACHE_SIZE)
+    def cached(line, squote, dquote):
+        return function(line, [squote, dquote])
+
+    @wraps(function)
+    def wrapper(line, string_continuation=[False, False]):
+        result = cached(
+            line,
+            bool(string_continuation[SQUOTE]),
+            bool(string_continuation[DQUOTE]),
+        )
+        if isinstance(result, list):
+            return list(result)
+        return result
+
+    return wrapper
 
 
 def replace_characters(line, locs, lens, replchar="X"):
@@ -94,6 +130,7 @@ def replace_characters(line, locs, lens, replchar="X"):
     return "".join(newline)
 
 
+@cached_lexer
 def blank_fstring(line, string_continuation=[False, False]):
     "blanks out strings within the fortran line"
 
@@ -111,6 +148,7 @@ def blank_fstring(line, string_continuation=[False, False]):
     return bline
 
 
+@cached_lexer
 def partial_blank_fstring(line, string_continuation=[False, False]):
     "blanks out strings within the fortran line"
 
@@ -162,6 +200,7 @@ def partial_blank_fstring(line, string_continuation=[False, False]):
     return bline
 
 
+@cached_lexer
 def blank_fcomments(line, string_continuation=[False, False]):
     "blanks out comments within the fortran line"
 
@@ -183,6 +222,7 @@ def blank_fcomments(line, string_continuation=[False, False]):
     return bline
 
 
+@cached_lexer
 def is_continuation(line, string_continuation=[False, False]):
     "checks if line is a continuation line"
 
@@ -267,6 +307,7 @@ def is_str_continuation_preparblank(parblanked, line):
     return cont
 
 
+@cached_lexer
 def is_str_continuation(line, string_continuation=[False, False]):
     "checks if line is a string continuation"
 
@@ -278,6 +319,7 @@ def is_str_continuation(line, string_continuation=[False, False]):
     return is_str_continuation_preparblank(parblanked, line)
 
 
+@cached_lexer
 def clean_str_continuation(line, string_continuation=[False, False]):
     "blanks out strings withing the fortran line"
 
@@ -292,14 +334,19 @@ def clean_str_continuation(line, string_continuation=[False, False]):
     return out_line
 
 
-def simplify_line(lines):
-    "A pre-processor for the lines to make them easier to handle"
+def simplify_line(lines, start=0, first_line=None):
+    """
+    A pre-processor for the lines to make them easier to handle
+
+    Returns the simplified statement starting at lines[start], with any
+    continuation lines that follow it pulled in. The lines are indexed in
+    place rather than sliced, so each statement only costs as much as the
+    lines it spans. If first_line is given it is used in place of
+    lines[start] (e.g. a line with earlier continuations already joined on).
+    """
 
-    # Note we will be passed a slice to include the lines after the
-    # current line to the end of the file to allow handling of
-    # continutations
-    iline = 0
-    line = lines[iline]
+    iline = start
+    line = lines[start] if first_line is None else first_line
 
     repeat_simplify = False
 
@@ -312,7 +359,7 @@ def simplify_line(lines):
     while repeat_simplify:
         while is_pp_continuation(line):
             iline += 1
-            line = "".join([re.sub(r"\\(\s*)$", r" \1", line), lines[iline]])
+            line = "".join([PPCONTSUBRE.sub(r" \1", line), lines[iline]])
 
         # blank any strings pulled in, in case they contain a ! character
         try:
@@ -341,25 +388,36 @@ def simplify_line(lines):
 
             while is_pp_continuation(xline):
                 xiline += 1
-                xline = "".join([re.sub(r"\\(\s*)$", r" \1", xline), lines[xiline]])
+                xline = "".join([PPCONTSUBRE.sub(r" \1", xline), lines[xiline]])
 
             xline = clean_str_continuation(xline, is_str_continuation(line))
 
             # Skip following lines if they contain only comments,
             # pre-processor directives, or are empty
-            if re.search(
-                r"^\s*$", blank_fcomments(xline), flags=re.IGNORECASE
-            ) or re.search(r"^\s*#\w+", xline, flags=re.IGNORECASE):
+            if BLANKLINERE.search(blank_fcomments(xline)) or PPDIRECTIVERE.search(
+                xline
+            ):
                 iline = xiline + 1
             else:
                 break
 
-        line = "".join([re.sub(r"&(\s*)$", r" \1", line), lines[iline]])
+        line = "".join([CONTSUBRE.sub(r" \1", line), lines[iline]])
 
         if not is_pp_continuation(line):
             if not is_continuation(line):
                 repeat_simplify = False
 
+    return simplify_statement(line)
+
+
+@lru_cache(maxsize=LEXER_CACHE_SIZE)
+def simplify_statement(line):
+    """
+    Simplify a whole statement, with its continuation lines already joined,
+    for simplify_line. Statements are simplified again by each of the fixes
+    (and on every pass of them), so the results are kept.
+    """
+
     # if the line still continues in some form, we have mis-parsed
     if is_continuation(line) or is_pp_continuation(line):
         print("Indentation simplify line has failed. [3]")
@@ -388,23 +446,22 @@ def simplify_line(lines):
     # (i.e. leave only top level brackets)
     # this is to aid with pattern matching where brackets are included
     bracket_nest_level = 0
-    new_line = ""
+    new_line = []
     for char in line:
         if char == "(":
             bracket_nest_level += 1
             if bracket_nest_level > 1:
-                new_line += " "
+                new_line.append(" ")
                 continue
         if char == ")":
             if bracket_nest_level > 1:
-                new_line += " "
+                new_line.append(" ")
                 bracket_nest_level -= 1
                 continue
             bracket_nest_level -= 1
-        new_line += char
+        new_line.append(char)
 
-    line = new_line
-    return line
+    return "".join(new_line)
 
 
 def find_quoted_char(line, char, string_continuation=[False, False]):
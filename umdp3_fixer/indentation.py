@@ -259,7 +259,7 @@ def apply_indentation(lines, debug=False):
         else:
             # Generate a simplified version of the line for use in
             # pattern matches
-            simple_line = simplify_line(lines[iline:])
+            simple_line = simplify_line(lines, iline)
 
             if debug:
                 print(
@@ -15,74 +15,72 @@ Return a list of any files changed by the umdp3_checker.py script.
 
 Usage:
  Fortran files must end in .f90, .F90 or .inc extension.
- Copy files to work/tmp.
- Run the script on the whole tmp dir.
- Diff with the working copy.
- Fail if changes and return files that need changing.
+ Run the script in check mode on the src/ of the working copy (or only the
+ files changed on the branch, with --branch-diff), which changes nothing.
+ Fail if changes would be made and return files that need changing, along
+ with the changes.
 
 """
 
 from argparse import ArgumentParser
-import sys
 import os
-import shutil
 import subprocess
-import tempfile
 
 
-def copy_working_branch(model_source):
-    """Copy the working version of the branch to a tmp dir."""
-    # Make the tmp dir in the cwd which is the work/ of the task name.
-    tmpdir = tempfile.mkdtemp()
-    tmp_filename = "model_diff"
-
-    # Ensure the file is read/write by the creator only
-    saved_umask = os.umask(0o077)
-
-    tmp_path = os.path.join(tmpdir, tmp_filename)
-
-    # Copy the src/ from the working copy to the tmp dir.
+def find_fortran_files(model_source):
+    """Return the Fortran files in the src/ of the working copy."""
+    fortran_files = []
+    for root, dirs, files in os.walk(os.path.join(model_source, "src")):
+        dirs.sort()
+        fortran_files.extend(
+            os.path.join(root, name)
+            for name in sorted(files)
+            if name.endswith((".F90", ".f90", ".inc"))
+        )
+    return fortran_files
 
-    src_wkcopy = os.path.join(model_source, "src")
-    try:
-        shutil.copytree(src_wkcopy, tmp_path)
-    # Directories are the same
-    except shutil.Error as err:
-        print("Directory not copied. Error: %s" % err)
-    # Any error saying that the directory doesn't exist
-    except OSError as err:
-        print("Directory not copied. Error: %s" % err)
-    return tmp_path, saved_umask, tmpdir
 
+def run_umdp3checker(fixer_source, model_source, amp_column, branch_diff=False):
+    """Run the umdp3 fixer script over the working branch, in check mode so
+    no files are changed, and report any files it would change."""
+    # The fixer is run from the working copy, so relative paths won't do
+    model_source = os.path.abspath(model_source)
+    fixer_source = os.path.abspath(fixer_source)
+    command = [
+        os.path.join(fixer_source, "umdp3_fixer.py"),
+        "--col",
+        str(amp_column),
+        "--diff",
+    ]
+    if branch_diff:
+        # The branch diff is found from the working copy in the cwd
+        command.append("--branch-diff")
+    else:
+        command.extend(find_fortran_files(model_source))
 
-def diff_cwd_working(model_source, path, saved_umask, tmpdir):
-    """Diff the tmp dir with the working branch and report diff."""
-    diff = subprocess.run(
-        "diff -qr " + model_source + "/src " + path,
+    result = subprocess.run(
+        command,
+        capture_output=True,
         stdin=subprocess.DEVNULL,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=True,
-        universal_newlines=True,
+        cwd=model_source,
+        text=True,
     )
 
-    if diff.returncode == 0:
+    if result.returncode == 0:
         print(
-            "[OK] No changes were made by the UMDP3 checker script and "
+            "[OK] No changes would be made by the UMDP3 fixer script and "
             "the working copy complies with the coding standards. "
             "No action required."
         )
-    else:
-        diff_stdout = diff.stdout
-        diff_files = diff_stdout.strip().split("\n")
+    elif result.returncode == 2:
+        # The fixer exits with status 2 if it would change any files,
+        # listing them on stderr, with the changes on stdout
         print(
-            "[FAIL] The following files were changed when the "
-            "umdp3_fixer.py script was run:"
+            "[FAIL] The following files would be changed by the umdp3_fixer.py script:"
         )
-        for diff_filesname in diff_files:
-            # diffs are of the form "Files <x> and <y> differ"
-            # we select only <x>
-            print("[FAIL] " + diff_filesname.split()[1])
+        for line in result.stderr.split("\n"):
+            if line.startswith("Needs fixing:"):
+                print("[FAIL] " + line.replace("Needs fixing:", "").strip())
         print(
             "Please run umdp3_fixer.py on each of the "
             "failed files in your working copy and check the changes. "
@@ -90,46 +88,23 @@ def diff_cwd_working(model_source, path, saved_umask, tmpdir):
             "rose-stem testing.\n\nThe umdp3_fixer.py script can be found in "
             "https://github.com/MetOffice/SimSys_Scripts.git"
         )
-        os.umask(saved_umask)
-        shutil.rmtree(tmpdir)
+        print("\nThe changes umdp3_fixer.py would make are:\n")
+        print(
+            "\n".join(
+                line
+                for line in result.stdout.split("\n")
+                if not line.startswith("Processing")
+            )
+        )
         raise ValueError(
-            "Ran fcm diff command and changes were made by "
+            "Ran umdp3_fixer.py in check mode and changes would be made by "
             + "the umdp3_fixer.py script."
         )
-
-    return
-
-
-def run_umdp3checker(fixer_source, path, amp_column):
-    """Run the umdp3 fixer script in the tmp dir copy of the working branch."""
-    command = (
-        f"{os.path.join(fixer_source, 'umdp3_fixer.py')} --col {amp_column} "
-        f"$(find {path} -name '*.[F|f]90' -o -name '*.inc' | xargs)"
-    )
-    result = subprocess.run(
-        command,
-        capture_output=True,
-        stdin=subprocess.DEVNULL,
-        shell=True,
-        text=True,
-    )
-
-    if result.returncode:
-        if "Exception: Some files were modified" in result.stderr:
-            # umpd3_fixer.py raises an exception on finding any modified
-            # files, but we can ignore it here.
-            print(
-                "[WARN] The following files were found to be modified:", file=sys.stderr
-            )
-            for line in result.stderr.split("\n"):
-                if line.strip().startswith("Modified:"):
-                    print("   * " + line.replace("Modified:", ""), file=sys.stderr)
-            print("", file=sys.stderr)
-        else:
-            raise RuntimeError(
-                "[FAIL] Problem while attempting to run umdp3_fixer.py\n"
-                f"{result.stderr}"
-            )
+    else:
+        raise RuntimeError(
+            "[FAIL] Problem while attempting to run umdp3_fixer.py\n"
+            f"{result.stdout}\n{result.stderr}"
+        )
     return
 
 
@@ -166,6 +141,13 @@ def main():
     )
     # e.g. "--col 80"
 
+    parser.add_argument(
+        "--branch-diff",
+        dest="branch_diff",
+        action="store_true",
+        help="only check the files changed on the branch",
+    )
+
     # Parse the command line.
     opts = parser.parse_args()
     model_source = opts.source
@@ -174,12 +156,7 @@ def main():
         fixer_source = os.path.join(model_source, "rose-stem", "bin")
     amp_column = opts.col
 
-    (path, saved_umask, tmpdir) = copy_working_branch(model_source)
-    run_umdp3checker(fixer_source, path, amp_column)
-    diff_cwd_working(model_source, path, saved_umask, tmpdir)
-
-    os.umask(saved_umask)
-    shutil.rmtree(tmpdir)
+    run_umdp3checker(fixer_source, model_source, amp_column, opts.branch_diff)
 
 
 if __name__ == "__main__":
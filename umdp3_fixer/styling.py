@@ -106,7 +106,7 @@ FORTRAN_TYPES = [
     "TYPE",
 ]
 
-KEYWORDS = set(
+KEYWORDS = frozenset(
     [
         "abort",
         "abs",
@@ -789,6 +789,11 @@ KEYWORDS = set(
 )
 
 
+# Words of code, and the special "__FILE__"-like pre-processor directives
+WORD_RE = re.compile(r"\w+")
+DIRECTIVE_RE = re.compile(r"__\w+__")
+
+
 def replace_patterns(line, str_continuation):
     """Replace various patterns according to the styling guidelines on
     the provided line, returning the result"""
@@ -925,6 +930,27 @@ def replace_comment_patterns(line, str_continuation):
     return line
 
 
+def keyword_case(word):
+    """Return a word of code in the case it should have: upper-case if it is
+    a Fortran keyword, lower-case if it is an all capital word which isn't
+    (other than special "__FILE__" or "__LINE__" directives), and otherwise
+    unchanged"""
+
+    lower_word = word.lower()
+    if lower_word in KEYWORDS:
+        new_word = word.upper()
+    elif word.isupper() and not DIRECTIVE_RE.match(word):
+        new_word = lower_word
+    else:
+        return word
+
+    # A few non-ASCII letters change length with case; leave those alone
+    # rather than shifting the rest of the line
+    if len(new_word) != len(word):
+        return word
+    return new_word
+
+
 def upcase_keywords(line, str_continuation):
     """Upper-case any Fortran keywords on the given line, and down-case any
     all capital words which aren't keywords, returning the result"""
@@ -936,8 +962,6 @@ def upcase_keywords(line, str_continuation):
     if len(stripline) == 0 or stripline[0] == "!" or stripline[0] == "#":
         return line
 
-    nloop = len(line)
-
     try:
         simple_line = blank_fstring(workline)
     except ParsingError as e:
@@ -954,40 +978,19 @@ def upcase_keywords(line, str_continuation):
     # remove comments
     simple_line = blank_fcomments(simple_line)
 
-    # Split the line of code into a set of words
-    line_words = set(re.findall(r"[\w]+", simple_line))
-
-    for word in line_words:
-        # Exclude special "__FILE__" or "__LINE__" directives
-        if word.isupper() and not re.match(r"__\w+__", word):
-            recomp = re.compile(r"(^|\b){0:s}(\b|$)".format(word))
-            simple_line = recomp.sub(
-                r"\g<1>{0:s}" r"\g<2>".format(word.lower()), simple_line
-            )
-
-    line_words = set([word.lower() for word in line_words])
-    words_to_upcase = list(line_words.intersection(KEYWORDS))
-    line = list(line)
-    for keyword in words_to_upcase:
-        recomp = re.compile(r"(?i)(^|\b){0:s}(\b|$)".format(keyword))
-        simple_line = recomp.sub(
-            r"\g<1>{0:s}\g<2>".format(keyword.upper()), simple_line
-        )
-
-    # Now add back any comments/strings
-    simple_line = list(simple_line)
+    # Rewrite the changed words of the code in place; everything else on the
+    # line (including the strings and comments blanked above) is kept as is
     out_line = []
+    start = 0
+    for match in WORD_RE.finditer(simple_line):
+        word = match.group()
+        new_word = keyword_case(word)
+        if new_word != word:
+            out_line.extend([line[start : match.start()], new_word])
+            start = match.end()
+    out_line.append(line[start:])
 
-    for i in range(nloop):
-        if simple_line[i] == " ":
-            out_line.append(line[i])
-        else:
-            out_line.append(simple_line[i])
-
-    # Join the line back up into a string.
-    out_line = "".join(out_line)
-
-    return out_line
+    return "".join(out_line)
 
 
 def declaration_double_colon(iline, lines, pp_line_previous, line_previous):
@@ -1011,11 +1014,8 @@ def declaration_double_colon(iline, lines, pp_line_previous, line_previous):
             break
 
     if found_dec_type is not None:
-        xlines = lines[iline:]
-        xlines[0] = workline
-
         # Pre-process the line to pull in any continuation lines
-        simple_line = simplify_line(xlines)
+        simple_line = simplify_line(lines, iline, first_line=workline)
 
         if not re.search(r"\s+FUNCTION(,|\s|\()", simple_line, flags=re.IGNORECASE):
             # The presence of declaration attributes (ALLOCATABLE,
@@ -32,17 +32,28 @@ Usage:
  .c or .h extension.
 """
 
+import difflib
+import io
 import os
 import re
 import sys
 import subprocess
+import tempfile
 from argparse import ArgumentParser
-from shutil import which
+from contextlib import redirect_stdout
+from multiprocessing import Pool
+from shutil import copymode, which
 from indentation import apply_indentation
 from styling import apply_styling
 from ampersands import apply_ampersand_shift
 from whitespace import apply_whitespace_fixes
 
+# The status of each Fortran file once it has been through the fixer
+MODIFIED = "modified"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+SKIPPED = "skipped"
+
 
 def get_branch_diff():
     """If in a local working copy of an FCM branch, return a
@@ -132,11 +143,191 @@ def get_branch_diff():
     return bdiff_files_f, bdiff_files_c
 
 
+def fix_fortran_lines(lines, input_file, amp_column=80):
+    """Apply each of the fixes to the lines of a Fortran file, repeating
+    them until the lines stop changing. Returns the fixed lines, or None
+    if any of the fixes failed.
+
+    The stages all lex the same lines; this is only done once for each
+    distinct line, as fstring_parse keeps the results, so a pass over lines
+    that a stage left alone costs little more than the fixes themselves."""
+
+    failed = False
+    reiterate = True
+    modify_lines = list(lines)
+
+    while (reiterate) and (failed is False):
+        old_lines = list(modify_lines)
+
+        amp_lines = None
+        amp_not_parsed = []
+
+        if failed is False:
+            amp_lines, amp_not_parsed = apply_ampersand_shift(
+                modify_lines, preclean=True, col=amp_column
+            )
+
+        if len(amp_not_parsed) > 0:
+            print("Ampersand Alignment Failed for: {0:s}".format(input_file))
+            print("failed on lines:\n")
+            for i in amp_not_parsed:
+                print(str(i) + ': "' + modify_lines[i] + '"')
+            print("\n")
+            failed = True
+
+        white_lines = None
+
+        if failed is False:
+            white_lines = apply_whitespace_fixes(amp_lines)
+
+        if white_lines is None:
+            print("Whitespace Fixes Failed for: {0:s}".format(input_file))
+            failed = True
+
+        styled_lines = None
+
+        if failed is False:
+            styled_lines = apply_styling(white_lines)
+
+        if styled_lines is None:
+            print("Styling Failed for: {0:s}".format(input_file))
+            failed = True
+
+        indented_lines = None
+
+        if failed is False:
+            indented_lines = apply_indentation(styled_lines)
+
+        if indented_lines is None:
+            print("Indentation Failed for: {0:s}".format(input_file))
+            failed = True
+
+        amp_lines = None
+        amp_not_parsed = []
+
+        if failed is False:
+            amp_lines, amp_not_parsed = apply_ampersand_shift(
+                indented_lines, col=amp_column
+            )
+
+        if len(amp_not_parsed) > 0:
+            print("Ampersand Alignment Failed for: {0:s}".format(input_file))
+            print("failed on lines:\n")
+            for i in amp_not_parsed:
+                print(str(i) + ': "' + indented_lines[i] + '"')
+            print("\n")
+            failed = True
+
+        if failed is False:
+            modify_lines = amp_lines
+
+        if modify_lines[:] == old_lines[:]:
+            reiterate = False
+
+    if failed:
+        return None
+    return modify_lines
+
+
+def write_file_atomically(file_name, text):
+    """Replace the contents of a file, by writing a temporary file alongside
+    it and renaming that over it, so the file is never left half written.
+    A symbolic link is followed, so the file it points to is rewritten
+    rather than the link being replaced by a copy"""
+
+    file_name = os.path.realpath(file_name)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=os.path.dirname(file_name),
+        prefix=".{0:s}.".format(os.path.basename(file_name)),
+    )
+    try:
+        with os.fdopen(fd, "w") as file_out:
+            file_out.write(text)
+        copymode(file_name, tmp_name)
+        os.replace(tmp_name, file_name)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def fix_fortran_file(input_file, amp_column=80, check=False, show_diff=False):
+    """Apply the fixes to a Fortran file, rewriting it if they change it
+    (unless only checking it, when nothing is written). Optionally print a
+    unified diff of the changes. Returns the file's status: MODIFIED,
+    UNCHANGED, FAILED or SKIPPED (if it isn't a Fortran file)"""
+
+    print("Processing: {0:s}".format(input_file))
+    sys.stdout.flush()
+    if (
+        input_file.split(".")[-1] != "F90"
+        and input_file.split(".")[-1] != "f90"
+        and input_file.split(".")[-1] != "inc"
+    ):
+        if input_file.split(".")[-1] == "h":
+            if re.search(r".*\/include\/other\/.*", input_file) is not None:
+                print(
+                    "Input file {0:s} not a Fortran include file, skipping".format(
+                        input_file
+                    )
+                )
+                return SKIPPED
+        else:
+            print("Input file {0:s} not a Fortran file, skipping".format(input_file))
+            return SKIPPED
+
+    with open(input_file, "r", errors="replace") as file_in:
+        lines = file_in.read().split("\n")
+
+    try:
+        modify_lines = fix_fortran_lines(lines, input_file, amp_column)
+    except SystemExit:
+        # Some of the fixes exit when they can't make sense of a line
+        modify_lines = None
+
+    if modify_lines is None:
+        print("Fixing Failed for: {0:s}".format(input_file))
+        return FAILED
+    if modify_lines == lines:
+        return UNCHANGED
+
+    if show_diff:
+        for line in difflib.unified_diff(
+            lines, modify_lines, fromfile=input_file, tofile=input_file, lineterm=""
+        ):
+            print(line)
+    if not check:
+        write_file_atomically(input_file, "\n".join(modify_lines))
+    return MODIFIED
+
+
+def fix_fortran_file_or_fail(input_file, *args):
+    """fix_fortran_file, with any error (e.g. the file can't be read)
+    reported as the file failing, so the other files are still fixed"""
+
+    try:
+        return fix_fortran_file(input_file, *args)
+    except Exception as err:
+        print("Fixing {0:s} raised {1!r}".format(input_file, err))
+        return FAILED
+
+
+def fix_fortran_file_quietly(args):
+    """fix_fortran_file_or_fail, for a process pool: takes a tuple of its
+    arguments, and returns the file name, its status and the messages
+    printed while fixing it"""
+
+    output = io.StringIO()
+    with redirect_stdout(output):
+        status = fix_fortran_file_or_fail(*args)
+    return args[0], status, output.getvalue()
+
+
 def main():
     """Main toplevel function"""
     parser = ArgumentParser(
         usage="""
-    %(prog)s [--branch-diff] [--c_mode] [file_1 [file_2] [file_3] ...]
+    %(prog)s [--branch-diff] [--c_mode] [--jobs N] [--check | --diff]
+             [file_1 [file_2] [file_3] ...]
 
     This script will attempt to apply UMDP3 conformant styling to a single or
     set of source files. These are assumed to be Fortran, unless the --c_mode
@@ -157,6 +348,15 @@ def main():
     The optional --branch-diff flag will instead assume your current directory
     is within a working copy and apply the styling only to files listed by the
     \"fcm branch-diff\" command.
+
+    The optional --jobs flag fixes that many Fortran files at once. A file
+    which fails doesn't stop the others from being fixed, and each file is
+    only replaced once all the fixes to it have succeeded.
+
+    The optional --check flag fixes the Fortran files in memory without
+    writing anything, listing any files the fixes would change on stderr
+    and exiting with status 2 if there are any. The --diff flag does the same
+    and also prints a unified diff of the changes to each file.
     """
     )
     parser.add_argument(
@@ -171,8 +371,33 @@ def main():
     parser.add_argument(
         "--col", dest="col", type=int, default=80, help="Column to put &s in"
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        dest="jobs",
+        type=int,
+        default=1,
+        help="Number of Fortran files to fix at once",
+    )
+    parser.add_argument(
+        "--check",
+        dest="check",
+        action="store_true",
+        help="Don't change any files, exit with status 2 if any need fixing",
+    )
+    parser.add_argument(
+        "--diff",
+        dest="diff",
+        action="store_true",
+        help="As --check, also printing the changes which would be made",
+    )
     (opts, args) = parser.parse_known_args()
 
+    check = opts.check or opts.diff
+
+    if opts.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
     if len(sys.argv) == 1:
         parser.print_help()
 
@@ -180,6 +405,7 @@ def main():
 
     failed = False
     modified = []
+    statuses = {}
 
     if opts.bdiff:
         if len(args) > 0:
@@ -197,121 +423,48 @@ def main():
     if opts.bdiff or not opts.c_mode:
         if len(f_files) > 0:
             print("\nProcessing Fortran Files")
-        for input_file in f_files:
-            print("Processing: {0:s}".format(input_file))
-            sys.stdout.flush()
-            if (
-                input_file.split(".")[-1] != "F90"
-                and input_file.split(".")[-1] != "f90"
-                and input_file.split(".")[-1] != "inc"
-            ):
-                if input_file.split(".")[-1] == "h":
-                    if re.search(r".*\/include\/other\/.*", input_file) is not None:
-                        print(
-                            "Input file {0:s} not a "
-                            "Fortran include file,"
-                            " skipping".format(input_file)
-                        )
-                        continue
-                else:
-                    print(
-                        "Input file {0:s} not a Fortran file, skipping".format(
-                            input_file
-                        )
-                    )
-                    continue
-
-            with open(input_file, "r+", errors="replace") as file_in:
-                lines = file_in.read().split("\n")
-
-                file_in.seek(0)
-
-                reiterate = True
-                modify_lines = list(lines)
-
-                while (reiterate) and (failed is False):
-                    old_lines = list(modify_lines)
-
-                    amp_lines = None
-                    amp_not_parsed = []
-
-                    if failed is False:
-                        amp_lines, amp_not_parsed = apply_ampersand_shift(
-                            modify_lines, preclean=True, col=amp_column
-                        )
-
-                    if len(amp_not_parsed) > 0:
-                        print(
-                            "Ampersand Alignment Failed for: {0:s}".format(input_file)
-                        )
-                        print("failed on lines:\n")
-                        for i in amp_not_parsed:
-                            print(str(i) + ': "' + modify_lines[i] + '"')
-                        print("\n")
-                        failed = True
-
-                    white_lines = None
-
-                    if failed is False:
-                        white_lines = apply_whitespace_fixes(amp_lines)
-
-                    if white_lines is None:
-                        print("Whitespace Fixes Failed for: {0:s}".format(input_file))
-                        failed = True
-
-                    styled_lines = None
-
-                    if failed is False:
-                        styled_lines = apply_styling(white_lines)
-
-                    if styled_lines is None:
-                        print("Styling Failed for: {0:s}".format(input_file))
-                        failed = True
-
-                    indented_lines = None
-
-                    if failed is False:
-                        indented_lines = apply_indentation(styled_lines)
-
-                    if indented_lines is None:
-                        print("Indentation Failed for: {0:s}".format(input_file))
-                        failed = True
-
-                    amp_lines = None
-                    amp_not_parsed = []
-
-                    if failed is False:
-                        amp_lines, amp_not_parsed = apply_ampersand_shift(
-                            indented_lines, col=amp_column
-                        )
-
-                    if len(amp_not_parsed) > 0:
-                        print(
-                            "Ampersand Alignment Failed for: {0:s}".format(input_file)
-                        )
-                        print("failed on lines:\n")
-                        for i in amp_not_parsed:
-                            print(str(i) + ': "' + indented_lines[i] + '"')
-                        print("\n")
-                        failed = True
-
-                    if failed is False:
-                        modify_lines = amp_lines
-
-                    if modify_lines[:] == old_lines[:]:
-                        reiterate = False
+        if opts.jobs > 1:
+            # Each file's messages are gathered and printed together, in
+            # the order the files were given
+            with Pool(opts.jobs) as pool:
+                fixes = pool.imap(
+                    fix_fortran_file_quietly,
+                    [
+                        (input_file, amp_column, check, opts.diff)
+                        for input_file in f_files
+                    ],
+                )
+                for input_file, status, output in fixes:
+                    print(output, end="")
+                    sys.stdout.flush()
+                    statuses[input_file] = status
+        else:
+            for input_file in f_files:
+                statuses[input_file] = fix_fortran_file_or_fail(
+                    input_file, amp_column, check, opts.diff
+                )
 
-                if failed is False:
-                    if modify_lines != lines:
-                        modified.append(input_file)
-                    file_in.write("\n".join(modify_lines))
-                    file_in.truncate()
+        modified = [f for f in f_files if statuses[f] == MODIFIED]
+        failed_files = [f for f in f_files if statuses[f] == FAILED]
+        failed = len(failed_files) > 0
 
-            if failed is True:
-                break
+        if len(f_files) > 0:
+            print(
+                "\nFortran files: {0:d} {1:s}, {2:d} unchanged, "
+                "{3:d} failed, {4:d} skipped".format(
+                    len(modified),
+                    "need fixing" if check else "modified",
+                    list(statuses.values()).count(UNCHANGED),
+                    len(failed_files),
+                    list(statuses.values()).count(SKIPPED),
+                )
+            )
+            for input_file in failed_files:
+                print("Failed: {0:s}".format(input_file))
 
-    # Style C Files
-    if (opts.bdiff or opts.c_mode) and os.environ.get("RUNCCODE") == "1":
+    # Style C Files (clang-format changes them in place, so they are left
+    # alone when only checking)
+    if (opts.bdiff or opts.c_mode) and os.environ.get("RUNCCODE") == "1" and not check:
         # check if clang-format is available
         if which("clang-format") is not None:
             # interogate clang-format
@@ -425,7 +578,12 @@ def main():
 
     if failed:
         sys.exit(1)
-    if modified:
+    if check:
+        for item in modified:
+            print("Needs fixing: {0:s}".format(item), file=sys.stderr)
+        if modified:
+            sys.exit(2)
+    elif modified:
         for item in modified:
             print(f"\nModified: {item}\n", file=sys.stderr)
         raise Exception("Some files were modified, see stderr for info")